@@ -11,7 +11,11 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+import atexit
 import os
+import shutil
+import sys
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -68,6 +72,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'hello.context_processors.static_build',
             ],
         },
     },
@@ -75,6 +80,10 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'demo_site.wsgi.application'
 
+# Route the public pages to the async views in hello.async_views; only
+# worthwhile when served over ASGI (see "Serving with ASGI" in DEPLOYMENT.md)
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False') == 'True'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -83,9 +92,88 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    # The AI update log (ContentUpdate, ContentBatch), routed here by
+    # hello.routers so the catalog database stays small while content is
+    # refreshed. Create its tables with `migrate --database updates`.
+    'updates': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'updates.sqlite3',
+    },
 }
 
+DATABASE_ROUTERS = ['hello.routers.UpdateLogRouter']
+
+# Production SQLite profile. In WAL mode readers keep working while a writer
+# (the weekly update_content run) holds its transaction, instead of waiting
+# on the rollback journal's exclusive lock, and each worker keeps its
+# connection open instead of reconnecting on every request.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    # Safe in WAL mode: a power loss can lose the last commits, never corrupt the file
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # Negative values are KiB: 64 MiB of page cache per connection
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+
+SQLITE_TUNED = os.getenv('SQLITE_TUNED', 'False') == 'True'
+if SQLITE_TUNED:
+    for database in DATABASES.values():
+        database.update({
+            'OPTIONS': {
+                'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+                # Take the write lock when a transaction begins, so a second writer
+                # waits for busy_timeout rather than failing with "database is locked"
+                'transaction_mode': 'IMMEDIATE',
+            },
+            'CONN_MAX_AGE': int(os.getenv('CONN_MAX_AGE', '600')),
+            'CONN_HEALTH_CHECKS': True,
+        })
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# The file cache is shared by every worker and by management commands, so
+# the page cache invalidations (and ETags) they trigger reach the web
+# server. CACHE_BACKEND=locmem keeps a private cache per process, which
+# only sees invalidations made by that process. Test runs get a throwaway
+# directory, so clearing the cache between tests never touches the live site.
+
+if len(sys.argv) > 1 and sys.argv[1] == 'test':
+    CACHE_LOCATION = tempfile.mkdtemp(prefix='mcp-education-test-cache-')
+    atexit.register(shutil.rmtree, CACHE_LOCATION, ignore_errors=True)
+else:
+    CACHE_LOCATION = os.getenv('CACHE_LOCATION', str(BASE_DIR / 'cache'))
+
+if os.getenv('CACHE_BACKEND', 'file') == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': CACHE_LOCATION,
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'mcp-education',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+# Seconds a rendered public page stays cached for anonymous visitors; 0 disables it
+PAGE_CACHE_SECONDS = int(os.getenv('PAGE_CACHE_SECONDS', '600'))
+
+# Courses or labs per page on the listing pages
+LIST_PAGE_SIZE = int(os.getenv('LIST_PAGE_SIZE', '24'))
+
+# Part of every page cache key and ETag; change it on deploys that alter templates
+PAGE_VERSION = os.getenv('PAGE_VERSION', '1')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -125,12 +213,29 @@ STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 
+# Serve the self-hosted assets from `python manage.py build_assets` instead of
+# the CDNs. collectstatic then writes them under content-hashed names with
+# .gz/.br copies, so the web server can cache them forever.
+STATIC_BUILD = os.getenv('STATIC_BUILD', 'False') == 'True'
+if STATIC_BUILD:
+    STORAGES = {
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'hello.storage.PrecompressedManifestStaticFilesStorage'},
+    }
+
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
 # Claude AI Configuration
 ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY')
 
+# Seconds to wait for a connection and for each read from the Claude API
+CLAUDE_CONNECT_TIMEOUT = float(os.getenv('CLAUDE_CONNECT_TIMEOUT', '10'))
+CLAUDE_READ_TIMEOUT = float(os.getenv('CLAUDE_READ_TIMEOUT', '120'))
+
+# Retries for rate limits, overload and connection errors, with exponential backoff
+CLAUDE_MAX_RETRIES = int(os.getenv('CLAUDE_MAX_RETRIES', '4'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
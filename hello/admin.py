@@ -1,8 +1,99 @@
-from django.contrib import admin
-from .models import MCPProvider, Course, Lesson, Lab, LearningPath, ContentUpdate
+from django.contrib import admin, messages
+from django.contrib.admin.views.main import ChangeList
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
+from django.db.models import Max, Q
+from django.http import Http404, HttpResponse, HttpResponseNotAllowed, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.functional import cached_property
+from django.utils.html import format_html
+from .models import MCPProvider, Course, Lesson, Lab, LearningPath, ContentUpdate, ContentBatch
+from . import search
+from .services.claude_service import ClaudeService
+from .services.content_updates import CONTENT_MODELS, apply_updates, stream_update
 import markdown
 
 
+class FullTextSearchMixin:
+    """Answer changelist searches from the FTS5 index instead of icontains scans"""
+    search_kind = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if search_term:
+            return queryset.filter(pk__in=search.matching_ids(search_term, self.search_kind)), False
+        return super().get_search_results(request, queryset, search_term)
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that stops counting at COUNT_LIMIT rows
+
+    An exact COUNT(*) reads the whole table on every changelist page. Past
+    the limit an unfiltered changelist estimates its size from the largest
+    primary key, and a filtered one simply pages through the first
+    COUNT_LIMIT matches.
+    """
+    COUNT_LIMIT = 10000
+    
+    @cached_property
+    def count(self):
+        queryset = self.object_list.order_by()
+        count = queryset.values('pk')[:self.COUNT_LIMIT + 1].count()
+        if count <= self.COUNT_LIMIT:
+            return count
+        if not queryset.query.where:
+            return max(queryset.aggregate(largest=Max('pk'))['largest'], self.COUNT_LIMIT)
+        return self.COUNT_LIMIT
+
+
+class DeferringChangeList(ChangeList):
+    def get_queryset(self, request, exclude_parameters=None):
+        queryset = super().get_queryset(request, exclude_parameters)
+        return queryset.defer(*self.model_admin.list_defer)
+
+
+class LargeTableAdminMixin:
+    """Changelist settings for tables with many rows or large text columns"""
+    # Columns left unloaded on the changelist, which never displays them
+    list_defer = []
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    
+    def get_changelist(self, request, **kwargs):
+        return DeferringChangeList
+
+
+class InputFilter(admin.SimpleListFilter):
+    """Sidebar filter with a text box instead of one link per value"""
+    template = 'admin/hello/input_filter.html'
+    
+    def lookups(self, request, model_admin):
+        # Any entry makes the filter show; the choices come from the text box
+        return [(None, None)]
+    
+    def choices(self, changelist):
+        # Carry the other filters, search and ordering through the form as hidden inputs
+        yield {
+            'query_parts': [
+                (name, value)
+                for name, values in changelist.filter_params.items() if name != self.parameter_name
+                for value in values
+            ],
+        }
+
+
+class CourseInputFilter(InputFilter):
+    """Filter by course slug or title, without listing every course"""
+    title = 'course'
+    parameter_name = 'course'
+    
+    def queryset(self, request, queryset):
+        value = (self.value() or '').strip()
+        if not value:
+            return queryset
+        return queryset.filter(Q(course__slug=value) | Q(course__title__icontains=value))
+
+
 @admin.register(MCPProvider)
 class MCPProviderAdmin(admin.ModelAdmin):
     list_display = ['name', 'is_active', 'created_at']
@@ -11,7 +102,9 @@ class MCPProviderAdmin(admin.ModelAdmin):
 
 
 @admin.register(Course)
-class CourseAdmin(admin.ModelAdmin):
+class CourseAdmin(LargeTableAdminMixin, FullTextSearchMixin, admin.ModelAdmin):
+    search_kind = 'course'
+    list_defer = ['description']
     list_display = ['title', 'difficulty_level', 'order', 'is_published', 'last_ai_update']
     list_filter = ['difficulty_level', 'is_published', 'created_at']
     search_fields = ['title', 'description']
@@ -20,39 +113,149 @@ class CourseAdmin(admin.ModelAdmin):
 
 
 @admin.register(Lesson)
-class LessonAdmin(admin.ModelAdmin):
+class LessonAdmin(LargeTableAdminMixin, FullTextSearchMixin, admin.ModelAdmin):
+    search_kind = 'lesson'
     list_display = ['title', 'course', 'order', 'is_published', 'last_ai_update']
-    list_filter = ['is_published', 'course', 'created_at']
+    list_filter = ['is_published', CourseInputFilter, 'created_at']
+    list_select_related = ['course']
+    list_defer = ['content', 'content_html', 'course__description']
     search_fields = ['title', 'content']
     prepopulated_fields = {'slug': ('title',)}
     readonly_fields = ['created_at', 'updated_at', 'last_ai_update']
-    raw_id_fields = ['course']
+    autocomplete_fields = ['course']
+    
+    def get_queryset(self, request):
+        # Lesson.__str__ shows the course title, e.g. in the lab form's lesson autocomplete
+        return super().get_queryset(request).select_related('course')
 
 
 @admin.register(Lab)
-class LabAdmin(admin.ModelAdmin):
+class LabAdmin(LargeTableAdminMixin, FullTextSearchMixin, admin.ModelAdmin):
+    search_kind = 'lab'
     list_display = ['title', 'course', 'difficulty', 'order', 'is_published', 'last_ai_update']
-    list_filter = ['difficulty', 'is_published', 'course', 'created_at']
+    list_filter = ['difficulty', 'is_published', CourseInputFilter, 'created_at']
+    list_select_related = ['course']
+    list_defer = [
+        'description', 'instructions', 'starter_code', 'solution_code', 'description_html', 'instructions_html',
+        'starter_code_html', 'course__description',
+    ]
     search_fields = ['title', 'description', 'instructions']
     prepopulated_fields = {'slug': ('title',)}
     readonly_fields = ['created_at', 'updated_at', 'last_ai_update']
-    raw_id_fields = ['course', 'lesson']
+    autocomplete_fields = ['course', 'lesson']
 
 
 @admin.register(LearningPath)
 class LearningPathAdmin(admin.ModelAdmin):
     list_display = ['name', 'provider', 'is_featured', 'order']
     list_filter = ['is_featured', 'provider']
+    list_select_related = ['provider']
     search_fields = ['name', 'description']
     prepopulated_fields = {'slug': ('name',)}
-    filter_horizontal = ['courses']
+    autocomplete_fields = ['courses']
     raw_id_fields = ['provider']
 
 
 @admin.register(ContentUpdate)
-class ContentUpdateAdmin(admin.ModelAdmin):
+class ContentUpdateAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ['content_type', 'content_id', 'status', 'created_at', 'applied_at']
     list_filter = ['status', 'content_type', 'created_at']
-    search_fields = ['prompt_used', 'ai_response']
-    readonly_fields = ['created_at']
-    date_hierarchy = 'created_at'
+    list_defer = ['prompt_used', 'ai_response']
+    list_per_page = 50
+    # Exact id lookups and the short prompt only; scanning every AI response doesn't scale
+    search_fields = ['=content_id', 'prompt_used']
+    readonly_fields = ['created_at', 'generate_preview_link']
+    actions = ['approve_updates', 'apply_approved_updates', 'approve_and_apply_updates']
+    
+    def get_urls(self):
+        return [
+            path(
+                'generate/<str:content_type>/<int:content_id>/',
+                self.admin_site.admin_view(self.generate_preview),
+                name='hello_contentupdate_generate',
+            ),
+        ] + super().get_urls()
+    
+    def generate_preview(self, request, content_type, content_id):
+        """Generate a new update for one item, streaming the text to the browser as it arrives
+        
+        POST only, so the admin's CSRF protection applies: each call spends
+        API tokens and creates a ContentUpdate.
+        """
+        if request.method != 'POST':
+            return HttpResponseNotAllowed(['POST'])
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        if content_type not in CONTENT_MODELS:
+            raise Http404
+        obj = get_object_or_404(CONTENT_MODELS[content_type], pk=content_id)
+        try:
+            claude_service = ClaudeService()
+        except ValueError as e:
+            return HttpResponse(f'Claude API not configured: {e}', content_type='text/plain', status=503)
+        
+        def stream():
+            try:
+                yield from stream_update(claude_service, content_type, obj)
+            except Exception as e:
+                yield f'\n\n[Generation failed, partial output saved: {e}]'
+        
+        response = StreamingHttpResponse(stream(), content_type='text/plain; charset=utf-8')
+        # Keep proxies such as nginx from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+    
+    @admin.display(description='Generate preview')
+    def generate_preview_link(self, obj):
+        if obj.pk is None:
+            return '-'
+        url = reverse('admin:hello_contentupdate_generate', args=[obj.content_type, obj.content_id])
+        # Posts the change form, with its CSRF token, to the generate view in a new tab
+        return format_html(
+            '<button type="submit" formaction="{}" formmethod="post" formtarget="_blank" formnovalidate>'
+            'Generate a new update for this {}</button>',
+            url, obj.content_type,
+        )
+    
+    @admin.action(description='Approve selected updates')
+    def approve_updates(self, request, queryset):
+        count = queryset.filter(status='pending').update(status='approved')
+        self.message_user(request, f'{count} updates approved.', messages.SUCCESS)
+    
+    @admin.action(description='Apply selected approved updates')
+    def apply_approved_updates(self, request, queryset):
+        self.apply(request, queryset)
+    
+    @admin.action(description='Approve and apply selected updates')
+    def approve_and_apply_updates(self, request, queryset):
+        queryset.filter(status='pending').update(status='approved')
+        self.apply(request, queryset)
+    
+    def apply(self, request, queryset):
+        result = apply_updates(queryset)
+        self.message_user(
+            request,
+            f'{result.applied} updates applied across {result.courses} courses.',
+            messages.SUCCESS,
+        )
+        if result.skipped:
+            self.message_user(
+                request,
+                f'{result.skipped} updates skipped because their content no longer exists.',
+                messages.WARNING,
+            )
+        if result.rejected:
+            self.message_user(
+                request,
+                f"{result.rejected} updates skipped because they don't follow the content's layout.",
+                messages.WARNING,
+            )
+
+
+@admin.register(ContentBatch)
+class ContentBatchAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ['batch_id', 'status', 'request_count', 'created_at', 'ended_at', 'ingested_at']
+    list_defer = ['requests']
+    list_filter = ['status']
+    search_fields = ['batch_id']
+    readonly_fields = ['created_at', 'ended_at', 'ingested_at']
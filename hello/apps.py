@@ -5,3 +5,6 @@ class HelloConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'hello'
     verbose_name = 'MCP Education'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,154 @@
+"""
+Async versions of the public views in hello.views, for serving under ASGI.
+
+They run the same queries through Django's async ORM, so under uvicorn a
+slow client or a page waiting on the database doesn't tie up a worker
+thread. Querysets are evaluated before rendering because templates can't
+query the database from the event loop, and stale Markdown is rendered in
+a worker thread. demo_site/urls.py routes to them when ASYNC_VIEWS=True.
+"""
+from asgiref.sync import sync_to_async
+from django.db.models import Exists, OuterRef
+from django.shortcuts import aget_object_or_404, render
+
+from . import search as search_index
+from .caching import public_page
+from .models import Course, Lesson, Lab, LearningPath, MCPProvider
+from .outline import aget_course_outline
+from .pagination import akeyset_page
+from .views import COURSE_CARD_FIELDS, LAB_CARD_FIELDS
+
+
+@public_page('courses', 'paths', 'providers')
+async def home(request):
+    """Homepage with featured learning paths and courses"""
+    has_published_course = Exists(Course.objects.filter(learning_paths=OuterRef('pk'), is_published=True))
+    featured_paths = LearningPath.objects.filter(has_published_course, is_featured=True).select_related('provider')
+    featured_courses = Course.objects.filter(is_published=True).only(*COURSE_CARD_FIELDS)[:6]
+    providers = MCPProvider.objects.filter(is_active=True)
+
+    context = {
+        'featured_paths': [path async for path in featured_paths],
+        'featured_courses': [course async for course in featured_courses],
+        'providers': [provider async for provider in providers],
+    }
+    return render(request, 'hello/home.html', context)
+
+
+@public_page('courses')
+async def course_list(request):
+    """List all courses"""
+    courses = Course.objects.filter(is_published=True).only(*COURSE_CARD_FIELDS)
+    difficulty = request.GET.get('difficulty')
+    if difficulty:
+        courses = courses.filter(difficulty_level=difficulty)
+    page = await akeyset_page(request, courses)
+
+    context = {
+        'courses': page,
+        'page': page,
+        'difficulty_filter': difficulty,
+    }
+    return render(request, 'hello/course_list.html', context)
+
+
+@public_page('course:{slug}')
+async def course_detail(request, slug):
+    """Course detail page"""
+    course = await aget_object_or_404(Course, slug=slug, is_published=True)
+    outline = await aget_course_outline(course)
+
+    context = {
+        'course': course,
+        'lessons': outline.lessons,
+        'labs': outline.labs,
+    }
+    return render(request, 'hello/course_detail.html', context)
+
+
+@public_page('course:{course_slug}')
+async def lesson_detail(request, course_slug, lesson_slug):
+    """Lesson detail page"""
+    lesson = await aget_object_or_404(
+        Lesson.objects.select_related('course').defer('course__description'),
+        course__slug=course_slug,
+        course__is_published=True,
+        slug=lesson_slug,
+        is_published=True,
+    )
+    course = lesson.course
+    await lesson.aensure_rendered()
+    prev_lesson, next_lesson = (await aget_course_outline(course)).neighbours(lesson.slug)
+
+    context = {
+        'course': course,
+        'lesson': lesson,
+        'next_lesson': next_lesson,
+        'prev_lesson': prev_lesson,
+    }
+    return render(request, 'hello/lesson_detail.html', context)
+
+
+@public_page('labs', 'courses')
+async def lab_list(request):
+    """List all labs"""
+    labs = Lab.objects.filter(is_published=True).select_related('course').only(*LAB_CARD_FIELDS)
+    difficulty = request.GET.get('difficulty')
+    if difficulty:
+        labs = labs.filter(difficulty=difficulty)
+    page = await akeyset_page(request, labs)
+
+    context = {
+        'labs': page,
+        'page': page,
+        'difficulty_filter': difficulty,
+    }
+    return render(request, 'hello/lab_list.html', context)
+
+
+@public_page('lab:{slug}')
+async def lab_detail(request, slug):
+    """Lab detail page"""
+    lab = await aget_object_or_404(Lab.objects.defer('solution_code'), slug=slug, is_published=True)
+    await lab.aensure_rendered()
+
+    context = {
+        'lab': lab,
+    }
+    return render(request, 'hello/lab_detail.html', context)
+
+
+@public_page('paths', 'providers')
+async def learning_path_list(request):
+    """List all learning paths"""
+    paths = LearningPath.objects.select_related('provider')
+    context = {
+        'paths': [path async for path in paths],
+    }
+    return render(request, 'hello/learning_path_list.html', context)
+
+
+@public_page('path:{slug}', 'courses', 'providers')
+async def learning_path_detail(request, slug):
+    """Learning path detail page"""
+    path = await aget_object_or_404(LearningPath.objects.select_related('provider'), slug=slug)
+    courses = path.courses.filter(is_published=True).only(*COURSE_CARD_FIELDS)
+
+    context = {
+        'path': path,
+        'courses': [course async for course in courses],
+    }
+    return render(request, 'hello/learning_path_detail.html', context)
+
+
+async def search(request):
+    """Full-text search across courses, lessons and labs"""
+    query = request.GET.get('q', '').strip()
+    # The FTS5 query runs on a raw cursor, which has no async API
+    results = await sync_to_async(search_index.search)(query) if query else []
+
+    context = {
+        'query': query,
+        'results': results,
+    }
+    return render(request, 'hello/search.html', context)
@@ -0,0 +1,174 @@
+"""
+Page cache and conditional GET for the public views.
+
+Every page depends on a few tags (e.g. ``courses`` or ``course:<slug>``),
+each holding a version that hello.signals replaces with the current time
+whenever content behind the tag changes. Cached pages are keyed by the path,
+the sorted query string and those versions; the same versions yield the
+ETag and Last-Modified validators, so a 304 needs no database queries.
+
+The decorators wrap sync and async views alike; for async views the cache
+is read and written through its async methods.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+
+TAG_VERSION_KEY = 'page-tag:{}'
+PAGE_KEY = 'page:{}'
+
+
+def get_tag_versions(tags):
+    """Current version of each tag, creating a version for unseen tags"""
+    keys = [TAG_VERSION_KEY.format(tag) for tag in tags]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            # add() so concurrent workers agree on a single initial version
+            cache.add(key, time.time_ns(), None)
+        versions.update(cache.get_many(missing))
+    return [versions.get(key, 0) for key in keys]
+
+
+async def aget_tag_versions(tags):
+    """Async variant of get_tag_versions"""
+    keys = [TAG_VERSION_KEY.format(tag) for tag in tags]
+    versions = await cache.aget_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            await cache.aadd(key, time.time_ns(), None)
+        versions.update(await cache.aget_many(missing))
+    return [versions.get(key, 0) for key in keys]
+
+
+def invalidate_tags(*tags):
+    """Give each tag a new version so pages cached against it are no longer served"""
+    version = time.time_ns()
+    cache.set_many({TAG_VERSION_KEY.format(tag): version for tag in tags if tag}, None)
+
+
+def page_tags(tags, kwargs):
+    return [tag.format(**kwargs) for tag in tags]
+
+
+def request_tag_versions(request, tags):
+    """Tag versions for this request, looked up once and shared by the validators and cache"""
+    if not hasattr(request, '_page_tag_versions'):
+        request._page_tag_versions = get_tag_versions(tags)
+    return request._page_tag_versions
+
+
+async def arequest_tag_versions(request, tags):
+    """Look up this request's tag versions ahead of the (sync) validators"""
+    if not hasattr(request, '_page_tag_versions'):
+        request._page_tag_versions = await aget_tag_versions(tags)
+    return request._page_tag_versions
+
+
+def page_digest(request, tags):
+    query = '&'.join(sorted(request.GET.urlencode().split('&')))
+    versions = request_tag_versions(request, tags)
+    raw = '|'.join([settings.PAGE_VERSION, request.path, query, *map(str, versions)])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def page_cache_key(request, tags):
+    return PAGE_KEY.format(page_digest(request, tags))
+
+
+def is_cacheable(request):
+    """Anonymous GET/HEAD requests only; visitors with a session (e.g. admins) bypass the cache"""
+    return (
+        settings.PAGE_CACHE_SECONDS > 0
+        and request.method in ('GET', 'HEAD')
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+    )
+
+
+def cached_page(*tags):
+    """Cache a view's response under the given tags
+
+    Tags may reference the view's URL kwargs, e.g. ``'course:{slug}'``.
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapped(request, *args, **kwargs):
+                if not is_cacheable(request):
+                    return await view_func(request, *args, **kwargs)
+
+                await arequest_tag_versions(request, page_tags(tags, kwargs))
+                key = page_cache_key(request, page_tags(tags, kwargs))
+                response = await cache.aget(key)
+                if response is None:
+                    response = await view_func(request, *args, **kwargs)
+                    if response.status_code == 200 and not response.cookies:
+                        await cache.aset(key, response, settings.PAGE_CACHE_SECONDS)
+                return response
+            return async_wrapped
+
+        @wraps(view_func)
+        def wrapped(request, *args, **kwargs):
+            if not is_cacheable(request):
+                return view_func(request, *args, **kwargs)
+
+            key = page_cache_key(request, page_tags(tags, kwargs))
+            response = cache.get(key)
+            if response is None:
+                response = view_func(request, *args, **kwargs)
+                if response.status_code == 200 and not response.cookies:
+                    cache.set(key, response, settings.PAGE_CACHE_SECONDS)
+            return response
+        return wrapped
+    return decorator
+
+
+def conditional_page(*tags):
+    """Answer If-None-Match/If-Modified-Since from the tag versions alone"""
+    def etag(request, *args, **kwargs):
+        return page_digest(request, page_tags(tags, kwargs))[:32]
+
+    def last_modified(request, *args, **kwargs):
+        # Versions are the time of the last change behind each tag
+        newest = max(request_tag_versions(request, page_tags(tags, kwargs)), default=0)
+        return datetime.fromtimestamp(newest // 10**9, tz=timezone.utc)
+
+    def decorator(view_func):
+        is_async = iscoroutinefunction(view_func)
+        view_func = condition(etag_func=etag, last_modified_func=last_modified)(view_func)
+
+        if is_async:
+            @wraps(view_func)
+            async def async_wrapped(request, *args, **kwargs):
+                await arequest_tag_versions(request, page_tags(tags, kwargs))
+                response = await view_func(request, *args, **kwargs)
+                patch_cache_control(response, no_cache=True)
+                return response
+            return async_wrapped
+
+        @wraps(view_func)
+        def wrapped(request, *args, **kwargs):
+            response = view_func(request, *args, **kwargs)
+            # Let browsers keep the page but revalidate it on every visit
+            patch_cache_control(response, no_cache=True)
+            return response
+        return wrapped
+    return decorator
+
+
+def public_page(*tags):
+    """Conditional GET in front of the page cache for a public view"""
+    def decorator(view_func):
+        return conditional_page(*tags)(cached_page(*tags)(view_func))
+    return decorator
@@ -0,0 +1,390 @@
+"""
+Streaming NDJSON export and import of the content catalog.
+
+Each line is one JSON object tagged with its ``type``. Rows refer to each
+other by natural key instead of id (providers by name, courses, labs and
+learning paths by slug, lessons by course slug and slug), so a file can be
+loaded into any database. Exports list providers, courses, lessons, labs and
+learning paths in that order, which is the order an import needs.
+"""
+import datetime
+import json
+from collections import Counter
+from itertools import groupby
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import search
+from .caching import invalidate_tags
+from .models import MCPProvider, Course, Lesson, Lab, LearningPath
+from .outline import OUTLINE_CACHE_KEY
+
+
+PROVIDER_FIELDS = ['name', 'description', 'official_url', 'logo', 'is_active']
+COURSE_FIELDS = [
+    'slug', 'title', 'description', 'short_description', 'image', 'difficulty_level',
+    'estimated_time', 'order', 'is_published', 'last_ai_update',
+]
+LESSON_FIELDS = ['slug', 'title', 'content', 'order', 'is_published', 'last_ai_update']
+LAB_FIELDS = [
+    'slug', 'title', 'description', 'instructions', 'starter_code', 'solution_code', 'difficulty',
+    'estimated_time', 'order', 'is_published', 'last_ai_update',
+]
+PATH_FIELDS = ['slug', 'name', 'description', 'icon', 'is_featured', 'order']
+
+# Stored HTML travels with the export, so an import only renders Markdown
+# whose source or renderer version no longer matches the render key
+LESSON_RENDERED_FIELDS = ['rendered_key', *Lesson.rendered_fields.values()]
+LAB_RENDERED_FIELDS = ['rendered_key', *Lab.rendered_fields.values()]
+
+TYPES = ['provider', 'course', 'lesson', 'lab', 'learning_path']
+
+
+class CatalogError(Exception):
+    """An import line that is malformed or refers to missing content"""
+
+
+class CatalogEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder keeping datetimes to the microsecond, as the import compares them"""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def export_lines(batch_size=2000):
+    """Yield the whole catalog as NDJSON lines, reading the tables in chunks"""
+    for row in export_rows(batch_size):
+        yield json.dumps(row, cls=CatalogEncoder, ensure_ascii=False)
+
+
+def export_rows(batch_size=2000):
+    for row in MCPProvider.objects.order_by('id').values(*PROVIDER_FIELDS).iterator(chunk_size=batch_size):
+        yield {'type': 'provider', **row}
+
+    for row in Course.objects.order_by('id').values(*COURSE_FIELDS).iterator(chunk_size=batch_size):
+        yield {'type': 'course', **row}
+
+    lessons = Lesson.objects.order_by('id').values(*LESSON_FIELDS, *LESSON_RENDERED_FIELDS, course_slug=F('course__slug'))
+    for row in lessons.iterator(chunk_size=batch_size):
+        row['course'] = row.pop('course_slug')
+        yield {'type': 'lesson', **row}
+
+    labs = Lab.objects.order_by('id').values(
+        *LAB_FIELDS,
+        *LAB_RENDERED_FIELDS,
+        course_slug=F('course__slug'),
+        lesson_course_slug=F('lesson__course__slug'),
+        lesson_slug=F('lesson__slug'),
+    )
+    for row in labs.iterator(chunk_size=batch_size):
+        row['course'] = row.pop('course_slug')
+        lesson = [row.pop('lesson_course_slug'), row.pop('lesson_slug')]
+        row['lesson'] = lesson if lesson[1] is not None else None
+        yield {'type': 'lab', **row}
+
+    # Walk paths and memberships side by side, both ordered by path id
+    memberships = (
+        LearningPath.courses.through.objects
+        .order_by('learningpath_id', 'course_id')
+        .values_list('learningpath_id', 'course__slug')
+        .iterator(chunk_size=batch_size)
+    )
+    grouped = groupby(memberships, key=lambda membership: membership[0])
+    current = next(grouped, None)
+    paths = LearningPath.objects.order_by('id').values('id', *PATH_FIELDS, provider_name=F('provider__name'))
+    for row in paths.iterator(chunk_size=batch_size):
+        path_id = row.pop('id')
+        courses = []
+        if current is not None and current[0] == path_id:
+            courses = [course_slug for _path_id, course_slug in current[1]]
+            current = next(grouped, None)
+        row['provider'] = row.pop('provider_name')
+        yield {'type': 'learning_path', **row, 'courses': courses}
+
+
+class CatalogImporter:
+    """Idempotent, batched import of NDJSON catalog lines
+
+    Rows are matched to existing content by natural key: unchanged rows are
+    skipped, changed ones updated and new ones created, each in bulk. Content
+    missing from the file is left alone. The whole import runs in a single
+    transaction, and the search index and page caches are refreshed once at
+    the end, since bulk writes bypass hello.signals.
+    """
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.stats = {kind: Counter() for kind in TYPES}
+        self.pending = []
+        self.pending_type = None
+        self.course_ids = set()
+        self.tags = set()
+
+    def load(self, lines):
+        with transaction.atomic():
+            for number, line in enumerate(lines, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as error:
+                    raise CatalogError(f'Line {number}: invalid JSON ({error})')
+                kind = row.pop('type', None) if isinstance(row, dict) else None
+                if kind not in TYPES:
+                    raise CatalogError(f'Line {number}: unknown type {kind!r}')
+                if kind != self.pending_type or len(self.pending) >= self.batch_size:
+                    self.flush()
+                self.pending_type = kind
+                self.pending.append((number, row))
+            self.flush()
+        self.refresh_derived_data()
+        return self.stats
+
+    def flush(self):
+        if self.pending:
+            getattr(self, f'import_{self.pending_type}s')(self.pending)
+        self.pending = []
+
+    def import_providers(self, rows):
+        incoming = {}
+        for number, row in rows:
+            values = field_values(MCPProvider, row, PROVIDER_FIELDS, number)
+            incoming[values['name']] = values
+        existing = {}
+        for stored in MCPProvider.objects.filter(name__in=incoming).order_by('id').values('id', *PROVIDER_FIELDS):
+            existing.setdefault(stored['name'], stored)
+
+        if self.save(MCPProvider, 'provider', incoming, existing):
+            self.tags.add('providers')
+
+    def import_courses(self, rows):
+        incoming = {}
+        for number, row in rows:
+            values = field_values(Course, row, COURSE_FIELDS, number, key='slug')
+            incoming[values['slug']] = values
+        existing = {
+            stored['slug']: stored
+            for stored in Course.objects.filter(slug__in=incoming).values('id', *COURSE_FIELDS)
+        }
+
+        changed = self.save(Course, 'course', incoming, existing)
+        if changed:
+            self.tags.add('courses')
+            self.course_ids.update(obj.pk for obj in changed)
+
+    def import_lessons(self, rows):
+        course_ids = course_ids_by_slug(row.get('course') for _number, row in rows)
+        incoming = {}
+        rendered = {}
+        for number, row in rows:
+            values = field_values(Lesson, row, LESSON_FIELDS, number, key='slug')
+            if not row.get('course'):
+                raise CatalogError(f"Line {number}: missing 'course'")
+            values['course_id'] = resolve(course_ids, row.get('course'), 'course', number)
+            incoming[values['course_id'], values['slug']] = values
+            rendered[values['course_id'], values['slug']] = rendered_values(row, LESSON_RENDERED_FIELDS)
+        existing = {
+            (stored['course_id'], stored['slug']): stored
+            for stored in Lesson.objects.filter(
+                course_id__in={course_id for course_id, _slug in incoming},
+                slug__in={slug for _course_id, slug in incoming},
+            ).values('id', 'course_id', 'rendered_key', *LESSON_FIELDS)
+        }
+
+        changed = self.save(Lesson, 'lesson', incoming, existing, rendered)
+        self.course_ids.update(obj.course_id for obj in changed)
+
+    def import_labs(self, rows):
+        course_ids = course_ids_by_slug(row.get('course') for _number, row in rows)
+        lesson_ids = lesson_ids_by_key(row.get('lesson') for _number, row in rows)
+        incoming = {}
+        rendered = {}
+        for number, row in rows:
+            values = field_values(Lab, row, LAB_FIELDS, number, key='slug')
+            values['course_id'] = resolve(course_ids, row.get('course'), 'course', number)
+            lesson = row.get('lesson')
+            values['lesson_id'] = resolve(lesson_ids, tuple(lesson) if lesson else None, 'lesson', number)
+            incoming[values['slug']] = values
+            rendered[values['slug']] = rendered_values(row, LAB_RENDERED_FIELDS)
+        existing = {
+            stored['slug']: stored
+            for stored in Lab.objects.filter(slug__in=incoming).values(
+                'id', 'course_id', 'lesson_id', 'rendered_key', *LAB_FIELDS
+            )
+        }
+
+        changed = self.save(Lab, 'lab', incoming, existing, rendered)
+        for obj in changed:
+            self.tags.update(['labs', f'lab:{obj.slug}'])
+            # A lab that moved leaves its previous course page stale too
+            self.course_ids.update([obj.course_id, existing.get(obj.slug, {}).get('course_id')])
+
+    def import_learning_paths(self, rows):
+        provider_ids = {}
+        provider_names = {row['provider'] for _number, row in rows if row.get('provider')}
+        # Provider names aren't unique; like the import, prefer the oldest match
+        providers = MCPProvider.objects.filter(name__in=provider_names).order_by('-id')
+        for provider_id, name in providers.values_list('id', 'name'):
+            provider_ids[name] = provider_id
+        course_ids = course_ids_by_slug(slug for _number, row in rows for slug in row.get('courses') or [])
+
+        incoming = {}
+        memberships = {}
+        for number, row in rows:
+            values = field_values(LearningPath, row, PATH_FIELDS, number, key='slug')
+            values['provider_id'] = resolve(provider_ids, row.get('provider'), 'provider', number)
+            incoming[values['slug']] = values
+            if 'courses' in row:
+                memberships[values['slug']] = {
+                    resolve(course_ids, slug, 'course', number) for slug in row['courses']
+                }
+        existing = {
+            stored['slug']: stored
+            for stored in LearningPath.objects.filter(slug__in=incoming).values('id', 'provider_id', *PATH_FIELDS)
+        }
+
+        changed = {obj.slug for obj in self.save(LearningPath, 'learning_path', incoming, existing)}
+        path_ids = dict(LearningPath.objects.filter(slug__in=incoming).values_list('slug', 'id'))
+        changed.update(self.sync_memberships(path_ids, memberships))
+        if changed:
+            self.tags.update(['paths', *(f'path:{slug}' for slug in changed)])
+
+    def sync_memberships(self, path_ids, memberships):
+        """Make each path's courses match the file, returning the slugs of paths that changed"""
+        Membership = LearningPath.courses.through
+        slugs = {path_id: slug for slug, path_id in path_ids.items()}
+        desired = {
+            (path_ids[slug], course_id)
+            for slug, course_ids in memberships.items()
+            for course_id in course_ids
+        }
+        stored = {
+            (path_id, course_id): membership_id
+            for membership_id, path_id, course_id in Membership.objects.filter(
+                learningpath_id__in=[path_ids[slug] for slug in memberships]
+            ).values_list('id', 'learningpath_id', 'course_id')
+        }
+
+        removed = [pair for pair in stored if pair not in desired]
+        added = [pair for pair in desired if pair not in stored]
+        Membership.objects.filter(id__in=[stored[pair] for pair in removed]).delete()
+        Membership.objects.bulk_create(
+            Membership(learningpath_id=path_id, course_id=course_id) for path_id, course_id in added
+        )
+        return {slugs[path_id] for path_id, _course_id in removed + added}
+
+    def save(self, model, kind, incoming, existing, rendered=None):
+        """Create new rows and update changed ones, returning the objects written"""
+        now = timezone.now()
+        tracked = list(next(iter(incoming.values())))
+        rendered_fields = getattr(model, 'rendered_fields', {})
+        has_updated_at = any(field.name == 'updated_at' for field in model._meta.fields)
+
+        created, updated, rerendered = [], [], []
+        for key, values in incoming.items():
+            stored = existing.get(key)
+            if stored is None:
+                obj = model(**values)
+                if rendered_fields:
+                    # bulk_create skips save(), so fill the stored HTML here
+                    fill_rendered(obj, rendered[key], stored_key=None)
+                created.append(obj)
+            elif any(stored[field] != values[field] for field in tracked):
+                obj = model(pk=stored['id'], **values)
+                if has_updated_at:
+                    obj.updated_at = now
+                if rendered_fields and fill_rendered(obj, rendered[key], stored['rendered_key']):
+                    rerendered.append(obj)
+                    continue
+                updated.append(obj)
+            else:
+                self.stats[kind]['unchanged'] += 1
+
+        fields = tracked + (['updated_at'] if has_updated_at else [])
+        model.objects.bulk_create(created)
+        if updated:
+            model.objects.bulk_update(updated, fields)
+        if rerendered:
+            model.objects.bulk_update(rerendered, fields + ['rendered_key', *rendered_fields.values()])
+
+        self.stats[kind]['created'] += len(created)
+        self.stats[kind]['updated'] += len(updated) + len(rerendered)
+        return created + updated + rerendered
+
+    def refresh_derived_data(self):
+        """Rebuild what hello.signals would have kept current for ORM saves"""
+        if not any(stats['created'] or stats['updated'] for stats in self.stats.values()):
+            return
+        search.rebuild_index()
+
+        course_ids = [course_id for course_id in self.course_ids if course_id is not None]
+        cache.delete_many([OUTLINE_CACHE_KEY.format(course_id) for course_id in course_ids])
+        slugs = Course.objects.filter(id__in=course_ids).values_list('slug', flat=True).iterator()
+        invalidate_tags(*self.tags, *(f'course:{slug}' for slug in slugs))
+
+
+def field_values(model, row, fields, number, key=None):
+    """Model values for `fields`, defaulting missing ones like the model does"""
+    if key is not None and not row.get(key):
+        raise CatalogError(f'Line {number}: missing {key!r}')
+    values = {}
+    for name in fields:
+        field = model._meta.get_field(name)
+        value = row[name] if name in row else field.get_default()
+        if isinstance(field, models.DateTimeField) and isinstance(value, str):
+            value = parse_datetime(value)
+        values[name] = value
+    return values
+
+
+def rendered_values(row, fields):
+    return {name: row[name] for name in fields if name in row}
+
+
+def fill_rendered(obj, rendered, stored_key):
+    """Bring the HTML fields up to date, preferring HTML carried in the file
+
+    Returns False when the HTML already stored in the database is current.
+    """
+    key = obj.get_render_key()
+    if key == stored_key:
+        obj.rendered_key = key
+        return False
+    if rendered.get('rendered_key') == key:
+        for name, value in rendered.items():
+            setattr(obj, name, value)
+    else:
+        obj.render_markdown_fields(force=True)
+    return True
+
+
+def course_ids_by_slug(slugs):
+    slugs = {slug for slug in slugs if slug}
+    return dict(Course.objects.filter(slug__in=slugs).values_list('slug', 'id'))
+
+
+def lesson_ids_by_key(keys):
+    keys = {tuple(key) for key in keys if key}
+    lessons = Lesson.objects.filter(
+        course__slug__in={course_slug for course_slug, _slug in keys},
+        slug__in={slug for _course_slug, slug in keys},
+    ).values_list('course__slug', 'slug', 'id')
+    return {(course_slug, slug): lesson_id for course_slug, slug, lesson_id in lessons}
+
+
+def resolve(ids, key, kind, number):
+    """Id for a natural-key reference; None stays None"""
+    if key is None:
+        return None
+    try:
+        return ids[key]
+    except KeyError:
+        raise CatalogError(f'Line {number}: unknown {kind} {key!r}')
@@ -0,0 +1,9 @@
+"""
+Template context shared by every page
+"""
+from django.conf import settings
+
+
+def static_build(request):
+    """Whether base.html links the self-hosted asset build or the CDNs"""
+    return {'static_build': settings.STATIC_BUILD}
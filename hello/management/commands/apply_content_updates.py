@@ -0,0 +1,47 @@
+"""
+Management command to apply approved AI content updates to courses, lessons and labs
+Usage: python manage.py apply_content_updates [--type lesson] [--id 12 --id 15]
+"""
+from django.core.management.base import BaseCommand
+from hello.models import ContentUpdate
+from hello.services.content_updates import apply_updates
+
+
+class Command(BaseCommand):
+    help = 'Apply approved, not yet applied ContentUpdates in one transaction'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--type',
+            type=str,
+            choices=['course', 'lesson', 'lab'],
+            help='Only apply updates for this content type',
+        )
+        parser.add_argument(
+            '--id',
+            type=int,
+            action='append',
+            dest='ids',
+            help='Only apply this ContentUpdate (may be repeated)',
+        )
+
+    def handle(self, *args, **options):
+        updates = ContentUpdate.objects.all()
+        if options['type']:
+            updates = updates.filter(content_type=options['type'])
+        if options['ids']:
+            updates = updates.filter(pk__in=options['ids'])
+
+        result = apply_updates(updates)
+
+        if result.skipped:
+            self.stdout.write(
+                self.style.WARNING(f'{result.skipped} updates skipped because their content no longer exists')
+            )
+        if result.rejected:
+            self.stdout.write(
+                self.style.WARNING(f"{result.rejected} updates skipped because they don't follow the content's layout")
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f'{result.applied} updates applied across {result.courses} courses')
+        )
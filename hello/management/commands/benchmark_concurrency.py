@@ -0,0 +1,253 @@
+"""
+Management command to load-test a running server with many concurrent connections
+Usage: python manage.py benchmark_concurrency --base-url http://127.0.0.1:8000 --label wsgi
+       python manage.py benchmark_concurrency --base-url http://127.0.0.1:8001 --label asgi \
+           --compare benchmarks/concurrency-wsgi.json
+       python manage.py benchmark_concurrency --serve wsgi --serve asgi --slow-clients 8
+"""
+import asyncio
+import contextlib
+import importlib.util
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections import namedtuple
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from .benchmark_urls import Command as UrlBenchmark, percentile
+
+
+# How --serve starts each setup: modules it needs, arguments to python, extra environment
+ServerSetup = namedtuple('ServerSetup', ['modules', 'args', 'env'])
+
+SERVERS = {
+    'wsgi': ServerSetup(
+        ['gunicorn'],
+        ['-m', 'gunicorn', 'demo_site.wsgi:application', '--workers', '{workers}', '--bind', '127.0.0.1:{port}'],
+        {'ASYNC_VIEWS': 'False'},
+    ),
+    'asgi': ServerSetup(
+        ['gunicorn', 'uvicorn'],
+        ['-m', 'gunicorn', 'demo_site.asgi:application', '-k', 'uvicorn.workers.UvicornWorker',
+         '--workers', '{workers}', '--bind', '127.0.0.1:{port}'],
+        {'ASYNC_VIEWS': 'True'},
+    ),
+}
+
+
+class Command(BaseCommand):
+    help = 'Measure throughput and latency of a running server at increasing connection counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='Server to load (default: %(default)s)')
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            action='append',
+            help='Simultaneous connections, repeatable (default: 10, 50, 200, 500)',
+        )
+        parser.add_argument('--duration', type=float, default=10, help='Seconds per concurrency level (default: 10)')
+        parser.add_argument(
+            '--slow-clients',
+            type=int,
+            default=0,
+            help='Extra connections that trickle their request headers for the whole run, '
+                 'like visitors on a poor network (default: 0)',
+        )
+        parser.add_argument('--timeout', type=float, default=10, help='Seconds before a request counts as failed (default: 10)')
+        parser.add_argument('--label', default='', help='Name stored with the results, e.g. the server setup')
+        parser.add_argument('--output', help='JSON file for the results (default: benchmarks/concurrency-<label>.json)')
+        parser.add_argument('--compare', help='Earlier results file to compare throughput and p95 against')
+        parser.add_argument(
+            '--serve',
+            choices=sorted(SERVERS),
+            action='append',
+            help='Start this server setup on a free port and load it instead of --base-url; '
+                 'repeat to compare setups, the last against the first',
+        )
+        parser.add_argument('--workers', type=int, default=4, help='Worker processes per --serve setup (default: 4)')
+
+    def handle(self, *args, **options):
+        # The same URLs as benchmark_urls, with objects from this project's database
+        paths = UrlBenchmark(stdout=self.stdout, stderr=self.stderr).collect_urls()
+        levels = options['concurrency'] or [10, 50, 200, 500]
+
+        if not options['serve']:
+            report = self.benchmark(options['base_url'], paths, levels, options)
+            if options['compare']:
+                self.compare(json.loads(Path(options['compare']).read_text()), report)
+            return
+
+        reports = []
+        for name in options['serve']:
+            self.stdout.write(f'\n{name}, {options["workers"]} workers:')
+            with self.serve(name, options['workers']) as base_url:
+                reports.append(self.benchmark(base_url, paths, levels, {**options, 'label': name}))
+        if len(reports) > 1:
+            self.compare(reports[0], reports[-1])
+
+    def benchmark(self, base_url, paths, levels, options):
+        """Load `base_url` at each level and save the report"""
+        base = urlsplit(base_url)
+        if base.scheme != 'http' or not base.hostname:
+            raise CommandError('--base-url must be an http:// URL')
+        results = asyncio.run(self.run(base, paths, levels, options))
+
+        report = {
+            'label': options['label'],
+            'timestamp': timezone.now().isoformat(),
+            'base_url': base_url,
+            'duration': options['duration'],
+            'slow_clients': options['slow_clients'],
+            'results': results,
+        }
+        name = f"concurrency-{options['label'] or timezone.now().strftime('%Y%m%d-%H%M%S')}.json"
+        output = Path(options['output'] or Path(settings.BASE_DIR) / 'benchmarks' / name)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2))
+        self.stdout.write(self.style.SUCCESS(f'Results written to {output}'))
+        return report
+
+    @contextlib.contextmanager
+    def serve(self, name, workers):
+        """Run one SERVERS setup against this project's database for the duration of the block"""
+        setup = SERVERS[name]
+        missing = [module for module in setup.modules if importlib.util.find_spec(module) is None]
+        if missing:
+            raise CommandError(f'--serve {name} needs {", ".join(missing)}: pip install -r requirements.txt')
+
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        process = subprocess.Popen(
+            [sys.executable, *(arg.format(port=port, workers=workers) for arg in setup.args)],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, **setup.env},
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            deadline = time.monotonic() + 30
+            while True:
+                if process.poll() is not None:
+                    raise CommandError(f'The {name} server exited with status {process.returncode}')
+                try:
+                    socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                    break
+                except OSError:
+                    if time.monotonic() > deadline:
+                        raise CommandError(f'The {name} server did not start listening within 30s')
+                    time.sleep(0.1)
+            yield f'http://127.0.0.1:{port}'
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    async def run(self, base, paths, levels, options):
+        port = base.port or 80
+        slow = [
+            asyncio.create_task(self.slow_client(base.hostname, port))
+            for _ in range(options['slow_clients'])
+        ]
+        results = {}
+        try:
+            for level in levels:
+                results[str(level)] = await self.load(base.hostname, port, paths, level, options)
+                self.report(level, results[str(level)])
+        finally:
+            for task in slow:
+                task.cancel()
+            await asyncio.gather(*slow, return_exceptions=True)
+        return results
+
+    async def load(self, host, port, paths, concurrency, options):
+        """Keep `concurrency` requests in flight for the configured duration"""
+        deadline = time.monotonic() + options['duration']
+        urls = itertools.cycle(paths)
+        timings = []
+        errors = 0
+
+        async def worker():
+            nonlocal errors
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    status = await asyncio.wait_for(self.fetch(host, port, next(urls)), options['timeout'])
+                except (OSError, asyncio.TimeoutError, ValueError):
+                    errors += 1
+                    continue
+                if status != 200:
+                    errors += 1
+                    continue
+                timings.append((time.perf_counter() - started) * 1000)
+
+        started = time.monotonic()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.monotonic() - started
+
+        return {
+            'requests': len(timings),
+            'errors': errors,
+            'requests_per_second': round(len(timings) / elapsed, 1),
+            'p50_ms': round(percentile(timings, 0.50), 1) if timings else None,
+            'p95_ms': round(percentile(timings, 0.95), 1) if timings else None,
+            'p99_ms': round(percentile(timings, 0.99), 1) if timings else None,
+        }
+
+    async def fetch(self, host, port, path):
+        """One GET on a fresh connection; returns the status code once the body has been read"""
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            writer.write(
+                f'GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n'.encode('ascii')
+            )
+            await writer.drain()
+            status_line = await reader.readline()
+            await reader.read()
+            return int(status_line.split()[1])
+        finally:
+            writer.close()
+
+    async def slow_client(self, host, port):
+        """Hold a connection open by sending one header line every few seconds, never finishing the request"""
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            writer.write(f'GET / HTTP/1.1\r\nHost: {host}\r\n'.encode('ascii'))
+            for n in itertools.count():
+                await writer.drain()
+                await asyncio.sleep(5)
+                writer.write(f'X-Slow-{n}: 1\r\n'.encode('ascii'))
+        finally:
+            writer.close()
+
+    def report(self, level, result):
+        latency = (
+            f"p50 {result['p50_ms']:>8.1f}ms  p95 {result['p95_ms']:>8.1f}ms  p99 {result['p99_ms']:>8.1f}ms"
+            if result['requests'] else 'no successful requests'
+        )
+        self.stdout.write(
+            f"{level:>5} connections  {result['requests_per_second']:>8.1f} req/s  {latency}  "
+            f"{result['errors']} errors"
+        )
+
+    def compare(self, before, after):
+        self.stdout.write(f"\nCompared with {before.get('label') or before['timestamp']}:")
+        for level, result in after['results'].items():
+            previous = before['results'].get(level)
+            if not previous:
+                continue
+            self.stdout.write(
+                f"{level:>5} connections  "
+                f"{previous['requests_per_second']:.1f} -> {result['requests_per_second']:.1f} req/s  "
+                f"p95 {previous['p95_ms']} -> {result['p95_ms']}ms  "
+                f"errors {previous['errors']} -> {result['errors']}"
+            )
@@ -0,0 +1,168 @@
+"""
+Management command to benchmark every public route in-process
+Usage: python manage.py benchmark_urls --iterations 50 --output benchmarks/baseline.json
+       python manage.py benchmark_urls --compare benchmarks/baseline.json
+"""
+import json
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, get_resolver, reverse
+from django.utils import timezone
+from hello.models import Course, Lesson, Lab, LearningPath
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = 'Measure latency, queries and allocations for every public URL'
+
+    # Extra query strings worth measuring on top of the bare route
+    VARIANTS = {
+        'course_list': ['?difficulty=beginner'],
+        'lab_list': ['?difficulty=easy'],
+        'search': ['?q=server'],
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50, help='Timed requests per URL (default: 50)')
+        parser.add_argument('--warmup', type=int, default=5, help='Untimed requests per URL first (default: 5)')
+        parser.add_argument(
+            '--page-cache',
+            action='store_true',
+            help='Keep the page cache enabled (default: measure the views with it disabled)',
+        )
+        parser.add_argument('--label', default='', help='Name stored with the results')
+        parser.add_argument('--output', help='JSON file for the results (default: benchmarks/<timestamp>.json)')
+        parser.add_argument('--compare', help='Earlier results file to compare p50/p95 latency against')
+
+    def handle(self, *args, **options):
+        urls = self.collect_urls()
+        client = Client(HTTP_HOST='localhost')
+        page_cache_seconds = settings.PAGE_CACHE_SECONDS if options['page_cache'] else 0
+
+        # A fresh page version starts the run cold without clearing the cache the site shares
+        page_version = f'{settings.PAGE_VERSION}-benchmark-{time.time_ns()}'
+
+        results = {}
+        with override_settings(PAGE_CACHE_SECONDS=page_cache_seconds, PAGE_VERSION=page_version):
+            for url in urls:
+                results[url] = self.benchmark(client, url, options['iterations'], options['warmup'])
+                self.report(url, results[url])
+
+        report = {
+            'label': options['label'],
+            'timestamp': timezone.now().isoformat(),
+            'iterations': options['iterations'],
+            'page_cache': bool(page_cache_seconds),
+            'catalog': {
+                'courses': Course.objects.count(),
+                'lessons': Lesson.objects.count(),
+                'labs': Lab.objects.count(),
+                'learning_paths': LearningPath.objects.count(),
+            },
+            'results': results,
+        }
+
+        output = Path(options['output'] or Path(settings.BASE_DIR) / 'benchmarks' / (
+            timezone.now().strftime('%Y%m%d-%H%M%S') + '.json'
+        ))
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2))
+        self.stdout.write(self.style.SUCCESS(f'Results written to {output}'))
+
+        if options['compare']:
+            self.compare(json.loads(Path(options['compare']).read_text()), report)
+
+    def collect_urls(self):
+        """One URL per named, non-admin route, plus the configured query variants"""
+        urls = []
+        for pattern in get_resolver().url_patterns:
+            if not isinstance(pattern, URLPattern) or not pattern.name:
+                continue
+            if pattern.pattern.converters:
+                kwargs = self.sample_kwargs(pattern.name)
+                if kwargs is None:
+                    self.stdout.write(self.style.WARNING(f'Skipping {pattern.name}: no sample for its URL kwargs'))
+                    continue
+                url = reverse(pattern.name, kwargs=kwargs)
+            else:
+                url = reverse(pattern.name)
+            urls.append(url)
+            urls.extend(url + query for query in self.VARIANTS.get(pattern.name, []))
+        return urls
+
+    def sample_kwargs(self, name):
+        """URL kwargs for a route that needs an object, from the first published row"""
+        try:
+            if name == 'course_detail':
+                return {'slug': Course.objects.filter(is_published=True).values_list('slug', flat=True)[0]}
+            if name == 'lesson_detail':
+                lesson = Lesson.objects.filter(is_published=True, course__is_published=True).select_related('course')[0]
+                return {'course_slug': lesson.course.slug, 'lesson_slug': lesson.slug}
+            if name == 'lab_detail':
+                return {'slug': Lab.objects.filter(is_published=True).values_list('slug', flat=True)[0]}
+            if name == 'learning_path_detail':
+                return {'slug': LearningPath.objects.values_list('slug', flat=True)[0]}
+        except IndexError:
+            raise CommandError(f'No content to benchmark {name}; run generate_catalog first')
+        return None
+
+    def benchmark(self, client, url, iterations, warmup):
+        for _ in range(warmup):
+            client.get(url)
+
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            response = client.get(url)
+            timings.append((time.perf_counter() - started) * 1000)
+
+        # Queries and allocations are measured separately so tracing doesn't skew the timings
+        tracemalloc.start()
+        with CaptureQueriesContext(connection) as queries:
+            client.get(url)
+        allocated, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return {
+            'status': response.status_code,
+            'bytes': len(response.content),
+            'p50_ms': round(percentile(timings, 0.50), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+            'p99_ms': round(percentile(timings, 0.99), 3),
+            'mean_ms': round(statistics.fmean(timings), 3),
+            'queries': len(queries),
+            'allocated_kb': round(allocated / 1024, 1),
+            'peak_kb': round(peak / 1024, 1),
+        }
+
+    def report(self, url, result):
+        self.stdout.write(
+            f"{url:<50} p50 {result['p50_ms']:>8.2f}ms  p95 {result['p95_ms']:>8.2f}ms  "
+            f"p99 {result['p99_ms']:>8.2f}ms  {result['queries']:>3} queries  {result['peak_kb']:>8.1f}KB peak"
+        )
+
+    def compare(self, before, after):
+        self.stdout.write(f"\nCompared with {before.get('label') or before['timestamp']}:")
+        for url, result in after['results'].items():
+            previous = before['results'].get(url)
+            if not previous:
+                continue
+            changes = [
+                f"{metric} {previous[metric]:.2f} -> {result[metric]:.2f}ms "
+                f"({(result[metric] - previous[metric]) / previous[metric] * 100 if previous[metric] else 0:+.0f}%)"
+                for metric in ('p50_ms', 'p95_ms')
+            ]
+            self.stdout.write(f"{url:<50} " + '  '.join(changes))
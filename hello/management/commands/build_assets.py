@@ -0,0 +1,120 @@
+"""
+Management command to build the self-hosted CSS and icon font
+Usage: npm install
+       python manage.py build_assets
+       python manage.py collectstatic --noinput
+"""
+import json
+import re
+import subprocess
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from hello.models import LearningPath
+
+
+NODE_MODULES = settings.BASE_DIR / 'node_modules'
+BUILD_DIR = settings.BASE_DIR / 'static' / 'build'
+TEMPLATE_DIR = settings.BASE_DIR / 'templates'
+
+FONT_AWESOME = NODE_MODULES / '@fortawesome' / 'fontawesome-free'
+
+ICON_CLASS = re.compile(r'\bfa-([a-z0-9]+(?:-[a-z0-9]+)*)')
+
+# fa-* classes that style an icon rather than name one
+ICON_MODIFIERS = {
+    'solid', 'regular', 'brands', 'fw', 'spin', 'pulse', 'border', 'inverse',
+    'xs', 'sm', 'lg', 'xl', '2x', '3x', '4x', '5x',
+}
+
+ICON_CSS = """@font-face{font-family:"Font Awesome 6 Free";font-style:normal;font-weight:900;font-display:block;src:url(fa-icons.woff2) format("woff2")}
+.fa,.fas,.fa-solid{font-family:"Font Awesome 6 Free";font-weight:900;font-style:normal;font-variant:normal;line-height:1;display:inline-block;text-rendering:auto;-webkit-font-smoothing:antialiased;-moz-osx-font-smoothing:grayscale}
+"""
+
+
+def used_icons(template_dir=TEMPLATE_DIR):
+    """Names of the Font Awesome icons referenced by any template or chosen as a learning path's icon"""
+    names = set()
+    for path in Path(template_dir).rglob('*.html'):
+        names.update(ICON_CLASS.findall(path.read_text(encoding='utf-8')))
+    # Templates only show {{ path.icon }}; the classes themselves are data
+    for icon in LearningPath.objects.exclude(icon='').values_list('icon', flat=True):
+        names.update(ICON_CLASS.findall(icon))
+    return names - ICON_MODIFIERS
+
+
+def icon_codepoints(names, metadata):
+    """{icon name: codepoint} for the solid icons in `names`, resolving Font Awesome 5 aliases
+
+    Returns the mapping and the names that aren't free solid icons.
+    """
+    by_name = {}
+    for name, icon in metadata.items():
+        if 'solid' not in icon.get('free', icon.get('styles', [])):
+            continue
+        for alias in [name, *icon.get('aliases', {}).get('names', [])]:
+            by_name[alias] = int(icon['unicode'], 16)
+    found = {name: by_name[name] for name in names if name in by_name}
+    return found, sorted(set(names) - set(found))
+
+
+def icon_css(codepoints):
+    """Stylesheet for the subset font: the shared icon rules plus one rule per icon"""
+    rules = [f'.fa-{name}:before{{content:"\\{codepoint:x}"}}' for name, codepoint in sorted(codepoints.items())]
+    return ICON_CSS + '\n'.join(rules) + '\n'
+
+
+class Command(BaseCommand):
+    help = 'Build purged Tailwind CSS and a subset icon font into static/build'
+
+    def handle(self, *args, **options):
+        if not NODE_MODULES.exists():
+            raise CommandError('node_modules not found: run `npm install` first')
+        BUILD_DIR.mkdir(parents=True, exist_ok=True)
+
+        self.build_css()
+        self.build_icons()
+        self.stdout.write(self.style.SUCCESS(
+            f'Assets written to {BUILD_DIR}; run `python manage.py collectstatic` to fingerprint and compress them'
+        ))
+
+    def build_css(self):
+        """Tailwind CSS with only the classes the templates use"""
+        output = BUILD_DIR / 'site.css'
+        subprocess.run(
+            [
+                str(NODE_MODULES / '.bin' / 'tailwindcss'),
+                '--config', str(settings.BASE_DIR / 'tailwind.config.js'),
+                '--input', str(settings.BASE_DIR / 'assets' / 'tailwind.css'),
+                '--output', str(output),
+                '--minify',
+            ],
+            cwd=settings.BASE_DIR,
+            check=True,
+        )
+        self.stdout.write(f'site.css: {output.stat().st_size} bytes')
+
+    def build_icons(self):
+        """A woff2 holding only the icons the templates and learning paths use, plus their CSS"""
+        try:
+            from fontTools import subset
+        except ImportError:
+            raise CommandError('Subsetting the icon font needs fontTools: pip install fonttools brotli')
+
+        metadata = json.loads((FONT_AWESOME / 'metadata' / 'icons.json').read_text(encoding='utf-8'))
+        codepoints, unknown = icon_codepoints(used_icons(), metadata)
+        for name in unknown:
+            self.stdout.write(self.style.WARNING(f'Unknown icon fa-{name}, skipped'))
+
+        options = subset.Options()
+        options.flavor = 'woff2'
+        font = subset.load_font(str(FONT_AWESOME / 'webfonts' / 'fa-solid-900.ttf'), options)
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(unicodes=codepoints.values())
+        subsetter.subset(font)
+        subset.save_font(font, str(BUILD_DIR / 'fa-icons.woff2'), options)
+
+        (BUILD_DIR / 'icons.css').write_text(icon_css(codepoints), encoding='utf-8')
+        self.stdout.write(f'fa-icons.woff2: {len(codepoints)} icons')
@@ -0,0 +1,44 @@
+"""
+Management command to export the content catalog as NDJSON
+Usage: python manage.py export_content catalog.ndjson
+       python manage.py export_content catalog.ndjson.gz
+"""
+import gzip
+
+from django.core.management.base import BaseCommand
+from hello.catalog import export_lines
+
+
+class Command(BaseCommand):
+    help = 'Stream providers, courses, lessons, labs and learning paths to an NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default='-',
+            help='Output file, gzip-compressed if it ends in .gz (default: standard output)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Rows read from the database at a time (default: 2000)',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        lines = export_lines(options['batch_size'])
+
+        if path == '-':
+            for line in lines:
+                self.stdout.write(line)
+            return
+
+        opener = gzip.open if path.endswith('.gz') else open
+        count = 0
+        with opener(path, 'wt', encoding='utf-8') as output:
+            for line in lines:
+                output.write(line + '\n')
+                count += 1
+        self.stderr.write(self.style.SUCCESS(f'Exported {count} rows to {path}'))
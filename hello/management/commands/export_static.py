@@ -0,0 +1,81 @@
+"""
+Management command to export the public site as static HTML for nginx to serve
+Usage: python manage.py export_static [--output export] [--workers 8] [--force]
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from hello.static_export import MANIFEST_NAME, published_pages, remove_page, render_pages, write_file
+
+
+class Command(BaseCommand):
+    help = 'Render every published page to HTML with .gz/.br copies, re-rendering only pages whose content changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            default=str(settings.BASE_DIR / 'export'),
+            help='Directory to write the site to (default: %(default)s)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Rendering processes; 1 renders in this process (default: one per CPU)',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Re-render every page, even if its content is unchanged',
+        )
+
+    def handle(self, *args, **options):
+        output = Path(options['output'])
+        output.mkdir(parents=True, exist_ok=True)
+        manifest = output / MANIFEST_NAME
+        previous = json.loads(manifest.read_text()) if manifest.exists() else {}
+
+        pages = published_pages()
+        stale = [url for url, stamp in pages.items() if options['force'] or previous.get(url) != stamp]
+        removed = [url for url in previous if url not in pages]
+        for url in removed:
+            remove_page(output, url)
+
+        failed = {}
+        for url, error in self.render(stale, output, options['workers']):
+            if error:
+                failed[url] = error
+                self.stdout.write(self.style.WARNING(f'{url}: {error}'))
+
+        # Failed pages are left out, so the next run tries them again
+        write_file(manifest, json.dumps(
+            {url: stamp for url, stamp in pages.items() if url not in failed}, sort_keys=True
+        ).encode('utf-8'))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(stale) - len(failed)} pages rendered, {len(pages) - len(stale)} unchanged, '
+            f'{len(removed)} removed, {len(failed)} failed; written to {output}'
+        ))
+
+    def render(self, urls, output, workers):
+        """[(url, error or None)] for `urls`, rendered across `workers` processes"""
+        if workers <= 1 or len(urls) <= 1:
+            return render_pages(urls, output)
+
+        # Several chunks per worker keep them all busy until the end
+        size = max(1, len(urls) // (workers * 4))
+        chunks = [urls[start:start + size] for start in range(0, len(urls), size)]
+        # Forked workers mustn't share this process's database connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as executor:
+            results = []
+            for chunk_results in executor.map(render_pages, chunks, [output] * len(chunks)):
+                results.extend(chunk_results)
+        return results
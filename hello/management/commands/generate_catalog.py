@@ -0,0 +1,199 @@
+"""
+Management command to bulk-generate a synthetic catalog for load and performance testing
+Usage: python manage.py generate_catalog --courses 1000 --lessons-per-course 20
+"""
+import random
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from hello import search
+from hello.caching import invalidate_tags
+from hello.models import MCPProvider, Course, Lesson, Lab, LearningPath
+from hello.outline import OUTLINE_CACHE_KEY
+
+
+SLUG_PREFIX = 'synthetic'
+
+WORDS = (
+    'server client resource prompt tool transport stdio http stream session context protocol '
+    'request response schema handler capability message notification sampling root cache token '
+    'error retry timeout model agent workflow security permission validation logging deployment'
+).split()
+
+LANGUAGES = ['python', 'javascript', 'json', 'bash']
+
+CODE_SAMPLES = {
+    'python': 'from mcp.server import Server\n\nserver = Server("{name}")\n\n@server.list_tools()\nasync def list_tools():\n    return []\n',
+    'javascript': 'import {{ Server }} from "@modelcontextprotocol/sdk/server/index.js";\n\nconst server = new Server({{ name: "{name}" }});\n',
+    'json': '{{\n  "mcpServers": {{\n    "{name}": {{ "command": "python", "args": ["server.py"] }}\n  }}\n}}\n',
+    'bash': 'pip install mcp\npython -m {name} --transport stdio\n',
+}
+
+
+class Command(BaseCommand):
+    help = 'Bulk-generate a synthetic catalog of courses, lessons, labs and learning paths'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=1000, help='Number of courses (default: 1000)')
+        parser.add_argument('--lessons-per-course', type=int, default=10, help='Lessons per course (default: 10)')
+        parser.add_argument('--labs-per-course', type=int, default=3, help='Labs per course (default: 3)')
+        parser.add_argument('--paths', type=int, default=20, help='Number of learning paths (default: 20)')
+        parser.add_argument('--courses-per-path', type=int, default=25, help='Courses in each path (default: 25)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, for reproducible catalogs (default: 0)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk insert (default: 1000)')
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Delete previously generated synthetic content first',
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+
+        if options['clear']:
+            self.clear()
+
+        with transaction.atomic():
+            providers = MCPProvider.objects.bulk_create(
+                MCPProvider(name=f'Synthetic Provider {i}', description=self.paragraph()) for i in range(3)
+            )
+            courses = self.create_courses(options['courses'])
+            lesson_count = self.create_lessons(courses, options['lessons_per_course'])
+            lab_count = self.create_labs(courses, options['labs_per_course'])
+            self.create_paths(courses, providers, options['paths'], options['courses_per_path'])
+
+        # Bulk inserts bypass the signals that keep the search index and caches
+        # current. The new slugs have no cached pages of their own, but the
+        # listings do, and course ids freed by --clear may be reused.
+        search.rebuild_index()
+        cache.delete_many([OUTLINE_CACHE_KEY.format(course.id) for course in courses])
+        invalidate_tags('courses', 'labs', 'paths', 'providers')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {len(courses)} courses, {lesson_count} lessons, {lab_count} labs '
+            f'and {options["paths"]} learning paths'
+        ))
+
+    def clear(self):
+        """Remove synthetic rows; lessons and labs go with their courses"""
+        LearningPath.objects.filter(slug__startswith=SLUG_PREFIX).delete()
+        Course.objects.filter(slug__startswith=SLUG_PREFIX).delete()
+        MCPProvider.objects.filter(name__startswith='Synthetic Provider').delete()
+
+    def create_courses(self, count):
+        difficulties = ['beginner', 'intermediate', 'advanced']
+        # Continue numbering after an earlier run so slugs stay unique
+        start = Course.objects.filter(slug__startswith=SLUG_PREFIX).count()
+        courses = (
+            Course(
+                title=self.title(),
+                slug=f'{SLUG_PREFIX}-course-{start + i}',
+                description='\n\n'.join(self.paragraph() for _ in range(3)),
+                short_description=self.sentence()[:300],
+                difficulty_level=self.random.choice(difficulties),
+                estimated_time=self.random.randint(30, 600),
+                order=i,
+            )
+            for i in range(count)
+        )
+        return Course.objects.bulk_create(courses, batch_size=self.batch_size)
+
+    def create_lessons(self, courses, per_course):
+        def lessons():
+            for course in courses:
+                for j in range(per_course):
+                    lesson = Lesson(
+                        course_id=course.id,
+                        title=self.title(),
+                        slug=f'lesson-{j}',
+                        content=self.markdown_body(),
+                        order=j,
+                    )
+                    # bulk_create skips save(), so fill the stored HTML here
+                    lesson.render_markdown_fields()
+                    yield lesson
+
+        return self.bulk_create(Lesson, lessons())
+
+    def create_labs(self, courses, per_course):
+        def labs():
+            for course in courses:
+                for j in range(per_course):
+                    lab = Lab(
+                        course_id=course.id,
+                        title=self.title(),
+                        slug=f'{SLUG_PREFIX}-lab-{course.id}-{j}',
+                        description=self.paragraph(),
+                        instructions=self.markdown_body(),
+                        starter_code=CODE_SAMPLES['python'].format(name=f'lab-{j}'),
+                        difficulty=self.random.choice(['easy', 'medium', 'hard']),
+                        estimated_time=self.random.randint(15, 120),
+                        order=j,
+                    )
+                    lab.render_markdown_fields()
+                    yield lab
+
+        return self.bulk_create(Lab, labs())
+
+    def create_paths(self, courses, providers, count, per_path):
+        start = LearningPath.objects.filter(slug__startswith=SLUG_PREFIX).count()
+        paths = LearningPath.objects.bulk_create(
+            LearningPath(
+                name=self.title(),
+                slug=f'{SLUG_PREFIX}-path-{start + i}',
+                description=self.paragraph(),
+                provider=self.random.choice(providers + [None]),
+                icon='fas fa-code',
+                is_featured=i < 4,
+                order=i,
+            )
+            for i in range(count)
+        )
+        Membership = LearningPath.courses.through
+        memberships = (
+            Membership(learningpath_id=path.id, course_id=course.id)
+            for path in paths
+            for course in self.random.sample(courses, min(per_path, len(courses)))
+        )
+        self.bulk_create(Membership, memberships)
+
+    def bulk_create(self, model, objects):
+        """Insert a generator of objects in batches, keeping memory flat"""
+        total = 0
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                model.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            model.objects.bulk_create(batch)
+            total += len(batch)
+        return total
+
+    def title(self):
+        return ' '.join(self.random.sample(WORDS, 3)).title()
+
+    def sentence(self):
+        words = [self.random.choice(WORDS) for _ in range(self.random.randint(8, 18))]
+        return ' '.join(words).capitalize() + '.'
+
+    def paragraph(self):
+        return ' '.join(self.sentence() for _ in range(self.random.randint(3, 6)))
+
+    def markdown_body(self):
+        """A lesson-sized Markdown document with headings, lists and code"""
+        sections = [f'# {self.title()}', self.paragraph()]
+        for _ in range(self.random.randint(3, 6)):
+            language = self.random.choice(LANGUAGES)
+            sections += [
+                f'## {self.title()}',
+                self.paragraph(),
+                '\n'.join(f'- {self.sentence()}' for _ in range(self.random.randint(2, 5))),
+                f'```{language}\n{CODE_SAMPLES[language].format(name=self.random.choice(WORDS))}```',
+                self.paragraph(),
+            ]
+        return '\n\n'.join(sections)
@@ -0,0 +1,45 @@
+"""
+Management command to import an NDJSON content catalog written by export_content
+Usage: python manage.py import_content catalog.ndjson
+"""
+import gzip
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from hello.catalog import CatalogError, CatalogImporter
+
+
+class Command(BaseCommand):
+    help = 'Create or update content from an NDJSON catalog, matching rows by slug'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='Input file, gzip-compressed if it ends in .gz, or - for standard input',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows written per bulk insert or update (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        importer = CatalogImporter(batch_size=options['batch_size'])
+
+        try:
+            if path == '-':
+                stats = importer.load(sys.stdin)
+            else:
+                opener = gzip.open if path.endswith('.gz') else open
+                with opener(path, 'rt', encoding='utf-8') as lines:
+                    stats = importer.load(lines)
+        except (CatalogError, OSError) as error:
+            raise CommandError(error)
+
+        for kind, counts in stats.items():
+            self.stdout.write(self.style.SUCCESS(
+                f"{kind}: {counts['created']} created, {counts['updated']} updated, "
+                f"{counts['unchanged']} unchanged"
+            ))
@@ -0,0 +1,87 @@
+"""
+Management command to move the AI update log out of the catalog database
+Usage: python manage.py migrate --database updates
+       python manage.py move_update_log [--purge]
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+
+from hello.models import ContentBatch, ContentUpdate
+
+
+class Command(BaseCommand):
+    help = 'Copy ContentUpdate and ContentBatch rows from the catalog database into the updates database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--purge',
+            action='store_true',
+            help='Then delete the copied rows from the catalog database and VACUUM it',
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows per INSERT (default: 500)')
+
+    def handle(self, *args, **options):
+        source = connections[DEFAULT_DB_ALIAS]
+        tables = source.introspection.table_names()
+
+        for model in [ContentBatch, ContentUpdate]:
+            target = router.db_for_write(model)
+            if target == DEFAULT_DB_ALIAS:
+                raise CommandError(f'{model.__name__} is not routed to a separate database')
+            if model._meta.db_table not in tables:
+                self.stdout.write(f'{model.__name__}: no table in the catalog database, nothing to move')
+                continue
+
+            copied = self.copy_rows(model, target, options['batch_size'])
+            self.stdout.write(f'{model.__name__}: {copied} rows copied to {target!r}')
+            if options['purge']:
+                deleted, _ = model.objects.using(DEFAULT_DB_ALIAS).all().delete()
+                self.stdout.write(f'{model.__name__}: {deleted} rows deleted from the catalog database')
+
+        if options['purge']:
+            with source.cursor() as cursor:
+                cursor.execute('VACUUM')
+        self.stdout.write(self.style.SUCCESS('Update log moved'))
+
+    def copy_rows(self, model, target, batch_size):
+        """Insert the rows the target doesn't have yet, keeping ids and timestamps
+
+        Rows are written with plain INSERTs rather than bulk_create, which would
+        overwrite created_at. Rows are copied in id order, so an interrupted run
+        carries on from the highest id already copied. The catalog's copy of the
+        table stopped migrating when the router was added, so only the columns
+        it has are read; fields added since then get their defaults.
+        """
+        source = connections[DEFAULT_DB_ALIAS]
+        with source.cursor() as cursor:
+            columns = {
+                column.name for column in source.introspection.get_table_description(cursor, model._meta.db_table)
+            }
+        fields = model._meta.concrete_fields
+        present = [field for field in fields if field.column in columns]
+
+        connection = connections[target]
+        names = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+        placeholders = ', '.join(['%s'] * len(fields))
+        sql = f'INSERT INTO {connection.ops.quote_name(model._meta.db_table)} ({names}) VALUES ({placeholders})'
+
+        last_id = model.objects.using(target).order_by('-pk').values_list('pk', flat=True).first() or 0
+        rows = model.objects.using(DEFAULT_DB_ALIAS).filter(pk__gt=last_id).order_by('pk').values(
+            *[field.attname for field in present]
+        )
+        copied = 0
+        batch = []
+        with transaction.atomic(using=target), connection.cursor() as cursor:
+            for row in rows.iterator(chunk_size=batch_size):
+                batch.append([
+                    field.get_db_prep_save(row.get(field.attname, field.get_default()), connection)
+                    for field in fields
+                ])
+                if len(batch) == batch_size:
+                    cursor.executemany(sql, batch)
+                    copied += len(batch)
+                    batch = []
+            if batch:
+                cursor.executemany(sql, batch)
+                copied += len(batch)
+        return copied
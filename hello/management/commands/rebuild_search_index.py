@@ -0,0 +1,18 @@
+"""
+Management command to rebuild the full-text search index
+Usage: python manage.py rebuild_search_index
+"""
+from django.core.management.base import BaseCommand
+from hello import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the FTS5 search index for courses, lessons and labs'
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            self.stdout.write(self.style.ERROR('Full-text search requires the SQLite database backend'))
+            return
+
+        search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt'))
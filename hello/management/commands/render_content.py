@@ -0,0 +1,53 @@
+"""
+Management command to rebuild the stored HTML for lessons and labs
+Usage: python manage.py render_content [--force]
+"""
+from django.core.management.base import BaseCommand
+from hello.models import Lesson, Lab
+
+
+class Command(BaseCommand):
+    help = 'Re-render stored Markdown HTML whose source or renderer version changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Re-render every row, even if its render key is current',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Rows written per bulk update (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        force = options.get('force')
+        batch_size = options.get('batch_size')
+
+        for model in (Lesson, Lab):
+            rendered = self.render_model(model, force, batch_size)
+            self.stdout.write(
+                self.style.SUCCESS(f'{model._meta.verbose_name_plural}: {rendered} re-rendered')
+            )
+
+    def render_model(self, model, force, batch_size):
+        """Re-render stale rows of one model, writing them back in bulk"""
+        fields = ['rendered_key', *model.rendered_fields.values()]
+        queryset = model.objects.only('pk', 'rendered_key', *model.rendered_fields)
+        pending = []
+        rendered = 0
+
+        for obj in queryset.iterator(chunk_size=batch_size):
+            if obj.render_markdown_fields(force=force):
+                pending.append(obj)
+            if len(pending) >= batch_size:
+                model.objects.bulk_update(pending, fields)
+                rendered += len(pending)
+                pending = []
+
+        if pending:
+            model.objects.bulk_update(pending, fields)
+            rendered += len(pending)
+        return rendered
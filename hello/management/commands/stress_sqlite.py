@@ -0,0 +1,155 @@
+"""
+Management command to check that readers keep working while a long write transaction runs
+Usage: python manage.py stress_sqlite --duration 10 --readers 8
+       python manage.py stress_sqlite --profile tuned --rows-per-transaction 500
+"""
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from hello.models import Lesson
+
+from .benchmark_urls import percentile
+
+
+PROFILES = {
+    # Django's SQLite defaults: rollback journal, sqlite3's 5 second busy timeout
+    'default': {},
+    'tuned': settings.SQLITE_PRAGMAS,
+}
+
+
+def connect(path, pragmas):
+    """An autocommit connection to `path` with `pragmas` applied, as Django's init_command would"""
+    db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    for name, value in pragmas.items():
+        db.execute(f'PRAGMA {name}={value}')
+    return db
+
+
+class Command(BaseCommand):
+    help = 'Run concurrent readers against a copy of the database while a writer commits large transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profile',
+            choices=sorted(PROFILES),
+            action='append',
+            help='Connection profile to test, repeatable (default: both)',
+        )
+        parser.add_argument('--duration', type=float, default=5, help='Seconds per profile (default: 5)')
+        parser.add_argument('--readers', type=int, default=4, help='Concurrent reader threads (default: 4)')
+        parser.add_argument(
+            '--rows-per-transaction',
+            type=int,
+            default=200,
+            help='Rows the writer inserts per transaction (default: 200)',
+        )
+        parser.add_argument(
+            '--row-size',
+            type=int,
+            default=16 * 1024,
+            help='Characters of text per row, about one generated lesson (default: 16384)',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('stress_sqlite only applies to SQLite databases')
+
+        with TemporaryDirectory() as tmp:
+            for profile in options['profile'] or ['default', 'tuned']:
+                # A fresh copy per profile: journal_mode=WAL is stored in the file
+                path = Path(tmp) / f'{profile}.sqlite3'
+                self.copy_database(path)
+                result = self.run(path, PROFILES[profile], options)
+                self.report(profile, result)
+
+    def copy_database(self, path):
+        """Back up the catalog database to `path`, so the run never touches real data"""
+        connection.ensure_connection()
+        target = sqlite3.connect(path)
+        try:
+            connection.connection.backup(target)
+            # Stands in for the writes of update_content and apply_content_updates
+            target.execute('CREATE TABLE stress_writes (body TEXT NOT NULL)')
+        finally:
+            target.close()
+
+    def run(self, path, pragmas, options):
+        deadline = time.monotonic() + options['duration']
+        timings = []
+        stats = {'read_errors': 0, 'transactions': 0, 'write_errors': 0}
+        lock = threading.Lock()
+
+        def write():
+            db = connect(path, pragmas)
+            row = ('x' * options['row_size'],)
+            try:
+                while time.monotonic() < deadline:
+                    try:
+                        db.execute('BEGIN IMMEDIATE')
+                        db.executemany(
+                            'INSERT INTO stress_writes (body) VALUES (?)', [row] * options['rows_per_transaction']
+                        )
+                        db.execute('COMMIT')
+                        stats['transactions'] += 1
+                    except sqlite3.OperationalError:
+                        if db.in_transaction:
+                            db.execute('ROLLBACK')
+                        stats['write_errors'] += 1
+            finally:
+                db.close()
+
+        def read():
+            db = connect(path, pragmas)
+            try:
+                while time.monotonic() < deadline:
+                    started = time.perf_counter()
+                    try:
+                        db.execute(
+                            f'SELECT id, title, content_html FROM {Lesson._meta.db_table} '
+                            'WHERE is_published ORDER BY id LIMIT 20'
+                        ).fetchall()
+                    except sqlite3.OperationalError:
+                        with lock:
+                            stats['read_errors'] += 1
+                        continue
+                    with lock:
+                        timings.append((time.perf_counter() - started) * 1000)
+            finally:
+                db.close()
+
+        threads = [threading.Thread(target=write)]
+        threads += [threading.Thread(target=read) for _ in range(options['readers'])]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        return {
+            **stats,
+            'reads': len(timings),
+            'reads_per_second': round(len(timings) / elapsed, 1),
+            'p50_ms': round(percentile(timings, 0.50), 2) if timings else None,
+            'p95_ms': round(percentile(timings, 0.95), 2) if timings else None,
+            'max_ms': round(max(timings), 2) if timings else None,
+        }
+
+    def report(self, profile, result):
+        latency = (
+            f"p50 {result['p50_ms']:>8.2f}ms  p95 {result['p95_ms']:>8.2f}ms  max {result['max_ms']:>9.2f}ms"
+            if result['reads'] else 'no successful reads'
+        )
+        self.stdout.write(
+            f"{profile:<8} {result['reads_per_second']:>9.1f} reads/s  {latency}  "
+            f"{result['read_errors']} read errors  "
+            f"{result['transactions']} write transactions, {result['write_errors']} failed"
+        )
@@ -1,14 +1,54 @@
 """
 Management command to auto-update content using Claude API
 Usage: python manage.py update_content --type course --id 1
+       python manage.py update_content --all --concurrency 8
+       python manage.py update_content --all --batch
 """
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from django.db import models
-from hello.models import Course, Lesson, Lab, ContentUpdate
-from hello.services.claude_service import ClaudeService
+from hello.models import Course, Lesson, Lab, ContentUpdate, ContentBatch
+from hello.services.claude_service import ClaudeService, GenerationResult, is_retryable
+from hello.services.content_updates import (
+    aregenerate_sections, applied_section_hashes, changed_sections, fail_abandoned_updates, regenerate_sections,
+    stream_update, update_request_fields,
+)
+from hello.sections import split_sections
+from collections import namedtuple
+import asyncio
 import json
 import re
+import time
+
+
+CONTENT_MODELS = {'course': Course, 'lesson': Lesson, 'lab': Lab}
+
+# Everything needed to request, deduplicate and record one content refresh.
+# Lessons with several sections also carry them and the indexes to regenerate.
+UpdateRequest = namedtuple(
+    'UpdateRequest',
+    ['content_type', 'obj', 'update_focus', 'current_content', 'fingerprint', 'sections', 'changed'],
+    defaults=((), ()),
+)
+
+
+class RateLimiter:
+    """Space out request starts so a run stays under a requests-per-minute cap"""
+
+    def __init__(self, requests_per_minute):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0
+        self.next_start = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self.lock:
+            now = time.monotonic()
+            delay = self.next_start - now
+            self.next_start = max(now, self.next_start) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
 
 
 class Command(BaseCommand):
@@ -37,6 +77,45 @@ class Command(BaseCommand):
             default=7,
             help='Update content older than X days (default: 7)',
         )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=1,
+            help='With --all, number of Claude requests in flight at once (default: 1)',
+        )
+        parser.add_argument(
+            '--rpm',
+            type=int,
+            default=50,
+            help='With --concurrency, max requests started per minute, 0 for no cap (default: 50)',
+        )
+        parser.add_argument(
+            '--requeue',
+            type=int,
+            default=1,
+            help='With --all, extra passes over items that failed with a transient error (default: 1)',
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Refresh every section of a lesson, not just those changed since its last applied update',
+        )
+        parser.add_argument(
+            '--batch',
+            action='store_true',
+            help='With --all, submit every stale item as one Message Batch, or resume the unfinished one',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=int,
+            default=60,
+            help='With --batch, seconds between batch status checks (default: 60)',
+        )
+        parser.add_argument(
+            '--no-wait',
+            action='store_true',
+            help='With --batch, exit after submitting or checking the batch instead of polling until it ends',
+        )
 
     def handle(self, *args, **options):
         try:
@@ -49,144 +128,363 @@ class Command(BaseCommand):
         content_id = options.get('id')
         update_all = options.get('all')
         days_threshold = options.get('days')
+        concurrency = options.get('concurrency')
+        self.requeue_rounds = options.get('requeue')
+        self.full = options.get('full')
 
-        if update_all:
+        if update_all and options.get('batch'):
+            self.update_all_in_batch(
+                claude_service, days_threshold, options.get('poll_interval'), not options.get('no_wait')
+            )
+        elif update_all and concurrency > 1:
+            self.update_all_concurrently(claude_service, days_threshold, concurrency, options.get('rpm'))
+        elif update_all:
             self.update_all_content(claude_service, days_threshold)
         elif content_type and content_id:
             self.update_specific_content(claude_service, content_type, content_id)
         else:
             self.stdout.write(self.style.ERROR('Please specify --type and --id, or use --all'))
+        self.report_usage(claude_service)
+
+    def report_usage(self, claude_service):
+        """Print the run's token counts, showing how much of the input came from the prompt cache"""
+        usage = claude_service.usage
+        if not usage['requests']:
+            return
+        cached = usage['cache_read_input_tokens']
+        total_input = usage['input_tokens'] + usage['cache_creation_input_tokens'] + cached
+        self.stdout.write(
+            f"Tokens over {usage['requests']} requests: {total_input} input "
+            f"({cached} read from cache, {usage['cache_creation_input_tokens']} written to cache, "
+            f"{cached / total_input if total_input else 0:.0%} cached), {usage['output_tokens']} output"
+        )
 
     def update_specific_content(self, claude_service, content_type, content_id):
         """Update a specific piece of content"""
         if content_type == 'course':
             obj = Course.objects.get(id=content_id)
-            self.update_course(claude_service, obj)
+            result = self.update_course(claude_service, obj)
         elif content_type == 'lesson':
             obj = Lesson.objects.get(id=content_id)
-            self.update_lesson(claude_service, obj)
+            result = self.update_lesson(claude_service, obj)
         elif content_type == 'lab':
             obj = Lab.objects.get(id=content_id)
-            self.update_lab(claude_service, obj)
+            result = self.update_lab(claude_service, obj)
+        if not result.ok:
+            self.stdout.write(self.style.ERROR(f'Error updating {content_type}: {result.error}'))
+
+    def get_stale_content(self, claude_service, days_threshold):
+        """Update requests for published content not updated within the threshold
+        
+        Items whose fingerprint (source content, prompt template and model)
+        already has a pending update, or any update newer than the threshold,
+        are skipped: sending them again would only reproduce that result.
+        """
+        abandoned = fail_abandoned_updates()
+        if abandoned:
+            self.stdout.write(f'Marked {abandoned} abandoned generating updates as failed')
+        cutoff_date = timezone.now() - timezone.timedelta(days=days_threshold)
+        stale = models.Q(last_ai_update__isnull=True) | models.Q(last_ai_update__lt=cutoff_date)
+
+        items = []
+        for content_type, model in CONTENT_MODELS.items():
+            objects = list(model.objects.filter(is_published=True).filter(stale))
+            applied = {}
+            if content_type == 'lesson' and not self.full:
+                applied = applied_section_hashes([obj.id for obj in objects])
+            for obj in objects:
+                items.append(self.build_update_request(claude_service, content_type, obj, applied.get(obj.id, ())))
+
+        fingerprints = [item.fingerprint for item in items]
+        known = set(
+            ContentUpdate.objects.filter(fingerprint__in=fingerprints).filter(
+                models.Q(status='pending') | models.Q(created_at__gte=cutoff_date)
+            ).exclude(status='failed').values_list('fingerprint', flat=True)
+        )
+        items = [
+            item for item in items
+            if item.fingerprint not in known and (item.changed or not item.sections)
+        ]
+        if len(items) < len(fingerprints):
+            self.stdout.write(f'Skipping {len(fingerprints) - len(items)} items with unchanged content')
+        return items
 
     def update_all_content(self, claude_service, days_threshold):
         """Update all content that hasn't been updated recently"""
-        cutoff_date = timezone.now() - timezone.timedelta(days=days_threshold)
+        def run_pass(items):
+            results = []
+            for item in items:
+                self.stdout.write(f'Updating {item.content_type}: {item.obj.title}')
+                results.append(self.update_item(claude_service, item))
+            return results
+
+        items = self.get_stale_content(claude_service, days_threshold)
+        self.run_with_requeue(claude_service, items, run_pass)
+
+    def update_all_concurrently(self, claude_service, days_threshold, concurrency, rpm):
+        """Update stale content with up to `concurrency` Claude requests in flight"""
+        def run_pass(items):
+            results = asyncio.run(self.refresh_concurrently(claude_service, items, concurrency, rpm))
+            # Anything raised outside the API call (e.g. a database error) is not worth retrying
+            return [
+                GenerationResult(None, result, False) if isinstance(result, Exception) else result
+                for result in results
+            ]
+
+        items = self.get_stale_content(claude_service, days_threshold)
+        self.stdout.write(f'Updating {len(items)} items with concurrency {concurrency}')
+        self.run_with_requeue(claude_service, items, run_pass)
+
+    def run_with_requeue(self, claude_service, items, run_pass):
+        """Run `run_pass` over the items, then again over those that failed with a transient error
         
-        # Update courses
-        courses = Course.objects.filter(
-            is_published=True,
-        ).filter(
-            models.Q(last_ai_update__isnull=True) | models.Q(last_ai_update__lt=cutoff_date)
-        )
+        Requeued passes start once the circuit breaker lets calls through again.
+        Items still failing keep their old last_ai_update, so the next run
+        picks them up.
+        """
+        started = time.monotonic()
+        total = len(items)
+        generated = failed = 0
+
+        for round_number in range(self.requeue_rounds + 1):
+            requeued = []
+            for item, result in zip(items, run_pass(items)):
+                if result.ok:
+                    generated += 1
+                elif result.retryable and round_number < self.requeue_rounds:
+                    requeued.append(item)
+                else:
+                    failed += 1
+                    self.stdout.write(
+                        self.style.ERROR(f'Error updating {item.content_type} {item.obj.title}: {result.error}')
+                    )
+            if not requeued:
+                break
+            wait = claude_service.breaker.remaining
+            self.stdout.write(
+                self.style.WARNING(f'Requeueing {len(requeued)} items after transient errors')
+                + (f', waiting {wait:.0f}s for the API to recover' if wait else '')
+            )
+            time.sleep(wait)
+            items = requeued
+
+        elapsed = time.monotonic() - started
+        throughput = total / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'{generated} updates generated, {failed} failed '
+            f'in {elapsed:.1f}s ({throughput:.2f} items/s)'
+        ))
+        return generated, failed
+
+    async def refresh_concurrently(self, claude_service, items, concurrency, rpm):
+        """Run the refresh for every item, bounded by a semaphore and rate limiter
         
-        for course in courses:
-            self.stdout.write(f'Updating course: {course.title}')
-            self.update_course(claude_service, course)
+        Both apply per API request, so a lesson refreshed section by section
+        takes one slot for each section in flight.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        limiter = RateLimiter(rpm)
+
+        async def run_request(call):
+            async with semaphore:
+                await limiter.wait()
+                return await call()
+
+        async def refresh(item):
+            if item.sections:
+                result = await aregenerate_sections(
+                    claude_service, item.obj.title, item.sections, item.changed, item.update_focus,
+                    run_request=run_request,
+                )
+            else:
+                result = await run_request(lambda: claude_service.aupdate_existing_content(
+                    item.content_type,
+                    item.current_content,
+                    item.update_focus
+                ))
+
+            if not result.ok:
+                return result
+
+            # Written as each result arrives, so an interrupted run keeps its progress
+            await ContentUpdate.objects.acreate(
+                content_type=item.content_type,
+                content_id=item.obj.id,
+                fingerprint=item.fingerprint,
+                prompt_used=item.update_focus,
+                ai_response=result.text,
+                status='pending'
+            )
+            await CONTENT_MODELS[item.content_type].objects.filter(pk=item.obj.pk).aupdate(
+                last_ai_update=timezone.now()
+            )
+            self.stdout.write(
+                self.style.SUCCESS(f'{item.content_type.capitalize()} update generated for: {item.obj.title}')
+            )
+            return result
+
+        async with claude_service.async_session():
+            return await asyncio.gather(
+                *(refresh(item) for item in items),
+                return_exceptions=True,
+            )
+
+    def update_all_in_batch(self, claude_service, days_threshold, poll_interval, wait):
+        """Refresh stale content through the Message Batches API
         
-        # Update lessons
-        lessons = Lesson.objects.filter(
-            is_published=True,
-        ).filter(
-            models.Q(last_ai_update__isnull=True) | models.Q(last_ai_update__lt=cutoff_date)
+        Resumes the most recent unfinished batch if there is one, otherwise
+        submits a new batch. Results are ingested once the batch has ended.
+        """
+        batch = ContentBatch.objects.exclude(status='ingested').first()
+        if batch:
+            self.stdout.write(f'Resuming batch {batch.batch_id}')
+        else:
+            batch = self.submit_batch(claude_service, days_threshold)
+            if batch is None:
+                return
+
+        while batch.status == 'in_progress':
+            remote = claude_service.get_batch(batch.batch_id)
+            if remote.processing_status == 'ended':
+                batch.status = 'ended'
+                batch.ended_at = timezone.now()
+                batch.save(update_fields=['status', 'ended_at'])
+                break
+            counts = remote.request_counts
+            self.stdout.write(
+                f'Batch {batch.batch_id}: {counts.processing} processing, '
+                f'{counts.succeeded} succeeded, {counts.errored} errored'
+            )
+            if not wait:
+                return
+            time.sleep(poll_interval)
+
+        self.ingest_batch(claude_service, batch)
+
+    def submit_batch(self, claude_service, days_threshold):
+        """Submit every stale item as one Message Batch and persist its id"""
+        items = self.get_stale_content(claude_service, days_threshold)
+        if not items:
+            self.stdout.write('No content needs updating')
+            return None
+
+        requests = []
+        recorded = {}
+        for item in items:
+            custom_id = f'{item.content_type}-{item.obj.id}'
+            requests.append((custom_id, item.content_type, item.current_content, item.update_focus))
+            recorded[custom_id] = {'prompt_used': item.update_focus, 'fingerprint': item.fingerprint}
+
+        remote = claude_service.create_update_batch(requests)
+        batch = ContentBatch.objects.create(
+            batch_id=remote.id,
+            requests=recorded,
+            request_count=len(requests),
         )
+        self.stdout.write(self.style.SUCCESS(f'Submitted batch {batch.batch_id} with {len(requests)} requests'))
+        return batch
+
+    def ingest_batch(self, claude_service, batch, batch_size=500):
+        """Write the results of an ended batch as pending ContentUpdates in bulk"""
+        updates = []
+        updated_ids = {content_type: [] for content_type in CONTENT_MODELS}
+        failed = 0
+        for custom_id, text in claude_service.get_batch_results(batch.batch_id):
+            if not text:
+                failed += 1
+                continue
+            content_type, content_id = custom_id.rsplit('-', 1)
+            recorded = batch.requests.get(custom_id, {})
+            updates.append(ContentUpdate(
+                content_type=content_type,
+                content_id=int(content_id),
+                fingerprint=recorded.get('fingerprint', ''),
+                prompt_used=recorded.get('prompt_used', ''),
+                ai_response=text,
+                status='pending'
+            ))
+            updated_ids[content_type].append(int(content_id))
+
+        ContentUpdate.objects.bulk_create(updates, batch_size=batch_size)
+        now = timezone.now()
+        for content_type, ids in updated_ids.items():
+            CONTENT_MODELS[content_type].objects.filter(id__in=ids).update(last_ai_update=now)
+        batch.status = 'ingested'
+        batch.ingested_at = timezone.now()
+        batch.save(update_fields=['status', 'ingested_at'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Batch {batch.batch_id}: {len(updates)} updates ingested, {failed} failed'
+        ))
+
+    def build_update_request(self, claude_service, content_type, obj, applied_hashes=()):
+        """Build the UpdateRequest sent to Claude for an object
         
-        for lesson in lessons:
-            self.stdout.write(f'Updating lesson: {lesson.title}')
-            self.update_lesson(claude_service, lesson)
-        
-        # Update labs
-        labs = Lab.objects.filter(
-            is_published=True,
-        ).filter(
-            models.Q(last_ai_update__isnull=True) | models.Q(last_ai_update__lt=cutoff_date)
+        Lessons with more than one section are refreshed section by section,
+        skipping those whose hash is in `applied_hashes`.
+        """
+        current_content, update_focus = update_request_fields(content_type, obj)
+        fingerprint = claude_service.update_fingerprint(content_type, current_content, update_focus)
+        sections = split_sections(current_content) if content_type == 'lesson' else []
+        if len(sections) < 2:
+            return UpdateRequest(content_type, obj, update_focus, current_content, fingerprint)
+        return UpdateRequest(
+            content_type, obj, update_focus, current_content, fingerprint,
+            sections, changed_sections(sections, applied_hashes),
         )
+
+    def update_item(self, claude_service, item):
+        """Generate an update for one request and record it as a pending ContentUpdate
         
-        for lab in labs:
-            self.stdout.write(f'Updating lab: {lab.title}')
-            self.update_lab(claude_service, lab)
+        The response is streamed and checkpointed into the ContentUpdate, so a
+        timeout part way through keeps the text received so far. Admin can
+        review and approve the update before it is applied.
+        """
+        if item.sections:
+            return self.update_sections(claude_service, item)
+        try:
+            text = ''.join(stream_update(claude_service, item.content_type, item.obj))
+        except Exception as e:
+            return GenerationResult(None, e, is_retryable(e))
+        self.stdout.write(
+            self.style.SUCCESS(f'{item.content_type.capitalize()} update generated for: {item.obj.title}')
+        )
+        return GenerationResult(text, None, False)
+
+    def update_sections(self, claude_service, item):
+        """Regenerate the changed sections of a lesson in parallel and record the reassembled lesson"""
+        if not item.changed:
+            self.stdout.write(f'No sections of {item.obj.title} changed since its last applied update')
+            return GenerationResult('', None, False)
+
+        result = regenerate_sections(
+            claude_service, item.obj.title, item.sections, item.changed, item.update_focus
+        )
+        if not result.ok:
+            return result
+        ContentUpdate.objects.create(
+            content_type=item.content_type,
+            content_id=item.obj.id,
+            fingerprint=item.fingerprint,
+            prompt_used=item.update_focus,
+            ai_response=result.text,
+            status='pending'
+        )
+        CONTENT_MODELS[item.content_type].objects.filter(pk=item.obj.pk).update(last_ai_update=timezone.now())
+        self.stdout.write(self.style.SUCCESS(
+            f'Lesson update generated for: {item.obj.title} '
+            f'({len(item.changed)} of {len(item.sections)} sections refreshed)'
+        ))
+        return result
 
     def update_course(self, claude_service, course):
         """Update course content"""
-        try:
-            update_focus = f"Update course '{course.title}' with latest MCP server information and best practices"
-            current_content = f"Title: {course.title}\nDescription: {course.description}"
-            
-            updated_content = claude_service.update_existing_content(
-                'course',
-                current_content,
-                update_focus
-            )
-            
-            if updated_content:
-                # Create content update record
-                ContentUpdate.objects.create(
-                    content_type='course',
-                    content_id=course.id,
-                    prompt_used=update_focus,
-                    ai_response=updated_content,
-                    status='pending'
-                )
-                
-                # For now, we'll create the update record but not auto-apply
-                # Admin can review and approve
-                self.stdout.write(
-                    self.style.SUCCESS(f'Course update generated for: {course.title}')
-                )
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Error updating course: {e}'))
+        return self.update_item(claude_service, self.build_update_request(claude_service, 'course', course))
 
     def update_lesson(self, claude_service, lesson):
         """Update lesson content"""
-        try:
-            update_focus = f"Update lesson '{lesson.title}' with latest information"
-            current_content = lesson.content
-            
-            updated_content = claude_service.update_existing_content(
-                'lesson',
-                current_content,
-                update_focus
-            )
-            
-            if updated_content:
-                ContentUpdate.objects.create(
-                    content_type='lesson',
-                    content_id=lesson.id,
-                    prompt_used=update_focus,
-                    ai_response=updated_content,
-                    status='pending'
-                )
-                
-                self.stdout.write(
-                    self.style.SUCCESS(f'Lesson update generated for: {lesson.title}')
-                )
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Error updating lesson: {e}'))
+        applied = () if self.full else applied_section_hashes([lesson.id]).get(lesson.id, ())
+        return self.update_item(claude_service, self.build_update_request(claude_service, 'lesson', lesson, applied))
 
     def update_lab(self, claude_service, lab):
         """Update lab content"""
-        try:
-            update_focus = f"Update lab '{lab.title}' with latest best practices"
-            current_content = f"{lab.description}\n\n{lab.instructions}"
-            
-            updated_content = claude_service.update_existing_content(
-                'lab',
-                current_content,
-                update_focus
-            )
-            
-            if updated_content:
-                ContentUpdate.objects.create(
-                    content_type='lab',
-                    content_id=lab.id,
-                    prompt_used=update_focus,
-                    ai_response=updated_content,
-                    status='pending'
-                )
-                
-                self.stdout.write(
-                    self.style.SUCCESS(f'Lab update generated for: {lab.title}')
-                )
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Error updating lab: {e}'))
-
+        return self.update_item(claude_service, self.build_update_request(claude_service, 'lab', lab))
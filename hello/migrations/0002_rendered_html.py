@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:23
+
+import hashlib
+
+import markdown
+from django.db import migrations, models
+
+
+# The renderer as it stood when this migration was written (RENDERER_VERSION
+# '1'), frozen here so later changes to hello.rendering don't alter it. Rows
+# keyed with it are brought up to date by `render_content` or on first view.
+RENDERER_VERSION = '1'
+
+
+def render_key(*sources):
+    digest = hashlib.sha256(RENDERER_VERSION.encode('utf-8'))
+    for source in sources:
+        digest.update(b'\0')
+        digest.update((source or '').encode('utf-8'))
+    return digest.hexdigest()
+
+
+def render_existing(apps, schema_editor):
+    """Populate the stored HTML for rows created before this migration"""
+    sources = {
+        'Lesson': {'content': 'content_html'},
+        'Lab': {'description': 'description_html', 'instructions': 'instructions_html'},
+    }
+    for model_name, fields in sources.items():
+        model = apps.get_model('hello', model_name)
+        for obj in model.objects.iterator():
+            for source, target in fields.items():
+                setattr(obj, target, markdown.markdown(getattr(obj, source) or ''))
+            obj.rendered_key = render_key(*(getattr(obj, source) for source in fields))
+            obj.save(update_fields=['rendered_key', *fields.values()])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hello', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lab',
+            name='description_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='lab',
+            name='instructions_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='lab',
+            name='rendered_key',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='content_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='rendered_key',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.RunPython(render_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hello', '0002_rendered_html'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('batch_id', models.CharField(max_length=100, unique=True)),
+                ('status', models.CharField(choices=[('in_progress', 'In Progress'), ('ended', 'Ended'), ('ingested', 'Ingested')], default='in_progress', max_length=20)),
+                ('requests', models.JSONField(default=dict, help_text='custom_id -> prompt used for each request')),
+                ('request_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('ended_at', models.DateTimeField(blank=True, null=True)),
+                ('ingested_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'content batches',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hello', '0003_content_batch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contentupdate',
+            name='fingerprint',
+            field=models.CharField(blank=True, db_index=True, help_text='Hash of the source content, prompt template and model this update was generated from', max_length=64),
+        ),
+    ]
@@ -0,0 +1,59 @@
+from django.db import migrations
+
+
+# The index as hello.search defined it when this migration was written, frozen
+# here so later changes to that module (or the models it imports) don't alter it
+INDEX_TABLE = 'hello_search_index'
+
+CREATE_SQL = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {INDEX_TABLE} USING fts5(
+    kind UNINDEXED,
+    object_id UNINDEXED,
+    published UNINDEXED,
+    title,
+    body,
+    tokenize = 'porter unicode61'
+)
+"""
+
+SOURCES = [
+    """
+        SELECT c.id * 4 + 1, 'course', c.id, c.is_published, c.title,
+               c.short_description || char(10) || c.description
+        FROM hello_course c
+    """,
+    """
+        SELECT l.id * 4 + 2, 'lesson', l.id, l.is_published AND c.is_published, l.title, l.content
+        FROM hello_lesson l JOIN hello_course c ON c.id = l.course_id
+    """,
+    """
+        SELECT b.id * 4 + 3, 'lab', b.id, b.is_published AND coalesce(c.is_published, 1), b.title,
+               b.description || char(10) || b.instructions
+        FROM hello_lab b LEFT JOIN hello_course c ON c.id = b.course_id
+    """,
+]
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(CREATE_SQL)
+    for select in SOURCES:
+        schema_editor.execute(f'INSERT INTO {INDEX_TABLE} (rowid, kind, object_id, published, title, body) {select}')
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f'DROP TABLE IF EXISTS {INDEX_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hello', '0004_content_update_fingerprint'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
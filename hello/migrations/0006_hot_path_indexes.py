@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hello', '0005_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contentupdate',
+            index=models.Index(fields=['-created_at'], name='update_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contentupdate',
+            index=models.Index(fields=['content_type', 'content_id'], name='update_content_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['order', 'title'], name='course_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['difficulty_level', 'order', 'title'], name='course_difficulty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lab',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['order', 'title'], name='lab_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lab',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['difficulty', 'order', 'title'], name='lab_difficulty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lab',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['course', 'order', 'title'], name='lab_course_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='learningpath',
+            index=models.Index(fields=['order', 'name'], name='path_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='learningpath',
+            index=models.Index(condition=models.Q(('is_featured', True)), fields=['order', 'name'], name='path_featured_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['course', 'order', 'title'], name='lesson_course_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mcpprovider',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['name'], name='provider_active_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hello', '0007_content_update_streaming_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lab',
+            name='starter_code_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hello', '0008_lab_starter_code_html'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='learningpath',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='mcpprovider',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -1,8 +1,58 @@
+import asyncio
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.urls import reverse
 
+from . import rendering
+
+
+class RenderedMarkdownMixin:
+    """Keep stored ``*_html`` fields in sync with their Markdown source fields"""
+    # Maps Markdown source field -> rendered HTML field
+    rendered_fields = {}
+    # Source fields holding code, highlighted as a listing rather than rendered as Markdown
+    code_fields = ()
+    
+    def get_render_key(self):
+        return rendering.render_key(*(getattr(self, source) for source in self.rendered_fields))
+    
+    def needs_render(self):
+        return self.rendered_key != self.get_render_key()
+    
+    def render_markdown_fields(self, force=False):
+        """Re-render the HTML fields if the source or renderer changed"""
+        key = self.get_render_key()
+        if not force and key == self.rendered_key:
+            return False
+        for source, target in self.rendered_fields.items():
+            render = rendering.highlight_code if source in self.code_fields else rendering.render_markdown
+            setattr(self, target, render(getattr(self, source)))
+        self.rendered_key = key
+        return True
+    
+    def ensure_rendered(self):
+        """Render and persist stale HTML without touching ``updated_at``"""
+        if self.render_markdown_fields():
+            values = {target: getattr(self, target) for target in self.rendered_fields.values()}
+            type(self).objects.filter(pk=self.pk).update(rendered_key=self.rendered_key, **values)
+    
+    async def aensure_rendered(self):
+        """Async variant of ensure_rendered; the Markdown is rendered in a thread, off the event loop"""
+        if await asyncio.to_thread(self.render_markdown_fields):
+            values = {target: getattr(self, target) for target in self.rendered_fields.values()}
+            await type(self).objects.filter(pk=self.pk).aupdate(rendered_key=self.rendered_key, **values)
+    
+    def save(self, *args, **kwargs):
+        if self.render_markdown_fields():
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {
+                    *update_fields, 'rendered_key', *self.rendered_fields.values()
+                }
+        super().save(*args, **kwargs)
+
 
 class MCPProvider(models.Model):
     """MCP Server Providers (Claude, OpenAI, etc.)"""
@@ -12,9 +62,13 @@ class MCPProvider(models.Model):
     logo = models.ImageField(upload_to='providers/', blank=True, null=True)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['name'], condition=models.Q(is_active=True), name='provider_active_idx'),
+        ]
     
     def __str__(self):
         return self.name
@@ -45,6 +99,16 @@ class Course(models.Model):
     
     class Meta:
         ordering = ['order', 'title']
+        # Partial indexes: Django filters booleans as a bare `WHERE is_published`,
+        # which SQLite can only serve from an index with the same condition
+        indexes = [
+            models.Index(fields=['order', 'title'], condition=models.Q(is_published=True), name='course_published_idx'),
+            models.Index(
+                fields=['difficulty_level', 'order', 'title'],
+                condition=models.Q(is_published=True),
+                name='course_difficulty_idx',
+            ),
+        ]
     
     def __str__(self):
         return self.title
@@ -53,21 +117,32 @@ class Course(models.Model):
         return reverse('course_detail', kwargs={'slug': self.slug})
 
 
-class Lesson(models.Model):
+class Lesson(RenderedMarkdownMixin, models.Model):
     """Individual lessons within a course"""
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='lessons')
     title = models.CharField(max_length=200)
     slug = models.SlugField()
     content = models.TextField(help_text="Markdown supported")
+    content_html = models.TextField(blank=True, editable=False)
+    rendered_key = models.CharField(max_length=64, blank=True, editable=False)
     order = models.IntegerField(default=0)
     is_published = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     last_ai_update = models.DateTimeField(null=True, blank=True)
     
+    rendered_fields = {'content': 'content_html'}
+    
     class Meta:
         ordering = ['order', 'title']
         unique_together = ['course', 'slug']
+        indexes = [
+            models.Index(
+                fields=['course', 'order', 'title'],
+                condition=models.Q(is_published=True),
+                name='lesson_course_published_idx',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.course.title} - {self.title}"
@@ -76,7 +151,7 @@ class Lesson(models.Model):
         return reverse('lesson_detail', kwargs={'course_slug': self.course.slug, 'lesson_slug': self.slug})
 
 
-class Lab(models.Model):
+class Lab(RenderedMarkdownMixin, models.Model):
     """Hands-on labs and exercises"""
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='labs', null=True, blank=True)
     lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='labs', null=True, blank=True)
@@ -86,6 +161,10 @@ class Lab(models.Model):
     instructions = models.TextField(help_text="Markdown supported")
     starter_code = models.TextField(blank=True, help_text="Initial code for students")
     solution_code = models.TextField(blank=True, help_text="Solution code (hidden from students)")
+    description_html = models.TextField(blank=True, editable=False)
+    instructions_html = models.TextField(blank=True, editable=False)
+    starter_code_html = models.TextField(blank=True, editable=False)
+    rendered_key = models.CharField(max_length=64, blank=True, editable=False)
     difficulty = models.CharField(
         max_length=20,
         choices=[
@@ -102,8 +181,28 @@ class Lab(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     last_ai_update = models.DateTimeField(null=True, blank=True)
     
+    rendered_fields = {
+        'description': 'description_html',
+        'instructions': 'instructions_html',
+        'starter_code': 'starter_code_html',
+    }
+    code_fields = ('starter_code',)
+    
     class Meta:
         ordering = ['order', 'title']
+        indexes = [
+            models.Index(fields=['order', 'title'], condition=models.Q(is_published=True), name='lab_published_idx'),
+            models.Index(
+                fields=['difficulty', 'order', 'title'],
+                condition=models.Q(is_published=True),
+                name='lab_difficulty_idx',
+            ),
+            models.Index(
+                fields=['course', 'order', 'title'],
+                condition=models.Q(is_published=True),
+                name='lab_course_published_idx',
+            ),
+        ]
     
     def __str__(self):
         return self.title
@@ -122,9 +221,14 @@ class LearningPath(models.Model):
     icon = models.CharField(max_length=50, blank=True, help_text="Icon class name (e.g., 'fa-code')")
     is_featured = models.BooleanField(default=False)
     order = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['order', 'name']
+        indexes = [
+            models.Index(fields=['order', 'name'], name='path_order_idx'),
+            models.Index(fields=['order', 'name'], condition=models.Q(is_featured=True), name='path_featured_idx'),
+        ]
     
     def __str__(self):
         return self.name
@@ -144,11 +248,19 @@ class ContentUpdate(models.Model):
         ]
     )
     content_id = models.IntegerField()
+    fingerprint = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        help_text="Hash of the source content, prompt template and model this update was generated from"
+    )
     prompt_used = models.TextField()
     ai_response = models.TextField()
     status = models.CharField(
         max_length=20,
         choices=[
+            ('generating', 'Generating'),
+            ('failed', 'Failed'),
             ('pending', 'Pending'),
             ('approved', 'Approved'),
             ('rejected', 'Rejected'),
@@ -160,6 +272,36 @@ class ContentUpdate(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at'], name='update_created_idx'),
+            models.Index(fields=['content_type', 'content_id'], name='update_content_idx'),
+        ]
     
     def __str__(self):
         return f"{self.content_type} #{self.content_id} - {self.status}"
+
+
+class ContentBatch(models.Model):
+    """Message Batch submitted by `update_content --batch`"""
+    batch_id = models.CharField(max_length=100, unique=True)
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            ('in_progress', 'In Progress'),
+            ('ended', 'Ended'),
+            ('ingested', 'Ingested'),
+        ],
+        default='in_progress'
+    )
+    requests = models.JSONField(default=dict, help_text="custom_id -> prompt used for each request")
+    request_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    ended_at = models.DateTimeField(null=True, blank=True)
+    ingested_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name_plural = 'content batches'
+    
+    def __str__(self):
+        return f"{self.batch_id} - {self.status}"
@@ -0,0 +1,109 @@
+"""
+Compact, cached outline of the published lessons and labs in a course.
+
+The outline holds only the small fields the course page and lesson navigation
+need, so neither view loads lesson bodies. It is cached per course and
+invalidated from hello.signals whenever a lesson or lab in the course changes.
+"""
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.template.defaultfilters import truncatewords
+from django.urls import reverse
+
+from .models import Lab
+
+
+OUTLINE_CACHE_KEY = 'course-outline:{}'
+OUTLINE_CACHE_TIMEOUT = 60 * 60
+
+DIFFICULTY_LABELS = dict(Lab._meta.get_field('difficulty').choices)
+
+
+class OutlineLesson(namedtuple('OutlineLesson', ['id', 'slug', 'title', 'order', 'course_slug'])):
+    __slots__ = ()
+
+    def get_absolute_url(self):
+        return reverse('lesson_detail', kwargs={'course_slug': self.course_slug, 'lesson_slug': self.slug})
+
+
+class OutlineLab(namedtuple('OutlineLab', ['id', 'slug', 'title', 'order', 'difficulty', 'estimated_time', 'summary'])):
+    __slots__ = ()
+
+    def get_difficulty_display(self):
+        return DIFFICULTY_LABELS.get(self.difficulty, self.difficulty)
+
+    def get_absolute_url(self):
+        return reverse('lab_detail', kwargs={'slug': self.slug})
+
+
+class CourseOutline:
+    """Published lessons and labs of one course, in display order"""
+
+    def __init__(self, lessons, labs):
+        self.lessons = lessons
+        self.labs = labs
+        self.positions = {lesson.slug: index for index, lesson in enumerate(lessons)}
+
+    def neighbours(self, lesson_slug):
+        """Return the (previous, next) lessons around a lesson, either may be None"""
+        index = self.positions.get(lesson_slug)
+        if index is None:
+            return None, None
+        prev_lesson = self.lessons[index - 1] if index > 0 else None
+        next_lesson = self.lessons[index + 1] if index + 1 < len(self.lessons) else None
+        return prev_lesson, next_lesson
+
+
+def build_course_outline(course):
+    lessons = [
+        OutlineLesson(*row, course.slug)
+        for row in course.lessons.filter(is_published=True).values_list('id', 'slug', 'title', 'order')
+    ]
+    labs = [
+        OutlineLab(*row[:-1], truncatewords(row[-1], 15))
+        for row in course.labs.filter(is_published=True).values_list(
+            'id', 'slug', 'title', 'order', 'difficulty', 'estimated_time', 'description'
+        )
+    ]
+    return CourseOutline(lessons, labs)
+
+
+async def abuild_course_outline(course):
+    """Async variant of build_course_outline"""
+    lessons = [
+        OutlineLesson(*row, course.slug)
+        async for row in course.lessons.filter(is_published=True).values_list('id', 'slug', 'title', 'order')
+    ]
+    labs = [
+        OutlineLab(*row[:-1], truncatewords(row[-1], 15))
+        async for row in course.labs.filter(is_published=True).values_list(
+            'id', 'slug', 'title', 'order', 'difficulty', 'estimated_time', 'description'
+        )
+    ]
+    return CourseOutline(lessons, labs)
+
+
+def get_course_outline(course):
+    """Return the cached outline for a course, building it on a miss"""
+    key = OUTLINE_CACHE_KEY.format(course.id)
+    outline = cache.get(key)
+    if outline is None:
+        outline = build_course_outline(course)
+        cache.set(key, outline, OUTLINE_CACHE_TIMEOUT)
+    return outline
+
+
+async def aget_course_outline(course):
+    """Async variant of get_course_outline"""
+    key = OUTLINE_CACHE_KEY.format(course.id)
+    outline = await cache.aget(key)
+    if outline is None:
+        outline = await abuild_course_outline(course)
+        await cache.aset(key, outline, OUTLINE_CACHE_TIMEOUT)
+    return outline
+
+
+def invalidate_course_outline(course_id):
+    if course_id is not None:
+        cache.delete(OUTLINE_CACHE_KEY.format(course_id))
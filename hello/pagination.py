@@ -0,0 +1,104 @@
+"""
+Keyset ("cursor") pagination for the public listings.
+
+Pages continue from the last row shown rather than skipping an OFFSET, so
+each page is a short index range scan however deep into the catalog it is,
+and no COUNT(*) is needed: one extra row is fetched to tell whether a next
+page exists. The cursor is the (order, title, id) of that last row.
+"""
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import Http404
+
+
+CURSOR_PARAM = 'after'
+ORDERING = ['order', 'title', 'id']
+
+
+class KeysetPage:
+    """One page of results plus the query string for the next page, if any"""
+
+    def __init__(self, object_list, next_query, is_first):
+        self.object_list = object_list
+        self.next_query = next_query
+        self.is_first = is_first
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_query is not None
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(order, title, id) from a cursor, or Http404 if it was tampered with"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        order, title, pk = json.loads(raw)
+        if not isinstance(order, int) or not isinstance(title, str) or not isinstance(pk, int):
+            raise ValueError(cursor)
+    except (binascii.Error, ValueError, TypeError):
+        raise Http404('Invalid page cursor')
+    return order, title, pk
+
+
+def after(order, title, pk):
+    """Rows sorting after (order, title, id)
+
+    The leading ``order >= value`` lets the database seek straight to the
+    start of the range on the (order, title) indexes.
+    """
+    return Q(order__gte=order) & (
+        Q(order__gt=order)
+        | Q(order=order, title__gt=title)
+        | Q(order=order, title=title, id__gt=pk)
+    )
+
+
+def keyset_page(request, queryset, per_page=None):
+    """The page of `queryset` requested by the cursor in the query string"""
+    queryset, per_page, cursor = page_queryset(request, queryset, per_page)
+    return build_page(request, list(queryset[:per_page + 1]), per_page, cursor)
+
+
+async def akeyset_page(request, queryset, per_page=None):
+    """Async variant of keyset_page"""
+    queryset, per_page, cursor = page_queryset(request, queryset, per_page)
+    rows = [row async for row in queryset[:per_page + 1]]
+    return build_page(request, rows, per_page, cursor)
+
+
+def page_queryset(request, queryset, per_page):
+    """(queryset ordered and filtered from the cursor, page size, cursor)"""
+    per_page = per_page or settings.LIST_PAGE_SIZE
+    queryset = queryset.order_by(*ORDERING)
+
+    cursor = request.GET.get(CURSOR_PARAM)
+    if cursor:
+        queryset = queryset.filter(after(*decode_cursor(cursor)))
+    return queryset, per_page, cursor
+
+
+def build_page(request, rows, per_page, cursor):
+    """KeysetPage from up to per_page + 1 fetched rows; the extra row only signals a next page"""
+    next_query = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        query = request.GET.copy()
+        query[CURSOR_PARAM] = encode_cursor([last.order, last.title, last.pk])
+        next_query = query.urlencode()
+    return KeysetPage(rows, next_query, is_first=not cursor)
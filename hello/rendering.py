@@ -0,0 +1,72 @@
+"""
+Markdown rendering for lesson and lab content.
+
+Rendered HTML is stored on the models next to the Markdown source and keyed
+by a hash of the source text plus RENDERER_VERSION, so detail pages serve the
+stored HTML instead of parsing Markdown on every request.
+
+Code is highlighted here with Pygments too, as ``<span>`` elements styled by
+the shared static/css/highlight.css, so pages need no JavaScript to show it.
+"""
+import hashlib
+
+import markdown
+from pygments import highlight
+from pygments.formatters import HtmlFormatter
+from pygments.lexers import PythonLexer
+
+
+# Bump whenever MARKDOWN_EXTENSIONS, their configuration or the highlighting
+# change, then run `python manage.py render_content` to rebuild the stored HTML.
+RENDERER_VERSION = '2'
+
+# CSS class wrapping highlighted blocks, and the Pygments style behind
+# static/css/highlight.css (regenerate it with `highlight_css()` if changed)
+HIGHLIGHT_CLASS = 'highlight'
+HIGHLIGHT_STYLE = 'monokai'
+
+HIGHLIGHT_LAYOUT_CSS = f"""
+.{HIGHLIGHT_CLASS} {{ border-radius: 0.5rem; margin: 1.5em 0; overflow-x: auto; }}
+.{HIGHLIGHT_CLASS} pre {{ margin: 0; padding: 1em; background: transparent; font-size: 0.875em; }}
+.{HIGHLIGHT_CLASS} code {{ background: transparent; color: inherit; padding: 0; font-size: inherit; }}
+"""
+
+MARKDOWN_EXTENSIONS = ['fenced_code', 'codehilite']
+MARKDOWN_EXTENSION_CONFIGS = {
+    'codehilite': {
+        'css_class': HIGHLIGHT_CLASS,
+        # Fences without a language are detected by Pygments
+        'guess_lang': True,
+    },
+}
+
+
+def render_markdown(text):
+    """Render Markdown source to HTML with the site-wide configuration"""
+    return markdown.markdown(
+        text or '',
+        extensions=MARKDOWN_EXTENSIONS,
+        extension_configs=MARKDOWN_EXTENSION_CONFIGS,
+    )
+
+
+def highlight_code(code, lexer=None):
+    """Highlight a code listing (Python unless another lexer is given) as HTML"""
+    if not code:
+        return ''
+    formatter = HtmlFormatter(cssclass=HIGHLIGHT_CLASS, wrapcode=True)
+    return highlight(code, lexer or PythonLexer(), formatter)
+
+
+def highlight_css():
+    """Stylesheet for highlighted code, as saved in static/css/highlight.css"""
+    return HtmlFormatter(style=HIGHLIGHT_STYLE).get_style_defs(f'.{HIGHLIGHT_CLASS}') + HIGHLIGHT_LAYOUT_CSS
+
+
+def render_key(*sources):
+    """Hash of the renderer version and every source text that feeds a page"""
+    digest = hashlib.sha256(RENDERER_VERSION.encode('utf-8'))
+    for source in sources:
+        digest.update(b'\0')
+        digest.update((source or '').encode('utf-8'))
+    return digest.hexdigest()
@@ -0,0 +1,39 @@
+"""
+Database router that keeps the AI update log out of the catalog database.
+
+ContentUpdate stores the full prompt and response of every generation, and
+the update_content run writes to it for minutes at a time. Routing it, and
+other job and metrics tables, to the 'updates' database leaves the catalog
+database small and effectively read-only while content is refreshed. The
+tables are created with `python manage.py migrate --database updates`.
+"""
+
+UPDATES_DB = 'updates'
+
+
+class UpdateLogRouter:
+    """Send the models in `log_models` to the 'updates' database and everything else to 'default'"""
+    # app_label.model_name of every model stored in the updates database
+    log_models = {'hello.contentupdate', 'hello.contentbatch'}
+
+    def is_log_model(self, app_label, model_name):
+        return f'{app_label}.{model_name}' in self.log_models
+
+    def db_for_read(self, model, **hints):
+        if self.is_log_model(model._meta.app_label, model._meta.model_name):
+            return UPDATES_DB
+        return None
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # No foreign keys cross between the databases; ContentUpdate refers to content by id
+        if self.db_for_read(type(obj1)) != self.db_for_read(type(obj2)):
+            return False
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if model_name is not None and self.is_log_model(app_label, model_name):
+            return db == UPDATES_DB
+        # Data migrations (model_name None) and all other tables stay in the catalog database
+        return db != UPDATES_DB
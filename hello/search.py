@@ -0,0 +1,211 @@
+"""
+Full-text search over courses, lessons and labs, backed by an SQLite FTS5 table.
+
+Each indexed object is one row whose rowid encodes its kind and id, so a
+single object can be re-indexed or removed by rowid. The index is kept in
+sync from hello.signals and rebuilt with `python manage.py rebuild_search_index`.
+On databases other than SQLite every function degrades to a no-op, except
+matching_ids, which falls back to icontains lookups.
+"""
+import operator
+import re
+from collections import namedtuple
+from functools import reduce
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Course, Lesson, Lab
+
+
+INDEX_TABLE = 'hello_search_index'
+
+CREATE_SQL = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {INDEX_TABLE} USING fts5(
+    kind UNINDEXED,
+    object_id UNINDEXED,
+    published UNINDEXED,
+    title,
+    body,
+    tokenize = 'porter unicode61'
+)
+"""
+
+# kind -> (rowid code, SELECT producing its index rows)
+SOURCES = {
+    'course': (1, """
+        SELECT c.id * 4 + 1 AS doc_rowid, 'course', c.id, c.is_published, c.title,
+               c.short_description || char(10) || c.description
+        FROM hello_course c
+    """),
+    'lesson': (2, """
+        SELECT l.id * 4 + 2 AS doc_rowid, 'lesson', l.id, l.is_published AND c.is_published, l.title, l.content
+        FROM hello_lesson l JOIN hello_course c ON c.id = l.course_id
+    """),
+    'lab': (3, """
+        SELECT b.id * 4 + 3 AS doc_rowid, 'lab', b.id, b.is_published AND coalesce(c.is_published, 1), b.title,
+               b.description || char(10) || b.instructions
+        FROM hello_lab b LEFT JOIN hello_course c ON c.id = b.course_id
+    """),
+}
+
+# kind -> (model, fields its index row covers), for searching without the index
+MODELS = {
+    'course': (Course, ['title', 'short_description', 'description']),
+    'lesson': (Lesson, ['title', 'content']),
+    'lab': (Lab, ['title', 'description', 'instructions']),
+}
+
+# Column weights for bm25(): kind, object_id, published, title, body
+RANK = f'bm25({INDEX_TABLE}, 0, 0, 0, 10.0, 1.0)'
+
+# Placeholders wrapped around matches by FTS5, replaced after escaping
+MARK_START, MARK_END = '\x02', '\x03'
+
+SearchResult = namedtuple('SearchResult', ['kind', 'object', 'title_html', 'snippet_html'])
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def rowid(kind, object_id):
+    return object_id * 4 + SOURCES[kind][0]
+
+
+def reindex(kind, where='', params=()):
+    """Replace the index rows for every `kind` object matching `where`"""
+    if not is_available():
+        return
+    _code, select = SOURCES[kind]
+    where_sql = f' WHERE {where}' if where else ''
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {INDEX_TABLE} WHERE rowid IN (SELECT doc_rowid FROM ({select}{where_sql}))',
+            params,
+        )
+        cursor.execute(
+            f'INSERT INTO {INDEX_TABLE} (rowid, kind, object_id, published, title, body) {select}{where_sql}',
+            params,
+        )
+
+
+def index_course(course_id):
+    """Index a course along with its lessons and labs, whose visibility follows it"""
+    reindex('course', 'c.id = %s', [course_id])
+    reindex('lesson', 'l.course_id = %s', [course_id])
+    reindex('lab', 'b.course_id = %s', [course_id])
+
+
+def index_lesson(lesson_id):
+    reindex('lesson', 'l.id = %s', [lesson_id])
+
+
+def index_lab(lab_id):
+    reindex('lab', 'b.id = %s', [lab_id])
+
+
+def remove(kind, object_id):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {INDEX_TABLE} WHERE rowid = %s', [rowid(kind, object_id)])
+
+
+def rebuild_index():
+    """Rebuild the whole index from the content tables"""
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {INDEX_TABLE}')
+        for _code, select in SOURCES.values():
+            cursor.execute(f'INSERT INTO {INDEX_TABLE} (rowid, kind, object_id, published, title, body) {select}')
+        cursor.execute(f"INSERT INTO {INDEX_TABLE} ({INDEX_TABLE}) VALUES ('optimize')")
+
+
+def build_match_query(text):
+    """Turn free text into an FTS5 query: every word must match, the last one as a prefix"""
+    words = re.findall(r'\w+', text)
+    if not words:
+        return ''
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def highlight_html(text):
+    return mark_safe(escape(text).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>'))
+
+
+def search_rows(text, kind=None, published_only=True, limit=50):
+    """(kind, object_id, title, snippet) rows for a query, best match first"""
+    match = build_match_query(text)
+    if not match or not is_available():
+        return []
+
+    conditions = [f'{INDEX_TABLE} MATCH %s']
+    params = [match]
+    if kind:
+        conditions.append('kind = %s')
+        params.append(kind)
+    if published_only:
+        conditions.append('published = 1')
+    params.append(limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT kind, object_id,
+                   highlight({INDEX_TABLE}, 3, '{MARK_START}', '{MARK_END}'),
+                   snippet({INDEX_TABLE}, 4, '{MARK_START}', '{MARK_END}', '…', 32)
+            FROM {INDEX_TABLE}
+            WHERE {' AND '.join(conditions)}
+            ORDER BY {RANK}
+            LIMIT %s
+            """,
+            params,
+        )
+        return cursor.fetchall()
+
+
+def matching_ids(text, kind):
+    """Every matching object of one kind, published or not, as a subquery for ``pk__in``
+
+    Lets the admin filter a changelist against the index in the database,
+    without capping the matches or passing their ids through Python. Without
+    the index every word is looked up with icontains over the indexed fields.
+    """
+    match = build_match_query(text)
+    if not match:
+        return []
+    if not is_available():
+        model, fields = MODELS[kind]
+        condition = Q()
+        for word in re.findall(r'\w+', text):
+            condition &= reduce(operator.or_, (Q(**{f'{field}__icontains': word}) for field in fields))
+        return model.objects.filter(condition).values('pk')
+    return RawSQL(f'SELECT object_id FROM {INDEX_TABLE} WHERE {INDEX_TABLE} MATCH %s AND kind = %s', [match, kind])
+
+
+def search(text, limit=50):
+    """Ranked, highlighted results for the public search page"""
+    rows = search_rows(text, limit=limit)
+
+    ids = {'course': [], 'lesson': [], 'lab': []}
+    for kind, object_id, _title, _snippet in rows:
+        ids[kind].append(object_id)
+    objects = {
+        'course': Course.objects.only('slug', 'title').in_bulk(ids['course']),
+        'lesson': Lesson.objects.select_related('course').only('slug', 'title', 'course__slug').in_bulk(ids['lesson']),
+        'lab': Lab.objects.only('slug', 'title').in_bulk(ids['lab']),
+    }
+
+    results = []
+    for kind, object_id, title, snippet in rows:
+        obj = objects[kind].get(object_id)
+        if obj is not None:
+            results.append(SearchResult(kind, obj, highlight_html(title), highlight_html(snippet)))
+    return results
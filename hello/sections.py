@@ -0,0 +1,68 @@
+"""
+Split Markdown lessons into sections at their headings.
+
+Lesson refreshes send each section to Claude on its own, so sections that
+haven't changed since the last applied update can be skipped and the rest
+generated in parallel. Headings inside fenced code blocks don't start a
+section, and only headings up to SECTION_LEVEL do; deeper ones stay inside
+the section they belong to.
+"""
+import hashlib
+import re
+from collections import namedtuple
+
+
+SECTION_LEVEL = 2
+
+HEADING_RE = re.compile(r'^ {0,3}(#{1,6})(?:[ \t]|$)')
+FENCE_RE = re.compile(r'^ {0,3}(`{3,}|~{3,})')
+
+
+class Section(namedtuple('Section', ['heading', 'text'])):
+    __slots__ = ()
+
+    @property
+    def digest(self):
+        return section_hash(self.text)
+
+
+def section_hash(text):
+    """Hash of a section's text, ignoring surrounding whitespace"""
+    return hashlib.sha256(text.strip().encode('utf-8')).hexdigest()
+
+
+def split_sections(text, level=SECTION_LEVEL):
+    """Sections of a Markdown document, each starting at a heading of `level` or higher
+
+    Text before the first heading is a section with an empty heading.
+    Blank sections are dropped.
+    """
+    sections = []
+    heading = ''
+    lines = []
+    fence = None
+
+    for line in (text or '').splitlines(keepends=True):
+        fence_match = FENCE_RE.match(line)
+        heading_match = HEADING_RE.match(line)
+        if fence:
+            marker = fence_match and fence_match.group(1)
+            if marker and marker[0] == fence[0] and len(marker) >= len(fence) and not line[fence_match.end():].strip():
+                fence = None
+        elif fence_match:
+            fence = fence_match.group(1)
+        elif heading_match and len(heading_match.group(1)) <= level:
+            if ''.join(lines).strip():
+                sections.append(Section(heading, ''.join(lines)))
+            heading = line.strip().strip('#').strip()
+            lines = []
+        lines.append(line)
+
+    if ''.join(lines).strip():
+        sections.append(Section(heading, ''.join(lines)))
+    return sections
+
+
+def join_sections(texts):
+    """Reassemble section texts into one document"""
+    return '\n\n'.join(text.strip() for text in texts if text.strip())
@@ -1,155 +1,483 @@
 """
 Service for interacting with Claude API to generate and update educational content
 """
+import asyncio
+import contextlib
+import email.utils
+import hashlib
+import json
 import os
+import random
+import threading
+import time
+from collections import Counter, namedtuple
 from django.conf import settings
-from anthropic import Anthropic
+from anthropic import Anthropic, AsyncAnthropic, APIConnectionError, APIStatusError, Timeout
 from datetime import datetime
 
+from .prompts import SYSTEM_PROMPT
+
+
+class GenerationResult(namedtuple('GenerationResult', ['text', 'error', 'retryable'])):
+    """Outcome of one generation: the text, or the error and whether retrying later may succeed"""
+    __slots__ = ()
+    
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the API while the circuit breaker is open"""
+
+
+class TruncatedError(Exception):
+    """A response still cut off at max_tokens after every continuation"""
+
+
+class CircuitBreaker:
+    """Stop calling the API for `cooldown` seconds after `threshold` consecutive failures
+    
+    After the cooldown calls are let through again, and a single further
+    failure re-opens the circuit.
+    """
+    
+    def __init__(self, threshold=5, cooldown=60.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+    
+    @property
+    def remaining(self):
+        """Seconds until calls are allowed again, 0 if the circuit is closed"""
+        if self.opened_at is None:
+            return 0
+        return max(0.0, self.opened_at + self.cooldown - time.monotonic())
+    
+    def before_call(self):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            remaining = self.remaining
+            if remaining > 0:
+                raise CircuitOpenError(f"Claude API circuit open for another {remaining:.0f}s")
+            self.opened_at = None
+            self.failures = self.threshold - 1
+    
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+    
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+# One pooled client per API key, shared by every ClaudeService in the process
+_clients = {}
+_clients_lock = threading.Lock()
+
+# Shared too, so one run backs off as a whole when the API is overloaded
+circuit_breaker = CircuitBreaker()
+
+
+def client_options():
+    """Timeouts for every client; retries are handled by ClaudeService itself"""
+    return {
+        "timeout": Timeout(settings.CLAUDE_READ_TIMEOUT, connect=settings.CLAUDE_CONNECT_TIMEOUT),
+        "max_retries": 0,
+    }
+
+
+def get_client(api_key):
+    with _clients_lock:
+        if api_key not in _clients:
+            _clients[api_key] = Anthropic(api_key=api_key, **client_options())
+        return _clients[api_key]
+
+
+# Token counts accumulated from each response's usage
+USAGE_FIELDS = ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens")
+
+
+def is_retryable(error):
+    """Rate limits, overload, server errors, timeouts and dropped connections"""
+    if isinstance(error, CircuitOpenError):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return isinstance(error, APIConnectionError)
+
 
 class ClaudeService:
     """Service for Claude API integration"""
     
+    # Exponential backoff with full jitter: up to BACKOFF_BASE * 2**attempt seconds
+    BACKOFF_BASE = 1.0
+    BACKOFF_MAX = 60.0
+    
+    # Follow-up requests made for a response that stopped at max_tokens
+    MAX_CONTINUATIONS = 3
+    
     def __init__(self):
         api_key = settings.ANTHROPIC_API_KEY
         if not api_key:
             raise ValueError("ANTHROPIC_API_KEY not set in settings")
-        self.client = Anthropic(api_key=api_key)
+        self.api_key = api_key
+        self.client = get_client(api_key)
+        self._async_client = None
+        self.max_retries = settings.CLAUDE_MAX_RETRIES
+        self.breaker = circuit_breaker
+        self.usage = Counter()
+        self.usage_lock = threading.Lock()
         self.model = "claude-3-5-sonnet-20241022"  # Latest Claude model
     
+    @property
+    def async_client(self):
+        """Async client of the open async_session"""
+        if self._async_client is None:
+            raise RuntimeError("No async client open; use `async with claude_service.async_session()`")
+        return self._async_client
+    
+    @contextlib.asynccontextmanager
+    async def async_session(self):
+        """Open an async client for the running event loop and close it on exit
+        
+        Its connections belong to the loop that opened them, so each
+        asyncio.run, such as every requeue pass, needs a session of its own.
+        """
+        self._async_client = AsyncAnthropic(api_key=self.api_key, **client_options())
+        try:
+            yield self._async_client
+        finally:
+            client, self._async_client = self._async_client, None
+            await client.close()
+    
+    def record_usage(self, message):
+        """Add a response's token counts, including prompt cache reads and writes, to self.usage"""
+        usage = getattr(message, "usage", None)
+        if usage is None:
+            return
+        with self.usage_lock:
+            self.usage["requests"] += 1
+            for field in USAGE_FIELDS:
+                self.usage[field] += getattr(usage, field, None) or 0
+    
+    def retry_delay(self, error, attempt):
+        """Seconds to wait before retry number `attempt`, at least as long as retry-after asks"""
+        backoff = random.uniform(0, min(self.BACKOFF_MAX, self.BACKOFF_BASE * 2 ** (attempt - 1)))
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None) or {}
+        retry_after = headers.get("retry-after")
+        if retry_after is None:
+            return backoff
+        try:
+            wait = float(retry_after)
+        except ValueError:
+            try:
+                parsed = email.utils.parsedate_to_datetime(retry_after)
+            except (TypeError, ValueError):
+                # Neither seconds nor an HTTP date; fall back to the backoff
+                return backoff
+            wait = parsed.timestamp() - time.time()
+        return max(wait, backoff)
+    
+    def should_retry(self, error, attempt):
+        """Record a failed call with the circuit breaker and decide whether to try again"""
+        if not is_retryable(error) or isinstance(error, CircuitOpenError):
+            return False
+        self.breaker.record_failure()
+        return attempt <= self.max_retries and not self.breaker.remaining
+    
+    def call(self, func):
+        """Call the API through the circuit breaker, retrying transient failures"""
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                self.breaker.before_call()
+                result = func()
+            except Exception as e:
+                if not self.should_retry(e, attempt):
+                    raise
+                time.sleep(self.retry_delay(e, attempt))
+                continue
+            self.breaker.record_success()
+            return result
+    
+    async def acall(self, func):
+        """Async variant of call; `func` returns an awaitable"""
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                self.breaker.before_call()
+                result = await func()
+            except Exception as e:
+                if not self.should_retry(e, attempt):
+                    raise
+                await asyncio.sleep(self.retry_delay(e, attempt))
+                continue
+            self.breaker.record_success()
+            return result
+    
+    def build_params(self, prompt, max_tokens=3000):
+        """Message parameters for one request: the cached shared instructions plus `prompt`
+        
+        The system prompt is identical for every request and marked as a
+        cache breakpoint, so after the first request it is read from the
+        prompt cache instead of being processed again.
+        """
+        return {
+            "model": self.model,
+            "max_tokens": max_tokens,
+            "system": [
+                {"type": "text", "text": SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}
+            ],
+            "messages": [
+                {"role": "user", "content": prompt}
+            ],
+        }
+    
+    def build_course_params(self, course_title, topic, difficulty="beginner"):
+        """Message parameters for generating a course"""
+        prompt = f"""Task: Create a course
+
+Course title: {course_title}
+Topic: {topic}
+Difficulty level: {difficulty}"""
+        
+        return self.build_params(prompt, max_tokens=4000)
+    
     def generate_course_content(self, course_title, topic, difficulty="beginner"):
         """Generate course content using Claude"""
-        prompt = f"""You are an expert educator creating content for an MCP (Model Context Protocol) server education website.
+        return self.create_text(self.build_course_params(course_title, topic, difficulty))
+    
+    def stream_course_content(self, course_title, topic, difficulty="beginner"):
+        """Streaming variant of generate_course_content, yielding text deltas"""
+        return self.stream_text(self.build_course_params(course_title, topic, difficulty))
+    
+    def build_lesson_params(self, lesson_title, course_context, previous_lessons=None):
+        """Message parameters for generating a lesson"""
+        prompt = f"""Task: Create a lesson
 
-Create a comprehensive course about: {course_title}
-Topic: {topic}
-Difficulty Level: {difficulty}
-
-Please provide:
-1. A detailed course description (2-3 paragraphs)
-2. A short description (1 sentence, max 300 characters)
-3. Learning objectives
-4. Estimated time in minutes
-5. A structured outline with 5-7 lessons
-
-Format your response as JSON with the following structure:
-{{
-    "description": "detailed course description",
-    "short_description": "short one-line description",
-    "estimated_time": 60,
-    "lessons": [
-        {{
-            "title": "Lesson title",
-            "order": 1,
-            "content": "Full lesson content in Markdown format"
-        }}
-    ]
-}}
-
-Focus on practical, hands-on learning with code examples and best practices for MCP servers."""
+Lesson title: {lesson_title}
+Course context: {course_context}"""
+        if previous_lessons:
+            prompt += f"\nPrevious lessons covered: {', '.join(previous_lessons)}"
         
-        try:
-            message = self.client.messages.create(
-                model=self.model,
-                max_tokens=4000,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            return message.content[0].text
-        except Exception as e:
-            print(f"Error calling Claude API: {e}")
-            return None
+        return self.build_params(prompt)
     
     def generate_lesson_content(self, lesson_title, course_context, previous_lessons=None):
         """Generate lesson content"""
-        context_str = ""
-        if previous_lessons:
-            context_str = f"\nPrevious lessons covered: {', '.join(previous_lessons)}"
-        
-        prompt = f"""Create a detailed lesson about: {lesson_title}
-Course Context: {course_context}
-{context_str}
-
-Provide comprehensive content in Markdown format including:
-- Clear explanations
-- Code examples
-- Best practices
-- Common pitfalls to avoid
-- Exercises or thought questions
-
-Make it engaging and educational for students learning MCP servers."""
+        return self.create_text(self.build_lesson_params(lesson_title, course_context, previous_lessons))
+    
+    def stream_lesson_content(self, lesson_title, course_context, previous_lessons=None):
+        """Streaming variant of generate_lesson_content, yielding text deltas"""
+        return self.stream_text(self.build_lesson_params(lesson_title, course_context, previous_lessons))
+    
+    def build_lab_params(self, lab_title, related_lesson=None, difficulty="medium"):
+        """Message parameters for generating a lab/exercise"""
+        prompt = f"""Task: Create a lab
+
+Lab title: {lab_title}
+Difficulty: {difficulty}"""
+        if related_lesson:
+            prompt += f"\nRelated to: {related_lesson}"
         
-        try:
-            message = self.client.messages.create(
-                model=self.model,
-                max_tokens=3000,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            return message.content[0].text
-        except Exception as e:
-            print(f"Error calling Claude API: {e}")
-            return None
+        return self.build_params(prompt)
     
     def generate_lab_content(self, lab_title, related_lesson=None, difficulty="medium"):
         """Generate lab/exercise content"""
-        lesson_context = f"Related to: {related_lesson}" if related_lesson else ""
-        
-        prompt = f"""Create a hands-on lab exercise about: {lab_title}
-Difficulty: {difficulty}
-{lesson_context}
+        return self.create_text(self.build_lab_params(lab_title, related_lesson, difficulty))
+    
+    def stream_lab_content(self, lab_title, related_lesson=None, difficulty="medium"):
+        """Streaming variant of generate_lab_content, yielding text deltas"""
+        return self.stream_text(self.build_lab_params(lab_title, related_lesson, difficulty))
+    
+    def build_update_prompt(self, content_type, current_content, update_focus):
+        """Build the per-item message used to refresh existing content"""
+        return f"""Task: Update content
 
-Provide:
-1. A clear description of what students will build
-2. Step-by-step instructions in Markdown
-3. Starter code (Python)
-4. Expected learning outcomes
+Content type: {content_type}
 
-Make it practical and engaging, with clear success criteria."""
-        
-        try:
-            message = self.client.messages.create(
-                model=self.model,
-                max_tokens=3000,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            return message.content[0].text
-        except Exception as e:
-            print(f"Error calling Claude API: {e}")
-            return None
+Focus areas for the update:
+{update_focus}
+
+Current content:
+{current_content}"""
     
-    def update_existing_content(self, content_type, current_content, update_focus):
-        """Update existing content with latest information"""
-        prompt = f"""Update the following {content_type} content with the latest information and best practices for MCP servers.
+    def build_update_params(self, content_type, current_content, update_focus):
+        """Message parameters for a content refresh, shared by every request path"""
+        return self.build_params(self.build_update_prompt(content_type, current_content, update_focus))
+    
+    def build_section_params(self, content_type, title, headings, section, update_focus):
+        """Message parameters for refreshing one section of a longer piece of content"""
+        outline = "\n".join(f"- {heading}" for heading in headings if heading)
+        prompt = f"""Task: Update a section
 
-Current Content:
-{current_content}
+Content type: {content_type}
+Title: {title}
 
-Focus Areas for Update:
-{update_focus}
+Sections:
+{outline}
 
-Provide the updated content maintaining the same structure and format, but incorporating:
-- Latest MCP protocol updates
-- Current best practices
-- Improved explanations
-- Updated code examples
+Focus areas for the update:
+{update_focus}
 
-Return only the updated content."""
+Section to update:
+{section}"""
+        
+        return self.build_params(prompt)
+    
+    def update_section(self, content_type, title, headings, section, update_focus):
+        """Refresh one section, as a GenerationResult"""
+        return self.create_text(self.build_section_params(content_type, title, headings, section, update_focus))
+    
+    async def aupdate_section(self, content_type, title, headings, section, update_focus):
+        """Async variant of update_section"""
+        return await self.acreate_text(self.build_section_params(content_type, title, headings, section, update_focus))
+    
+    def update_fingerprint(self, content_type, current_content, update_focus):
+        """Stable hash of everything sent for a refresh: content, prompt template and model"""
+        params = self.build_update_params(content_type, current_content, update_focus)
+        return hashlib.sha256(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()
+    
+    def update_existing_content(self, content_type, current_content, update_focus):
+        """Update existing content with latest information, as a GenerationResult"""
+        return self.create_text(self.build_update_params(content_type, current_content, update_focus))
+    
+    def stream_update_existing_content(self, content_type, current_content, update_focus):
+        """Streaming variant of update_existing_content, yielding text deltas"""
+        return self.stream_text(self.build_update_params(content_type, current_content, update_focus))
+    
+    def continuation_params(self, params, text):
+        """`params` with the text received so far as the start of the assistant's turn"""
+        if not text:
+            return params
+        return {
+            **params,
+            "messages": [*params["messages"], {"role": "assistant", "content": text}],
+        }
+    
+    def create_text(self, params):
+        """GenerationResult of a blocking request
         
+        A response cut off at max_tokens is continued by sending the text so
+        far back as the start of the assistant's turn, up to MAX_CONTINUATIONS
+        times; one still truncated after that fails with TruncatedError.
+        """
+        text = ""
         try:
-            message = self.client.messages.create(
-                model=self.model,
-                max_tokens=3000,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            return message.content[0].text
+            for _ in range(self.MAX_CONTINUATIONS + 1):
+                # The API rejects an assistant prefix ending in whitespace
+                request = self.continuation_params(params, text.rstrip())
+                message = self.call(lambda: self.client.messages.create(**request))
+                self.record_usage(message)
+                text = text.rstrip() + message.content[0].text if text else message.content[0].text
+                if message.stop_reason != "max_tokens":
+                    return GenerationResult(text, None, False)
         except Exception as e:
-            print(f"Error calling Claude API: {e}")
-            return None
-
+            return GenerationResult(None, e, is_retryable(e))
+        return GenerationResult(text, TruncatedError(f"Response truncated after {self.MAX_CONTINUATIONS} continuations"), False)
+    
+    async def acreate_text(self, params):
+        """Async variant of create_text"""
+        text = ""
+        try:
+            for _ in range(self.MAX_CONTINUATIONS + 1):
+                request = self.continuation_params(params, text.rstrip())
+                message = await self.acall(lambda: self.async_client.messages.create(**request))
+                self.record_usage(message)
+                text = text.rstrip() + message.content[0].text if text else message.content[0].text
+                if message.stop_reason != "max_tokens":
+                    return GenerationResult(text, None, False)
+        except Exception as e:
+            return GenerationResult(None, e, is_retryable(e))
+        return GenerationResult(text, TruncatedError(f"Response truncated after {self.MAX_CONTINUATIONS} continuations"), False)
+    
+    def stream_text(self, params):
+        """Yield text deltas as they arrive
+        
+        A stream that fails before its first delta is retried like any other
+        call. Later errors are raised rather than swallowed, since by then
+        the caller holds partial output worth keeping. Streams that stop at
+        max_tokens are continued as in create_text.
+        """
+        parts = []
+        for _ in range(self.MAX_CONTINUATIONS + 1):
+            request = self.continuation_params(params, "".join(parts).rstrip())
+            stop_reason = yield from self.stream_once(request, parts)
+            if stop_reason != "max_tokens":
+                return
+        raise TruncatedError(f"Response truncated after {self.MAX_CONTINUATIONS} continuations")
+    
+    def stream_once(self, params, parts):
+        """Yield the deltas of one streamed request, also appending them to `parts`, and return its stop_reason"""
+        attempt = 0
+        while True:
+            attempt += 1
+            received = False
+            try:
+                self.breaker.before_call()
+                with self.client.messages.stream(**params) as stream:
+                    for text in stream.text_stream:
+                        received = True
+                        parts.append(text)
+                        yield text
+                    final = stream.get_final_message()
+                    self.record_usage(final)
+                    stop_reason = final.stop_reason
+            except Exception as e:
+                if received or not self.should_retry(e, attempt):
+                    raise
+                time.sleep(self.retry_delay(e, attempt))
+                continue
+            self.breaker.record_success()
+            return stop_reason
+    
+    async def aupdate_existing_content(self, content_type, current_content, update_focus):
+        """Async variant of update_existing_content for concurrent refreshes"""
+        return await self.acreate_text(self.build_update_params(content_type, current_content, update_focus))
+    
+    def create_update_batch(self, requests):
+        """Submit content refreshes as one Message Batch
+        
+        `requests` is an iterable of (custom_id, content_type, current_content,
+        update_focus) tuples. Returns the created batch.
+        """
+        batch_requests = [
+            {
+                "custom_id": custom_id,
+                "params": self.build_update_params(content_type, current_content, update_focus),
+            }
+            for custom_id, content_type, current_content, update_focus in requests
+        ]
+        return self.call(lambda: self.client.messages.batches.create(requests=batch_requests))
+    
+    def get_batch(self, batch_id):
+        """Fetch the current state of a Message Batch"""
+        return self.call(lambda: self.client.messages.batches.retrieve(batch_id))
+    
+    def get_batch_results(self, batch_id):
+        """Yield (custom_id, text) for each batch result; text is None on failure
+        
+        A result cut off at max_tokens counts as failed rather than being
+        ingested as if complete; its content stays stale, so the next run
+        submits it again.
+        """
+        for entry in self.call(lambda: self.client.messages.batches.results(batch_id)):
+            if entry.result.type != "succeeded":
+                yield entry.custom_id, None
+                continue
+            message = entry.result.message
+            self.record_usage(message)
+            if message.stop_reason == "max_tokens":
+                yield entry.custom_id, None
+            else:
+                yield entry.custom_id, message.content[0].text
@@ -0,0 +1,296 @@
+"""
+Generate AI content updates and apply approved ones back onto courses, lessons and labs
+"""
+import asyncio
+import re
+import time
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from hello import search
+from hello.caching import invalidate_tags
+from hello.models import Course, Lesson, Lab, ContentUpdate
+from hello.outline import OUTLINE_CACHE_KEY
+from hello.sections import join_sections, split_sections
+from hello.services.claude_service import GenerationResult
+
+
+CONTENT_MODELS = {'course': Course, 'lesson': Lesson, 'lab': Lab}
+
+# Fields an update may rewrite for each content type
+UPDATE_FIELDS = {
+    'course': ['description'],
+    'lesson': ['content'],
+    'lab': ['description', 'instructions'],
+}
+
+ApplyResult = namedtuple('ApplyResult', ['applied', 'skipped', 'courses', 'rejected'])
+
+# Seconds between saves of partial output while an update streams in
+CHECKPOINT_SECONDS = 2
+
+# A streamed update still 'generating' after this long lost its process mid-stream
+ABANDONED_AFTER = timedelta(hours=1)
+
+# Requests in flight at once while the sections of one lesson are refreshed
+SECTION_WORKERS = 4
+
+
+def update_request_fields(content_type, obj):
+    """(current_content, update_focus) sent to Claude to refresh an object"""
+    if content_type == 'course':
+        update_focus = f"Update course '{obj.title}' with latest MCP server information and best practices"
+        current_content = f"Title: {obj.title}\nDescription: {obj.description}"
+    elif content_type == 'lesson':
+        update_focus = f"Update lesson '{obj.title}' with latest information"
+        current_content = obj.content
+    else:
+        update_focus = f"Update lab '{obj.title}' with latest best practices"
+        current_content = f"Description:\n{obj.description}\n\nInstructions:\n{obj.instructions}"
+    return current_content, update_focus
+
+
+def stream_update(claude_service, content_type, obj, checkpoint_seconds=CHECKPOINT_SECONDS):
+    """Generate a refresh of `obj`, yielding text deltas as they arrive
+
+    The ContentUpdate is created up front with status 'generating' and the
+    text received so far is saved into it every `checkpoint_seconds`. When
+    the stream completes the update becomes 'pending' and the object's
+    last_ai_update is set; if it fails, or the consumer stops reading, the
+    partial text is kept with status 'failed' and the error re-raised.
+    """
+    current_content, update_focus = update_request_fields(content_type, obj)
+    update = ContentUpdate.objects.create(
+        content_type=content_type,
+        content_id=obj.id,
+        fingerprint=claude_service.update_fingerprint(content_type, current_content, update_focus),
+        prompt_used=update_focus,
+        ai_response='',
+        status='generating',
+    )
+    updates = ContentUpdate.objects.filter(pk=update.pk)
+
+    parts = []
+    checkpointed_at = time.monotonic()
+    try:
+        for text in claude_service.stream_update_existing_content(content_type, current_content, update_focus):
+            parts.append(text)
+            yield text
+            if time.monotonic() - checkpointed_at >= checkpoint_seconds:
+                updates.update(ai_response=''.join(parts))
+                checkpointed_at = time.monotonic()
+    except (Exception, GeneratorExit):
+        updates.update(ai_response=''.join(parts), status='failed')
+        raise
+
+    updates.update(ai_response=''.join(parts), status='pending')
+    # Queryset update so the refresh doesn't bump updated_at
+    CONTENT_MODELS[content_type].objects.filter(pk=obj.pk).update(last_ai_update=timezone.now())
+
+
+def fail_abandoned_updates():
+    """Mark streamed updates whose process died before finishing as failed
+
+    stream_update can't record the failure itself when its worker is killed,
+    and a row left 'generating' would count as a known fingerprint and keep
+    the item from being refreshed again.
+    """
+    cutoff = timezone.now() - ABANDONED_AFTER
+    return ContentUpdate.objects.filter(status='generating', created_at__lt=cutoff).update(status='failed')
+
+
+def applied_section_hashes(lesson_ids):
+    """{lesson id: hashes of the sections its last applied update wrote}
+
+    A lesson section whose hash is in this set hasn't been edited since
+    then, so refreshing it again can be skipped.
+    """
+    latest = ContentUpdate.objects.filter(
+        content_type='lesson', content_id=OuterRef('content_id'), applied_at__isnull=False
+    ).order_by('-applied_at', '-id').values('id')[:1]
+    rows = ContentUpdate.objects.filter(
+        content_type='lesson', content_id__in=lesson_ids, id=Subquery(latest)
+    ).values_list('content_id', 'ai_response')
+    return {
+        content_id: {section.digest for section in split_sections(text)}
+        for content_id, text in rows
+    }
+
+
+def changed_sections(sections, applied_hashes):
+    """Indexes of the sections not left as they are by the last applied update"""
+    return tuple(index for index, section in enumerate(sections) if section.digest not in applied_hashes)
+
+
+def regenerate_sections(claude_service, title, sections, changed, update_focus, workers=SECTION_WORKERS):
+    """Refresh the `changed` lesson sections in parallel threads and reassemble the lesson
+
+    Returns a GenerationResult holding the whole lesson, with the other
+    sections kept as they are.
+    """
+    headings = [section.heading for section in sections]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(
+            lambda index: claude_service.update_section('lesson', title, headings, sections[index].text, update_focus),
+            changed,
+        ))
+    return reassemble_sections(sections, changed, results)
+
+
+async def aregenerate_sections(claude_service, title, sections, changed, update_focus, run_request=None):
+    """Async variant of regenerate_sections
+
+    Each section's request is made through `run_request(call)` when given,
+    so a caller can hold a concurrency slot for every request in flight.
+    """
+    headings = [section.heading for section in sections]
+
+    async def refresh(index):
+        def call():
+            return claude_service.aupdate_section('lesson', title, headings, sections[index].text, update_focus)
+
+        return await (run_request(call) if run_request else call())
+
+    results = await asyncio.gather(*(refresh(index) for index in changed))
+    return reassemble_sections(sections, changed, results)
+
+
+def reassemble_sections(sections, changed, results):
+    """The lesson with each changed section replaced by its result
+
+    If any section failed the lesson fails as a whole, reported as retryable
+    only when every failure was.
+    """
+    failures = [result for result in results if not result.ok]
+    if failures:
+        return min(failures, key=lambda result: result.retryable)
+    texts = [section.text for section in sections]
+    for index, result in zip(changed, results):
+        texts[index] = result.text
+    return GenerationResult(join_sections(texts), None, False)
+
+
+def find_label(label, text, pos=0):
+    """Match for a ``Label:`` line in `text`, tolerating Markdown heading or bold markup around it"""
+    pattern = re.compile(rf'^[#*\s]*{label}:[*]*[ \t]*', flags=re.MULTILINE | re.IGNORECASE)
+    return pattern.search(text, pos)
+
+
+def parse_update(content_type, text):
+    """Field values from an AI response, mirroring how the prompt's current content was laid out
+
+    Courses are sent as ``Title: ...`` / ``Description: ...`` and only the
+    description is taken back. Labs are sent as ``Description:`` then
+    ``Instructions:``, each label followed by its text; a lab response
+    without both labels raises ValueError rather than being guessed at.
+    """
+    text = (text or '').strip()
+    if content_type == 'course':
+        match = find_label('Description', text)
+        if match:
+            text = text[match.end():]
+        elif re.match(r'Title:', text, flags=re.IGNORECASE):
+            text = text.partition('\n')[2]
+        return {'description': text.strip()}
+    if content_type == 'lab':
+        description = find_label('Description', text)
+        instructions = description and find_label('Instructions', text, description.end())
+        if not instructions:
+            raise ValueError('Lab update is missing its "Description:" or "Instructions:" label')
+        return {
+            'description': text[description.end():instructions.start()].strip(),
+            'instructions': text[instructions.end():].strip(),
+        }
+    return {'content': text}
+
+
+def apply_updates(updates):
+    """Apply the approved, not yet applied updates in `updates` in one transaction
+
+    Updates are grouped by content type and written with one bulk_update per
+    type; when several updates target the same object the newest wins. The
+    search index, course outlines and page caches are refreshed once per
+    affected course afterwards, since bulk writes bypass hello.signals.
+    """
+    now = timezone.now()
+    course_ids = set()
+    lab_slugs = set()
+    applied = []
+    skipped = rejected = 0
+
+    # The update log has its own database (hello.routers). Its transaction is
+    # the outer one, so updates are only marked applied once the content
+    # changes have committed.
+    with transaction.atomic(using=updates.db), transaction.atomic():
+        pending = list(
+            updates.filter(status='approved', applied_at__isnull=True).order_by('created_at', 'id')
+        )
+        by_type = defaultdict(list)
+        for update in pending:
+            by_type[update.content_type].append(update)
+
+        for content_type, group in by_type.items():
+            model = CONTENT_MODELS[content_type]
+            objects = model.objects.in_bulk({update.content_id for update in group})
+            changed = {}
+            for update in group:
+                obj = objects.get(update.content_id)
+                if obj is None:
+                    skipped += 1
+                    continue
+                try:
+                    values = parse_update(content_type, update.ai_response)
+                except ValueError:
+                    # Left approved and unapplied, for a reviewer to fix or reject
+                    rejected += 1
+                    continue
+                for field, value in values.items():
+                    setattr(obj, field, value)
+                changed[obj.pk] = obj
+                applied.append(update.pk)
+            if not changed:
+                continue
+
+            fields = [*UPDATE_FIELDS[content_type], 'updated_at', 'last_ai_update']
+            for obj in changed.values():
+                # bulk_update skips save(), so set what it would have
+                obj.updated_at = now
+                obj.last_ai_update = now
+                if hasattr(obj, 'rendered_fields'):
+                    obj.render_markdown_fields()
+            if hasattr(model, 'rendered_fields'):
+                fields += ['rendered_key', *model.rendered_fields.values()]
+            model.objects.bulk_update(changed.values(), fields)
+
+            for obj in changed.values():
+                course_ids.add(obj.pk if model is Course else obj.course_id)
+                if model is Lab:
+                    lab_slugs.add(obj.slug)
+                    if obj.course_id is None:
+                        search.index_lab(obj.pk)
+
+        ContentUpdate.objects.filter(pk__in=applied).update(applied_at=now)
+        course_ids.discard(None)
+        for course_id in course_ids:
+            search.index_course(course_id)
+
+    invalidate_content(course_ids, lab_slugs, courses_changed='course' in by_type)
+    return ApplyResult(len(applied), skipped, len(course_ids), rejected)
+
+
+def invalidate_content(course_ids, lab_slugs, courses_changed=False):
+    """Drop cached outlines and pages for the affected courses and labs"""
+    cache.delete_many([OUTLINE_CACHE_KEY.format(course_id) for course_id in course_ids])
+    slugs = Course.objects.filter(id__in=course_ids).values_list('slug', flat=True)
+    tags = [f'course:{slug}' for slug in slugs] + [f'lab:{slug}' for slug in lab_slugs]
+    if courses_changed:
+        tags.append('courses')
+    if lab_slugs:
+        tags.append('labs')
+    invalidate_tags(*tags)
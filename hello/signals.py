@@ -0,0 +1,116 @@
+"""
+Signal handlers that keep derived data in sync with the content models
+"""
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from . import search
+from .caching import invalidate_tags
+from .models import Course, Lesson, Lab, LearningPath, MCPProvider
+from .outline import invalidate_course_outline
+
+
+# Stored values needed to invalidate whatever an object pointed at before a save
+TRACKED_FIELDS = {
+    Course: ['slug'],
+    Lesson: ['course_id'],
+    Lab: ['course_id', 'slug'],
+    LearningPath: ['slug'],
+}
+
+
+def previous_tag(instance, prefix, field='slug'):
+    """Tag for the value an object had before this save, if it changed"""
+    previous = (getattr(instance, '_previous', None) or {}).get(field)
+    if previous is None or previous == getattr(instance, field):
+        return None
+    return f'{prefix}:{previous}'
+
+
+def course_slugs(*course_ids):
+    ids = {course_id for course_id in course_ids if course_id is not None}
+    if not ids:
+        return []
+    return list(Course.objects.filter(id__in=ids).values_list('slug', flat=True))
+
+
+@receiver(pre_save, sender=Course)
+@receiver(pre_save, sender=Lesson)
+@receiver(pre_save, sender=Lab)
+@receiver(pre_save, sender=LearningPath)
+def remember_previous_values(sender, instance, **kwargs):
+    if instance.pk is not None:
+        instance._previous = sender.objects.filter(pk=instance.pk).values(*TRACKED_FIELDS[sender]).first()
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def course_changed(sender, instance, **kwargs):
+    # Outline entries carry the course slug for their URLs
+    invalidate_course_outline(instance.id)
+    invalidate_tags('courses', f'course:{instance.slug}', previous_tag(instance, 'course'))
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+@receiver(post_save, sender=Lab)
+@receiver(post_delete, sender=Lab)
+def course_item_changed(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous', None) or {}
+    previous_course_id = previous.get('course_id')
+    invalidate_course_outline(instance.course_id)
+    if previous_course_id != instance.course_id:
+        invalidate_course_outline(previous_course_id)
+
+    tags = [f'course:{slug}' for slug in course_slugs(instance.course_id, previous_course_id)]
+    if sender is Lab:
+        tags += ['labs', f'lab:{instance.slug}', previous_tag(instance, 'lab')]
+    invalidate_tags(*tags)
+
+
+@receiver(post_save, sender=LearningPath)
+@receiver(post_delete, sender=LearningPath)
+def learning_path_changed(sender, instance, **kwargs):
+    invalidate_tags('paths', f'path:{instance.slug}', previous_tag(instance, 'path'))
+
+
+@receiver(m2m_changed, sender=LearningPath.courses.through)
+def learning_path_courses_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        slugs = [instance.slug]
+    elif action == 'pre_clear':
+        slugs = instance.learning_paths.values_list('slug', flat=True)
+    else:
+        slugs = LearningPath.objects.filter(pk__in=pk_set).values_list('slug', flat=True)
+    invalidate_tags('paths', *(f'path:{slug}' for slug in slugs))
+
+
+@receiver(post_save, sender=MCPProvider)
+@receiver(post_delete, sender=MCPProvider)
+def provider_changed(sender, instance, **kwargs):
+    invalidate_tags('providers')
+
+
+@receiver(post_save, sender=Course)
+def index_course(sender, instance, **kwargs):
+    # Lessons and labs are re-indexed too, as their visibility follows the course
+    search.index_course(instance.id)
+
+
+@receiver(post_save, sender=Lesson)
+def index_lesson(sender, instance, **kwargs):
+    search.index_lesson(instance.id)
+
+
+@receiver(post_save, sender=Lab)
+def index_lab(sender, instance, **kwargs):
+    search.index_lab(instance.id)
+
+
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=Lesson)
+@receiver(post_delete, sender=Lab)
+def remove_from_index(sender, instance, **kwargs):
+    search.remove(sender._meta.model_name, instance.id)
@@ -0,0 +1,165 @@
+"""
+Static export of the public pages, for the web server to serve without Django.
+
+Each published page is rendered through its view as an anonymous visitor
+would get it and written to <url>/index.html, with .gz/.br copies beside it.
+Later pages of the keyset-paginated listings go to <url>/after-<cursor>.html.
+A page's stamp hashes the updated_at of every row it shows. The manifest in
+the export directory records the stamps, so a re-run renders only pages
+whose rows changed and deletes pages that are no longer published.
+"""
+import hashlib
+import json
+import os
+from collections import defaultdict
+from pathlib import Path
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory, override_settings
+from django.urls import resolve, reverse
+
+from .models import Course, Lesson, Lab, LearningPath, MCPProvider
+from .pagination import CURSOR_PARAM, ORDERING, encode_cursor
+from .rendering import RENDERER_VERSION
+from .storage import compressed_variants
+
+
+MANIFEST_NAME = '.manifest.json'
+COMPRESSED_SUFFIXES = ('.gz', '.br')
+
+
+def page_stamp(*rows):
+    """Hash of the (id, updated_at) rows a page shows, plus the settings that change every page"""
+    raw = json.dumps([settings.PAGE_VERSION, RENDERER_VERSION, settings.STATIC_BUILD, rows], default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+
+
+def listing_urls(url, queryset):
+    """The URL of every page of a keyset-paginated listing, as hello.pagination links them"""
+    per_page = settings.LIST_PAGE_SIZE
+    keys = list(queryset.order_by(*ORDERING).values_list(*ORDERING))
+    # Each later page continues after the last row of the page before it
+    return [url] + [
+        f'{url}?{CURSOR_PARAM}={encode_cursor(list(keys[end - 1]))}'
+        for end in range(per_page, len(keys), per_page)
+    ]
+
+
+def published_pages():
+    """{url: stamp} for every exported page, from one query per table"""
+    courses = Course.objects.filter(is_published=True)
+    labs = Lab.objects.filter(is_published=True)
+    course_rows = {pk: (pk, updated) for pk, updated in courses.values_list('id', 'updated_at')}
+    lab_rows = list(labs.values_list('id', 'updated_at', 'slug', 'course_id'))
+    path_rows = list(LearningPath.objects.values_list('id', 'updated_at', 'slug', 'provider_id'))
+    provider_rows = {pk: (pk, updated) for pk, updated in MCPProvider.objects.values_list('id', 'updated_at')}
+
+    lessons_by_course = defaultdict(list)
+    lessons = Lesson.objects.filter(is_published=True, course__is_published=True).order_by('course_id', *ORDERING)
+    for course_id, pk, updated, slug in lessons.values_list('course_id', 'id', 'updated_at', 'slug'):
+        lessons_by_course[course_id].append((pk, updated, slug))
+    labs_by_course = defaultdict(list)
+    for pk, updated, _slug, course_id in lab_rows:
+        labs_by_course[course_id].append((pk, updated))
+    courses_by_path = defaultdict(list)
+    for path_id, course_id in LearningPath.courses.through.objects.filter(
+        course__is_published=True
+    ).values_list('learningpath_id', 'course_id'):
+        courses_by_path[path_id].append(course_rows[course_id])
+
+    all_courses = sorted(course_rows.values())
+    all_paths = [row[:2] for row in path_rows]
+    # The home page only features paths that have a published course
+    path_memberships = [(pk, sorted(courses_by_path[pk])) for pk, *_rest in path_rows]
+    pages = {reverse('home'): page_stamp(all_courses, all_paths, path_memberships, sorted(provider_rows.values()))}
+    for url in listing_urls(reverse('course_list'), courses):
+        pages[url] = page_stamp(all_courses)
+    for url in listing_urls(reverse('lab_list'), labs):
+        # Lab cards show their course's title
+        pages[url] = page_stamp([row[:2] for row in lab_rows], all_courses)
+    pages[reverse('learning_path_list')] = page_stamp(all_paths, sorted(provider_rows.values()))
+
+    for course_id, course_slug in courses.values_list('id', 'slug'):
+        course = course_rows[course_id]
+        outline = lessons_by_course[course_id]
+        pages[reverse('course_detail', args=[course_slug])] = page_stamp(
+            course, [row[:2] for row in outline], labs_by_course[course_id]
+        )
+        for index, (pk, updated, slug) in enumerate(outline):
+            # The previous and next links show the neighbouring lessons' titles
+            neighbours = [row[:2] for row in outline[max(index - 1, 0):index + 2]]
+            pages[reverse('lesson_detail', args=[course_slug, slug])] = page_stamp(course, neighbours)
+    for pk, updated, slug, _course_id in lab_rows:
+        pages[reverse('lab_detail', args=[slug])] = page_stamp((pk, updated))
+    for pk, updated, slug, provider_id in path_rows:
+        pages[reverse('learning_path_detail', args=[slug])] = page_stamp(
+            (pk, updated), provider_rows.get(provider_id), sorted(courses_by_path[pk])
+        )
+    return pages
+
+
+def page_file(output_dir, url):
+    """Where an exported URL is written"""
+    path, _, query = url.partition('?')
+    name = f'after-{query.partition("=")[2]}.html' if query else 'index.html'
+    return Path(output_dir, path.strip('/'), name)
+
+
+def write_file(path, content):
+    """Replace `path` in one step, so the web server never sends a half-written page"""
+    temporary = path.with_name(f'.{path.name}.tmp')
+    temporary.write_bytes(content)
+    os.replace(temporary, path)
+
+
+def render_page(url, output_dir):
+    """Render `url` through its view and write it with its compressed copies
+
+    The page cache is bypassed, so the export never writes a cached response
+    that predates the rows it stamped, nor fills the site's cache.
+    """
+    path = url.partition('?')[0]
+    request = RequestFactory().get(url)
+    request.user = AnonymousUser()
+    match = resolve(path)
+    view = async_to_sync(match.func) if iscoroutinefunction(match.func) else match.func
+    with override_settings(PAGE_CACHE_SECONDS=0):
+        response = view(request, *match.args, **match.kwargs)
+    if response.status_code != 200:
+        raise ValueError(f'{url} returned status {response.status_code}')
+
+    target = page_file(output_dir, url)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    write_file(target, response.content)
+    variants = dict(compressed_variants(response.content))
+    for suffix in COMPRESSED_SUFFIXES:
+        compressed = Path(f'{target}{suffix}')
+        if suffix in variants:
+            write_file(compressed, variants[suffix])
+        else:
+            # Don't leave a copy of an older version behind
+            compressed.unlink(missing_ok=True)
+
+
+def render_pages(urls, output_dir):
+    """Render each of `urls`; returns [(url, error message or None)] so one bad page doesn't stop the rest
+
+    Runs in the export's worker processes.
+    """
+    results = []
+    for url in urls:
+        try:
+            render_page(url, output_dir)
+        except Exception as e:
+            results.append((url, str(e) or e.__class__.__name__))
+        else:
+            results.append((url, None))
+    return results
+
+
+def remove_page(output_dir, url):
+    target = page_file(output_dir, url)
+    for suffix in ('', *COMPRESSED_SUFFIXES):
+        Path(f'{target}{suffix}').unlink(missing_ok=True)
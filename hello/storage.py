@@ -0,0 +1,49 @@
+"""
+Static files storage that fingerprints and precompresses collected assets.
+
+collectstatic writes each file under a content-hashed name (site.3f2a1c.css)
+so it can be served with far-future cache headers, then writes .gz and, when
+the brotli package is installed, .br copies next to the hashed text files for
+the web server to send as-is (nginx gzip_static / brotli_static).
+"""
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.map', '.html', '.xml')
+
+
+def compressed_variants(content):
+    """[(suffix, bytes)] for the .gz and, with brotli installed, .br copies that come out smaller than `content`"""
+    variants = [('.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(content)))
+    return [(suffix, compressed) for suffix, compressed in variants if len(compressed) < len(content)]
+
+
+class PrecompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage that also writes compressed copies of hashed text files"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        # Only the final names in the manifest, not files from earlier passes
+        for name in sorted(set(self.hashed_files.values())):
+            if name.endswith(COMPRESSIBLE_EXTENSIONS):
+                self.compress(name)
+
+    def compress(self, name):
+        """Write name.gz and name.br when they come out smaller than the original"""
+        with self.open(name) as source:
+            content = source.read()
+
+        for suffix, compressed in compressed_variants(content):
+            with open(self.path(name + suffix), 'wb') as output:
+                output.write(compressed)
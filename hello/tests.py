@@ -1,3 +1,1775 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+import os
+import re
+import sqlite3
+import subprocess
+import sys
+import time
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import anthropic
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, connections
+from django.db.models import Max
+from django.test import Client, LiveServerTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from demo_site.asgi import application as asgi_application
+from demo_site.urls import public_urlpatterns
+
+from . import async_views, search
+from .admin import EstimatedCountPaginator
+from .catalog import CatalogError, CatalogImporter
+from .management.commands.benchmark_concurrency import SERVERS, ServerSetup
+from .management.commands.build_assets import icon_codepoints, icon_css, used_icons
+from .management.commands.stress_sqlite import connect
+from .management.commands.update_content import RateLimiter
+from .pagination import after
+from .rendering import highlight_css, render_markdown
+from .sections import join_sections, split_sections
+from .models import Course, Lesson, Lab, LearningPath, MCPProvider, ContentUpdate, ContentBatch
+from .services.claude_service import CircuitBreaker, CircuitOpenError, ClaudeService
+from .services.prompts import SYSTEM_PROMPT
+from .services.content_updates import apply_updates, fail_abandoned_updates, parse_update, stream_update
+
+
+class FakeBatches:
+    """In-memory stand-in for the Message Batches endpoints"""
+
+    def __init__(self, polls_until_ended=1, truncated=(), results_errors=()):
+        self.polls_until_ended = polls_until_ended
+        self.submitted = {}
+        # custom_ids whose results stop at max_tokens, and errors raised fetching results
+        self.truncated = set(truncated)
+        self.results_errors = list(results_errors)
+
+    def create(self, requests):
+        batch_id = f'msgbatch_{len(self.submitted) + 1}'
+        self.submitted[batch_id] = requests
+        return SimpleNamespace(id=batch_id, processing_status='in_progress')
+
+    def retrieve(self, batch_id):
+        self.polls_until_ended -= 1
+        ended = self.polls_until_ended <= 0
+        count = len(self.submitted[batch_id])
+        return SimpleNamespace(
+            id=batch_id,
+            processing_status='ended' if ended else 'in_progress',
+            request_counts=SimpleNamespace(
+                processing=0 if ended else count, succeeded=count if ended else 0, errored=0
+            ),
+        )
+
+    def results(self, batch_id):
+        if self.results_errors:
+            raise self.results_errors.pop(0)
+        return self.result_entries(batch_id)
+
+    def result_entries(self, batch_id):
+        for request in self.submitted[batch_id]:
+            if request['custom_id'].startswith('lab-'):
+                result = SimpleNamespace(type='errored')
+            else:
+                text = f"updated {request['custom_id']}"
+                stop_reason = 'max_tokens' if request['custom_id'] in self.truncated else 'end_turn'
+                result = SimpleNamespace(
+                    type='succeeded',
+                    message=SimpleNamespace(content=[SimpleNamespace(text=text)], stop_reason=stop_reason),
+                )
+            yield SimpleNamespace(custom_id=request['custom_id'], result=result)
+
+
+@override_settings(ANTHROPIC_API_KEY='test-key')
+class BatchUpdateTests(TestCase):
+    databases = {'default', 'updates'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.course = Course.objects.create(
+            title='Intro', slug='intro', description='About MCP', short_description='Intro'
+        )
+        cls.lesson = Lesson.objects.create(course=cls.course, title='Basics', slug='basics', content='# Basics')
+        cls.lab = Lab.objects.create(
+            course=cls.course, title='First Lab', slug='first-lab', description='Build', instructions='Steps'
+        )
+
+    def run_batch(self, batches, *args):
+        service = ClaudeService()
+        service.client = SimpleNamespace(messages=SimpleNamespace(batches=batches))
+        out = StringIO()
+        with mock.patch('hello.management.commands.update_content.ClaudeService', return_value=service):
+            call_command('update_content', '--all', '--batch', '--poll-interval', '0', *args, stdout=out)
+        return out.getvalue()
+
+    def test_submits_polls_and_ingests(self):
+        batches = FakeBatches(polls_until_ended=2)
+        self.run_batch(batches)
+
+        submitted = batches.submitted['msgbatch_1']
+        self.assertEqual(
+            {request['custom_id'] for request in submitted},
+            {f'course-{self.course.id}', f'lesson-{self.lesson.id}', f'lab-{self.lab.id}'},
+        )
+        batch = ContentBatch.objects.get()
+        self.assertEqual(batch.status, 'ingested')
+        self.assertEqual(batch.request_count, 3)
+
+        updates = ContentUpdate.objects.order_by('content_type')
+        self.assertEqual(
+            [(update.content_type, update.content_id) for update in updates],
+            [('course', self.course.id), ('lesson', self.lesson.id)],
+        )
+        self.assertEqual(updates[1].ai_response, f'updated lesson-{self.lesson.id}')
+        self.assertIn('Basics', updates[1].prompt_used)
+
+    def test_no_wait_then_resume(self):
+        batches = FakeBatches(polls_until_ended=2)
+        self.run_batch(batches, '--no-wait')
+        self.assertEqual(ContentBatch.objects.get().status, 'in_progress')
+        self.assertFalse(ContentUpdate.objects.exists())
+
+        self.run_batch(batches, '--no-wait')
+        self.assertEqual(len(batches.submitted), 1)
+        self.assertEqual(ContentBatch.objects.get().status, 'ingested')
+        self.assertEqual(ContentUpdate.objects.count(), 2)
+
+    def test_rerun_skips_processed_and_unchanged_content(self):
+        batches = FakeBatches()
+        self.run_batch(batches)
+        self.assertIsNotNone(Lesson.objects.get(pk=self.lesson.pk).last_ai_update)
+
+        # The lesson's pending update has the same fingerprint, so clearing
+        # last_ai_update alone must not send it again
+        Lesson.objects.filter(pk=self.lesson.pk).update(last_ai_update=None)
+        batches.polls_until_ended = 1
+        self.run_batch(batches)
+        self.assertEqual(
+            [request['custom_id'] for request in batches.submitted['msgbatch_2']],
+            [f'lab-{self.lab.id}'],
+        )
+
+        Lesson.objects.filter(pk=self.lesson.pk).update(content='# Basics, revised', last_ai_update=None)
+        batches.polls_until_ended = 1
+        self.run_batch(batches)
+        self.assertIn(f'lesson-{self.lesson.id}', [request['custom_id'] for request in batches.submitted['msgbatch_3']])
+
+
+    @mock.patch('hello.services.claude_service.time.sleep')
+    def test_truncated_results_are_requeued(self, sleep):
+        course_id = f'course-{self.course.id}'
+        batches = FakeBatches(
+            truncated=[course_id], results_errors=[anthropic.APIConnectionError(request=None)]
+        )
+        self.assertIn('1 updates ingested, 2 failed', self.run_batch(batches))
+
+        # The results fetch was retried, and the cut-off course left stale
+        sleep.assert_called_once()
+        self.assertEqual(list(ContentUpdate.objects.values_list('content_type', flat=True)), ['lesson'])
+        self.assertIsNone(Course.objects.get(pk=self.course.pk).last_ai_update)
+
+        batches.truncated.clear()
+        self.run_batch(batches)
+        self.assertIn(course_id, [request['custom_id'] for request in batches.submitted['msgbatch_2']])
+
+
+class CourseOutlineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.course = Course.objects.create(
+            title='Intro', slug='intro', description='About MCP', short_description='Intro'
+        )
+        for order, slug in enumerate(['one', 'two', 'three'], start=1):
+            Lesson.objects.create(course=cls.course, title=slug.title(), slug=slug, order=order, content='Body')
+
+    def setUp(self):
+        cache.clear()
+
+    def lesson_url(self, slug):
+        return reverse('lesson_detail', kwargs={'course_slug': 'intro', 'lesson_slug': slug})
+
+    def test_navigation_uses_outline(self):
+        response = self.client.get(self.lesson_url('two'))
+        self.assertEqual(response.context['prev_lesson'].slug, 'one')
+        self.assertEqual(response.context['next_lesson'].slug, 'three')
+        self.assertContains(response, self.lesson_url('three'))
+
+        with self.assertNumQueries(1):
+            self.client.get(self.lesson_url('three'))
+
+    def test_saving_a_lesson_invalidates_outline(self):
+        self.client.get(self.lesson_url('one'))
+        Lesson.objects.create(course=self.course, title='One and a half', slug='one-half', order=1, content='Body')
+        Lesson.objects.filter(slug='two').first().delete()
+
+        response = self.client.get(self.lesson_url('one'))
+        self.assertEqual(response.context['next_lesson'].slug, 'one-half')
+        response = self.client.get(reverse('course_detail', kwargs={'slug': 'intro'}))
+        self.assertEqual([lesson.slug for lesson in response.context['lessons']], ['one', 'one-half', 'three'])
+
+
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.course = Course.objects.create(
+            title='Intro', slug='intro', description='About MCP', short_description='Intro',
+            difficulty_level='beginner',
+        )
+        cls.lesson = Lesson.objects.create(course=cls.course, title='Basics', slug='basics', content='Body')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_pages_are_served_from_cache(self):
+        url = reverse('course_detail', kwargs={'slug': 'intro'})
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertContains(response, 'Basics')
+
+    def test_query_params_are_part_of_the_key(self):
+        url = reverse('course_list')
+        self.assertContains(self.client.get(url, {'difficulty': 'beginner'}), 'Intro')
+        self.assertNotContains(self.client.get(url, {'difficulty': 'advanced'}), 'Intro')
+
+    def test_saves_invalidate_dependent_pages(self):
+        course_url = reverse('course_detail', kwargs={'slug': 'intro'})
+        lesson_url = reverse('lesson_detail', kwargs={'course_slug': 'intro', 'lesson_slug': 'basics'})
+        self.client.get(course_url)
+        self.client.get(lesson_url)
+
+        self.lesson.title = 'Fundamentals'
+        self.lesson.save()
+        self.assertContains(self.client.get(course_url), 'Fundamentals')
+        self.assertContains(self.client.get(lesson_url), 'Fundamentals')
+
+    def test_learning_path_membership_invalidates_path_page(self):
+        path = LearningPath.objects.create(name='Path', slug='path', description='A path')
+        url = reverse('learning_path_detail', kwargs={'slug': 'path'})
+        self.assertNotContains(self.client.get(url), 'View Course')
+
+        self.course.learning_paths.add(path)
+        self.assertContains(self.client.get(url), 'View Course')
+
+    @override_settings(PAGE_CACHE_SECONDS=0)
+    def test_cache_can_be_disabled(self):
+        url = reverse('course_list')
+        self.client.get(url)
+        with self.assertNumQueries(1):
+            self.client.get(url)
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.course = Course.objects.create(
+            title='Intro', slug='intro', description='About MCP', short_description='Intro'
+        )
+        cls.lab = Lab.objects.create(
+            course=cls.course, title='First Lab', slug='first-lab', description='Build', instructions='Steps'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_unchanged_page_returns_304_without_queries(self):
+        url = reverse('lab_detail', kwargs={'slug': 'first-lab'})
+        response = self.client.get(url)
+        self.assertTrue(response.has_header('ETag'))
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_validators_change_with_content(self):
+        url = reverse('lab_detail', kwargs={'slug': 'first-lab'})
+        etag = self.client.get(url)['ETag']
+
+        self.lab.instructions = 'New steps'
+        self.lab.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_invalidations_from_other_processes_change_the_validators(self):
+        url = reverse('lab_detail', kwargs={'slug': 'first-lab'})
+        etag = self.client.get(url)['ETag']
+
+        # As apply_content_updates would, from a process of its own
+        subprocess.run(
+            [sys.executable, 'manage.py', 'shell', '-c',
+             "from hello.caching import invalidate_tags; invalidate_tags('lab:first-lab')"],
+            cwd=settings.BASE_DIR, check=True, capture_output=True,
+            env={**os.environ, 'CACHE_LOCATION': settings.CACHES['default']['LOCATION']},
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_query_params_get_their_own_etag(self):
+        url = reverse('lab_list')
+        self.assertNotEqual(self.client.get(url)['ETag'], self.client.get(url, {'difficulty': 'easy'})['ETag'])
+
+
+def matching(model, text):
+    """Ids of the `model` objects matching `text`, published or not"""
+    ids = search.matching_ids(text, model._meta.model_name)
+    return list(model.objects.filter(pk__in=ids).values_list('pk', flat=True))
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.course = Course.objects.create(
+            title='Transport Layers', slug='transport', description='Stdio and HTTP transports',
+            short_description='Transports',
+        )
+        cls.lesson = Lesson.objects.create(
+            course=cls.course, title='Streaming responses', slug='streaming',
+            content='Servers can stream <partial> results over server-sent events.',
+        )
+        cls.lab = Lab.objects.create(
+            course=cls.course, title='Build a resource server', slug='resources',
+            description='Expose files as resources', instructions='Implement the resources/list handler',
+        )
+
+    def test_ranked_highlighted_results(self):
+        response = self.client.get(reverse('search'), {'q': 'stream'})
+        results = response.context['results']
+        self.assertEqual([result.object for result in results], [self.lesson])
+        self.assertIn('<mark>Streaming</mark>', results[0].title_html)
+        self.assertIn('&lt;partial&gt;', results[0].snippet_html)
+        self.assertContains(response, self.lesson.get_absolute_url())
+
+    def test_index_follows_saves_and_deletes(self):
+        self.lab.title = 'Build a prompt server'
+        self.lab.save()
+        self.assertEqual(matching(Lab, 'prompt'), [self.lab.id])
+
+        self.course.is_published = False
+        self.course.save()
+        self.assertEqual(search.search('stream'), [])
+        self.assertEqual(matching(Lesson, 'stream'), [self.lesson.id])
+
+        self.lesson.delete()
+        self.assertEqual(matching(Lesson, 'stream'), [])
+
+    def test_matching_ids_without_the_index(self):
+        with mock.patch('hello.search.is_available', return_value=False):
+            self.assertEqual(matching(Lab, 'resource handler'), [self.lab.id])
+            self.assertEqual(matching(Lesson, 'stream'), [self.lesson.id])
+            self.assertEqual(matching(Course, 'stdio websocket'), [])
+            self.assertEqual(matching(Course, '***'), [])
+
+    def test_rebuild_and_query_syntax(self):
+        call_command('rebuild_search_index', stdout=StringIO())
+        # Operators and quotes in user input are searched as plain words
+        self.assertEqual([result.object for result in search.search('stdio AND')], [self.course])
+        self.assertEqual([result.object for result in search.search('transport"')], [self.course])
+        self.assertEqual(search.search('***'), [])
+
+
+class QueryPlanTests(TestCase):
+    """Hot public queries must stay on an index, without a full scan or temp B-tree sort"""
+
+    @classmethod
+    def setUpTestData(cls):
+        difficulties = ['beginner', 'intermediate', 'advanced']
+        courses = Course.objects.bulk_create(
+            Course(
+                title=f'Course {i}', slug=f'course-{i}', description='Description', short_description='Short',
+                difficulty_level=difficulties[i % 3], order=i % 7, is_published=i % 5 != 0,
+            )
+            for i in range(300)
+        )
+        Lesson.objects.bulk_create(
+            Lesson(course=course, title=f'Lesson {j}', slug=f'lesson-{j}', content='Body', order=j, is_published=j != 3)
+            for course in courses for j in range(10)
+        )
+        Lab.objects.bulk_create(
+            Lab(
+                course=course, title=f'Lab {course.id}-{j}', slug=f'lab-{course.id}-{j}', description='Build',
+                instructions='Steps', difficulty=['easy', 'medium', 'hard'][j], order=j, is_published=j != 1,
+            )
+            for course in courses for j in range(3)
+        )
+        LearningPath.objects.bulk_create(
+            LearningPath(name=f'Path {i}', slug=f'path-{i}', description='Path', is_featured=i % 2 == 0, order=i)
+            for i in range(50)
+        )
+        cls.course = courses[1]
+
+    def assertIndexedPlan(self, queryset):
+        plan = queryset.explain()
+        self.assertNotIn('TEMP B-TREE', plan, plan)
+        for line in plan.splitlines():
+            if ' SCAN ' in f' {line}':
+                self.assertIn('USING', line, plan)
+
+    def test_course_queries(self):
+        self.assertIndexedPlan(Course.objects.filter(is_published=True))
+        self.assertIndexedPlan(Course.objects.filter(is_published=True, difficulty_level='advanced'))
+        self.assertIndexedPlan(Course.objects.filter(is_published=True)[:6])
+
+    def test_course_outline_queries(self):
+        self.assertIndexedPlan(self.course.lessons.filter(is_published=True).values_list('id', 'slug', 'title', 'order'))
+        self.assertIndexedPlan(self.course.labs.filter(is_published=True))
+
+    def test_lab_queries(self):
+        self.assertIndexedPlan(Lab.objects.filter(is_published=True))
+        self.assertIndexedPlan(Lab.objects.filter(is_published=True, difficulty='hard'))
+
+    def test_keyset_page_queries(self):
+        cursor = after(3, 'Course 5', 5)
+        ordering = ['order', 'title', 'id']
+        self.assertIndexedPlan(Course.objects.filter(is_published=True).filter(cursor).order_by(*ordering)[:25])
+        self.assertIndexedPlan(
+            Course.objects.filter(is_published=True, difficulty_level='advanced').filter(cursor).order_by(*ordering)[:25]
+        )
+        self.assertIndexedPlan(
+            Lab.objects.filter(is_published=True, difficulty='hard').select_related('course')
+            .filter(cursor).order_by(*ordering)[:25]
+        )
+
+    def test_learning_path_queries(self):
+        self.assertIndexedPlan(LearningPath.objects.filter(is_featured=True))
+        self.assertIndexedPlan(LearningPath.objects.all())
+        self.assertIndexedPlan(MCPProvider.objects.filter(is_active=True))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class QueryBudgetTests(TestCase):
+    """Each public URL has a fixed query budget that must not grow with the catalog"""
+
+    BUDGETS = {
+        '/': 3,
+        '/courses/': 1,
+        '/courses/?difficulty=beginner': 1,
+        '/courses/course-0/': 3,
+        '/courses/course-0/lessons/lesson-1/': 3,
+        '/labs/': 1,
+        '/labs/?difficulty=easy': 1,
+        '/labs/lab-0-0/': 1,
+        '/paths/': 1,
+        '/paths/path-0/': 2,
+        '/search/?q=lesson': 4,
+    }
+
+    def add_catalog(self, start, count):
+        provider = MCPProvider.objects.create(name=f'Provider {start}', description='Provider')
+        for i in range(start, start + count):
+            course = Course.objects.create(
+                title=f'Course {i}', slug=f'course-{i}', description='Description', short_description='Short'
+            )
+            for j in range(4):
+                Lesson.objects.create(course=course, title=f'Lesson {j}', slug=f'lesson-{j}', content='Lesson body')
+                Lab.objects.create(
+                    course=course, title=f'Lab {i}-{j}', slug=f'lab-{i}-{j}', description='Build',
+                    instructions='Steps', difficulty='easy',
+                )
+            path = LearningPath.objects.create(
+                name=f'Path {i}', slug=f'path-{i}', description='Path', provider=provider, is_featured=True
+            )
+            path.courses.add(course, *Course.objects.all()[:3])
+
+    def query_counts(self):
+        counts = {}
+        for url in self.BUDGETS:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            counts[url] = len(queries)
+        return counts
+
+    def test_query_counts_are_within_budget_and_constant(self):
+        self.add_catalog(0, 2)
+        small = self.query_counts()
+        self.add_catalog(2, 20)
+        large = self.query_counts()
+
+        for url, budget in self.BUDGETS.items():
+            self.assertLessEqual(large[url], budget, url)
+            self.assertEqual(small[url], large[url], f'{url} query count grows with the catalog')
+
+
+class BenchmarkCommandTests(TestCase):
+    def test_generate_catalog_renders_and_indexes_content(self):
+        call_command('generate_catalog', courses=3, lessons_per_course=2, labs_per_course=1, paths=1,
+                     courses_per_path=2, stdout=StringIO())
+
+        self.assertEqual(Course.objects.filter(slug__startswith='synthetic-').count(), 3)
+        self.assertEqual(Lesson.objects.exclude(content_html='').count(), 6)
+        self.assertEqual(LearningPath.objects.get().courses.count(), 2)
+        self.assertTrue(search.search_rows('server'))
+
+        call_command('generate_catalog', courses=1, lessons_per_course=0, labs_per_course=0, paths=0,
+                     clear=True, stdout=StringIO())
+        self.assertEqual(Course.objects.count(), 1)
+
+    def test_benchmark_urls_reports_every_route(self):
+        call_command('generate_catalog', courses=2, lessons_per_course=1, labs_per_course=1, paths=1,
+                     courses_per_path=1, stdout=StringIO())
+        with TemporaryDirectory() as directory:
+            output = Path(directory) / 'results.json'
+            call_command('benchmark_urls', iterations=2, warmup=0, output=str(output), stdout=StringIO())
+            report = json.loads(output.read_text())
+
+        self.assertEqual(report['catalog']['courses'], 2)
+        self.assertIn(reverse('lab_list') + '?difficulty=easy', report['results'])
+        for url, result in report['results'].items():
+            self.assertEqual(result['status'], 200, url)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+
+
+class ConcurrencyBenchmarkTests(LiveServerTestCase):
+    def test_benchmark_concurrency_loads_a_running_server(self):
+        call_command('generate_catalog', courses=2, lessons_per_course=1, labs_per_course=1, paths=1,
+                     courses_per_path=1, stdout=StringIO())
+        with TemporaryDirectory() as directory:
+            output = Path(directory) / 'results.json'
+            call_command(
+                'benchmark_concurrency', base_url=self.live_server_url, concurrency=[2], duration=0.5,
+                slow_clients=1, output=str(output), stdout=StringIO(),
+            )
+            report = json.loads(output.read_text())
+
+        result = report['results']['2']
+        self.assertGreater(result['requests'], 0)
+        self.assertEqual(result['errors'], 0)
+
+    def test_served_setups_are_started_loaded_and_compared(self):
+        call_command('generate_catalog', courses=2, lessons_per_course=1, labs_per_course=1, paths=1,
+                     courses_per_path=1, stdout=StringIO())
+        # Stands in for gunicorn: answers / and 404s the rest
+        static_server = ServerSetup([], ['-m', 'http.server', '{port}', '--bind', '127.0.0.1'], {})
+
+        out = StringIO()
+        with TemporaryDirectory() as directory, \
+                mock.patch.dict(SERVERS, {'wsgi': static_server, 'asgi': static_server}), \
+                mock.patch.object(settings, 'BASE_DIR', Path(directory)):
+            call_command(
+                'benchmark_concurrency', serve=['wsgi', 'asgi'], concurrency=[2], duration=0.5, stdout=out,
+            )
+            reports = {path.name for path in Path(directory, 'benchmarks').iterdir()}
+
+        self.assertEqual(reports, {'concurrency-wsgi.json', 'concurrency-asgi.json'})
+        self.assertIn('Compared with wsgi:', out.getvalue())
+
+        with mock.patch.dict(SERVERS, {'asgi': ServerSetup(['not_an_installed_server'], [], {})}):
+            with self.assertRaisesMessage(CommandError, 'needs not_an_installed_server'):
+                call_command('benchmark_concurrency', serve=['asgi'], stdout=StringIO())
+
+
+@override_settings(PAGE_CACHE_SECONDS=600)
+class CatalogImportExportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        provider = MCPProvider.objects.create(name='Anthropic', description='Claude')
+        self.course = Course.objects.create(
+            title='MCP Basics', slug='mcp-basics', description='Intro', short_description='Intro'
+        )
+        other = Course.objects.create(title='Advanced', slug='advanced', description='More', short_description='More')
+        lesson = Lesson.objects.create(course=self.course, title='Servers', slug='servers', content='# Servers')
+        Lab.objects.create(
+            course=self.course, lesson=lesson, title='Build', slug='build', description='Build a server',
+            instructions='1. Run it', difficulty='easy',
+        )
+        path = LearningPath.objects.create(name='Path', slug='path', description='Path', provider=provider)
+        path.courses.add(self.course, other)
+
+    def export(self):
+        out = StringIO()
+        call_command('export_content', stdout=out)
+        return out.getvalue().splitlines()
+
+    def load(self, lines):
+        return CatalogImporter(batch_size=2).load(lines)
+
+    def test_export_round_trips_into_an_empty_database(self):
+        lines = self.export()
+        self.assertEqual([json.loads(line)['type'] for line in lines],
+                         ['provider', 'course', 'course', 'lesson', 'lab', 'learning_path'])
+
+        for model in (LearningPath, Lab, Lesson, Course, MCPProvider):
+            model.objects.all().delete()
+        stats = self.load(lines)
+
+        self.assertEqual(stats['course']['created'], 2)
+        lab = Lab.objects.select_related('lesson__course').get(slug='build')
+        self.assertEqual((lab.lesson.course.slug, lab.lesson.slug), ('mcp-basics', 'servers'))
+        self.assertIn('<h1>Servers</h1>', Lesson.objects.get().content_html)
+        path = LearningPath.objects.get(slug='path')
+        self.assertEqual(path.provider.name, 'Anthropic')
+        self.assertEqual(set(path.courses.values_list('slug', flat=True)), {'mcp-basics', 'advanced'})
+        self.assertEqual(self.export(), lines)
+
+    def test_reimport_is_a_no_op(self):
+        # Microseconds that a millisecond export would lose
+        refreshed = timezone.now().replace(microsecond=123456)
+        Course.objects.filter(pk=self.course.pk).update(last_ai_update=refreshed)
+        Lesson.objects.update(last_ai_update=refreshed)
+        Lab.objects.update(last_ai_update=refreshed)
+        lines = self.export()
+        stats = self.load(lines)
+
+        for counts in stats.values():
+            self.assertEqual(counts['created'] + counts['updated'], 0)
+        out = StringIO()
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / 'catalog.ndjson'
+            path.write_text('\n'.join(lines))
+            call_command('import_content', str(path), stdout=out)
+        self.assertIn('0 updated', out.getvalue())
+        self.assertNotRegex(out.getvalue(), r'[1-9]\d* updated')
+
+    def test_changed_rows_are_updated_rendered_and_invalidated(self):
+        self.client.get(self.course.get_absolute_url(), SERVER_NAME='localhost')
+        rows = [json.loads(line) for line in self.export()]
+        for row in rows:
+            if row['type'] == 'lesson':
+                row['content'] = '# Transports'
+                row['title'] = 'Transports'
+            if row['type'] == 'learning_path':
+                row['courses'] = ['advanced']
+
+        stats = self.load(json.dumps(row) for row in rows)
+
+        self.assertEqual(stats['lesson']['updated'], 1)
+        self.assertEqual(stats['course']['unchanged'], 2)
+        self.assertIn('<h1>Transports</h1>', Lesson.objects.get().content_html)
+        self.assertEqual(list(LearningPath.objects.get().courses.values_list('slug', flat=True)), ['advanced'])
+        self.assertEqual(matching(Lesson, 'transports'), [Lesson.objects.get().id])
+        response = self.client.get(self.course.get_absolute_url(), SERVER_NAME='localhost')
+        self.assertContains(response, 'Transports')
+
+    def test_unknown_reference_rolls_back_the_import(self):
+        lines = [
+            json.dumps({'type': 'course', 'slug': 'new-course', 'title': 'New'}),
+            json.dumps({'type': 'lesson', 'course': 'missing', 'slug': 'intro', 'title': 'Intro'}),
+        ]
+        with self.assertRaisesMessage(CatalogError, "Line 2: unknown course 'missing'"):
+            self.load(lines)
+        self.assertFalse(Course.objects.filter(slug='new-course').exists())
+
+
+@override_settings(LIST_PAGE_SIZE=4, PAGE_CACHE_SECONDS=0)
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Course.objects.bulk_create(
+            Course(
+                title=f'Course {i % 3}', slug=f'course-{i}', description='Description', short_description='Short',
+                difficulty_level=['beginner', 'advanced'][i % 2], order=i % 4,
+            )
+            for i in range(11)
+        )
+
+    def walk(self, url):
+        """Follow the next links from `url`, returning the slugs shown and the queries run"""
+        slugs, queries = [], []
+        while url:
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get(url, SERVER_NAME='localhost')
+            queries.extend(query['sql'] for query in captured)
+            page = response.context['page']
+            slugs.extend(course.slug for course in page)
+            url = f"{reverse('course_list')}?{page.next_query}" if page.has_next else None
+        return slugs, queries
+
+    def test_pages_cover_every_course_in_order(self):
+        expected = list(Course.objects.order_by('order', 'title', 'id').values_list('slug', flat=True))
+        slugs, queries = self.walk(reverse('course_list'))
+
+        self.assertEqual(slugs, expected)
+        self.assertEqual(len(queries), 3)
+        for sql in queries:
+            self.assertNotIn('OFFSET', sql)
+            self.assertNotIn('COUNT(', sql)
+
+    def test_next_links_keep_the_difficulty_filter(self):
+        expected = list(
+            Course.objects.filter(difficulty_level='advanced').order_by('order', 'title', 'id')
+            .values_list('slug', flat=True)
+        )
+        slugs, _queries = self.walk(reverse('course_list') + '?difficulty=advanced')
+
+        self.assertEqual(slugs, expected)
+
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get(reverse('lab_list') + '?after=bm9wZQ', SERVER_NAME='localhost')
+        self.assertEqual(response.status_code, 404)
+
+
+class ApplyContentUpdatesTests(TestCase):
+    databases = {'default', 'updates'}
+
+    def setUp(self):
+        cache.clear()
+        self.course = Course.objects.create(
+            title='MCP Basics', slug='mcp-basics', description='Old description', short_description='Intro'
+        )
+        self.lesson = Lesson.objects.create(course=self.course, title='Servers', slug='servers', content='Old body')
+        self.lab = Lab.objects.create(
+            course=self.course, title='Build', slug='build', description='Old lab', instructions='Old steps'
+        )
+
+    def update(self, obj, response, status='approved'):
+        return ContentUpdate.objects.create(
+            content_type=obj._meta.model_name, content_id=obj.id, prompt_used='Refresh',
+            ai_response=response, status=status,
+        )
+
+    def test_parse_update_follows_the_prompt_layout(self):
+        self.assertEqual(
+            parse_update('course', 'Title: MCP Basics\nDescription: New **text**\n\nMore'),
+            {'description': 'New **text**\n\nMore'},
+        )
+        self.assertEqual(
+            parse_update('lab', 'Description:\n# Build a server\n\nTwo tools.\n\n**Instructions:**\n1. Step\n\n2. Step'),
+            {'description': '# Build a server\n\nTwo tools.', 'instructions': '1. Step\n\n2. Step'},
+        )
+        with self.assertRaises(ValueError):
+            parse_update('lab', 'Intro\n\n1. Step')
+
+    def test_approved_updates_are_applied_in_bulk(self):
+        self.update(self.course, 'Title: MCP Basics\nDescription: Fresh description')
+        self.update(self.lesson, '# Older rewrite')
+        latest = self.update(self.lesson, '# Transports')
+        self.update(self.lab, 'Description: New lab\n\nInstructions:\n1. Run the server')
+        pending = self.update(self.lesson, '# Not reviewed', status='pending')
+        course_url = self.course.get_absolute_url()
+        self.client.get(course_url)
+
+        with self.assertNumQueries(15), self.assertNumQueries(4, using='updates'):
+            result = apply_updates(ContentUpdate.objects.all())
+
+        self.assertEqual((result.applied, result.skipped, result.courses), (4, 0, 1))
+        self.course.refresh_from_db()
+        self.lesson.refresh_from_db()
+        self.lab.refresh_from_db()
+        self.assertEqual(self.course.description, 'Fresh description')
+        self.assertEqual(self.lesson.content_html, '<h1>Transports</h1>')
+        self.assertEqual((self.lab.description, self.lab.instructions), ('New lab', '1. Run the server'))
+        self.assertIsNotNone(self.lesson.last_ai_update)
+        latest.refresh_from_db()
+        pending.refresh_from_db()
+        self.assertIsNotNone(latest.applied_at)
+        self.assertIsNone(pending.applied_at)
+        self.assertEqual(matching(Lesson, 'transports'), [self.lesson.id])
+        self.assertContains(self.client.get(course_url), 'Fresh description')
+
+        # Applied updates are not applied again
+        self.assertEqual(apply_updates(ContentUpdate.objects.all()).applied, 0)
+
+    def test_updates_for_deleted_content_are_skipped(self):
+        update = self.update(self.lab, 'Gone')
+        self.lab.delete()
+
+        call_command('apply_content_updates', type='lab', stdout=StringIO())
+
+        update.refresh_from_db()
+        self.assertIsNone(update.applied_at)
+
+    def test_lab_updates_without_the_layout_labels_are_rejected(self):
+        update = self.update(self.lab, 'New lab\n\n1. Run the server')
+
+        out = StringIO()
+        call_command('apply_content_updates', type='lab', stdout=out)
+
+        self.assertIn("1 updates skipped because they don't follow the content's layout", out.getvalue())
+        update.refresh_from_db()
+        self.assertIsNone(update.applied_at)
+        self.lab.refresh_from_db()
+        self.assertNotEqual(self.lab.description, 'New lab')
+
+    def test_admin_approve_and_apply_action(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+        update = self.update(self.lesson, '# Reviewed', status='pending')
+
+        self.client.post(
+            reverse('admin:hello_contentupdate_changelist'),
+            {'action': 'approve_and_apply_updates', '_selected_action': [update.pk]},
+            SERVER_NAME='localhost',
+        )
+
+        update.refresh_from_db()
+        self.assertEqual(update.status, 'approved')
+        self.assertIsNotNone(update.applied_at)
+        self.lesson.refresh_from_db()
+        self.assertEqual(self.lesson.content, '# Reviewed')
+
+
+class AdminChangelistTests(TestCase):
+    databases = {'default', 'updates'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        courses = Course.objects.bulk_create(
+            Course(title=f'Course {i}', slug=f'course-{i}', description='Long description', short_description='Short')
+            for i in range(5)
+        )
+        Lesson.objects.bulk_create(
+            Lesson(course=course, title=f'Lesson {j}', slug=f'lesson-{j}', content='Long body')
+            for course in courses for j in range(6)
+        )
+        Lab.objects.bulk_create(
+            Lab(course=course, title=f'Lab {course.id}', slug=f'lab-{course.id}', description='Build',
+                instructions='Long steps')
+            for course in courses
+        )
+        ContentUpdate.objects.bulk_create(
+            ContentUpdate(content_type='lesson', content_id=i, prompt_used='Refresh', ai_response='Long response')
+            for i in range(30)
+        )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def changelist(self, model_name, **params):
+        with CaptureQueriesContext(connection) as queries, CaptureQueriesContext(connections['updates']) as log_queries:
+            response = self.client.get(
+                reverse(f'admin:hello_{model_name}_changelist'), params, SERVER_NAME='localhost'
+            )
+        self.assertEqual(response.status_code, 200)
+        return response, [query['sql'] for query in [*queries, *log_queries]]
+
+    def test_changelists_skip_large_columns_and_related_lookups(self):
+        for model_name, column in [('lesson', '"content"'), ('lab', '"instructions"'), ('contentupdate', '"ai_response"')]:
+            _response, queries = self.changelist(model_name)
+            selects = [sql for sql in queries if sql.startswith('SELECT') and f'hello_{model_name}' in sql]
+            self.assertTrue(selects, model_name)
+            for sql in selects:
+                self.assertNotIn(column, sql, model_name)
+                self.assertNotIn('"hello_course"."description"', sql)
+
+        _response, few = self.changelist('lesson', course='course-0')
+        Lesson.objects.bulk_create(
+            Lesson(course_id=Course.objects.get(slug='course-0').id, title=f'Extra {j}', slug=f'extra-{j}', content='')
+            for j in range(20)
+        )
+        _response, many = self.changelist('lesson', course='course-0')
+        self.assertEqual(len(few), len(many))
+
+    def test_course_input_filter(self):
+        response, _queries = self.changelist('lesson', course='Course 3', q='')
+        self.assertEqual(response.context['cl'].result_count, 6)
+        self.assertContains(response, 'name="q"')
+        self.assertNotContains(response, '?course__id__exact=')
+
+    def test_search_filters_against_the_whole_index(self):
+        call_command('rebuild_search_index', stdout=StringIO())
+
+        response, queries = self.changelist('lesson', q='lesson')
+
+        self.assertEqual(response.context['cl'].result_count, 30)
+        # Matched in a subquery rather than through a capped list of ids
+        selects = [sql for sql in queries if sql.startswith('SELECT') and 'hello_lesson' in sql]
+        self.assertTrue(selects)
+        self.assertTrue(all('MATCH' in sql for sql in selects))
+        self.assertEqual(self.changelist('lesson', q='?!')[0].context['cl'].result_count, 0)
+
+    def test_paginator_stops_counting_at_the_limit(self):
+        with mock.patch.object(EstimatedCountPaginator, 'COUNT_LIMIT', 10):
+            self.assertEqual(EstimatedCountPaginator(ContentUpdate.objects.all(), 5).count,
+                             ContentUpdate.objects.aggregate(largest=Max('pk'))['largest'])
+            self.assertEqual(EstimatedCountPaginator(ContentUpdate.objects.filter(content_id__gte=0), 5).count, 10)
+            self.assertEqual(EstimatedCountPaginator(ContentUpdate.objects.filter(content_id__lt=4), 5).count, 4)
+
+
+class FakeStream:
+    """Context manager standing in for client.messages.stream()"""
+
+    def __init__(self, chunks, error=None, stop_reason='end_turn'):
+        self.chunks = chunks
+        self.error = error
+        self.stop_reason = stop_reason
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    @property
+    def text_stream(self):
+        yield from self.chunks
+        if self.error:
+            raise self.error
+
+    def get_final_message(self):
+        return SimpleNamespace(stop_reason=self.stop_reason)
+
+
+@override_settings(ANTHROPIC_API_KEY='test-key')
+class StreamingUpdateTests(TestCase):
+    databases = {'default', 'updates'}
+
+    def setUp(self):
+        self.course = Course.objects.create(title='Intro', slug='intro', description='About', short_description='Intro')
+        self.lesson = Lesson.objects.create(course=self.course, title='Basics', slug='basics', content='# Basics')
+
+    def service(self, chunks, error=None):
+        service = ClaudeService()
+        self.stream_calls = []
+
+        def stream(**params):
+            self.stream_calls.append(params)
+            return FakeStream(chunks, error)
+
+        service.client = SimpleNamespace(messages=SimpleNamespace(stream=stream))
+        return service
+
+    def test_deltas_are_yielded_and_checkpointed(self):
+        deltas = stream_update(self.service(['# New', ' basics']), 'lesson', self.lesson, checkpoint_seconds=0)
+
+        self.assertEqual(next(deltas), '# New')
+        update = ContentUpdate.objects.get()
+        self.assertEqual(update.status, 'generating')
+        self.assertEqual(next(deltas), ' basics')
+        update.refresh_from_db()
+        self.assertEqual(update.ai_response, '# New')
+        self.assertEqual(list(deltas), [])
+
+        update.refresh_from_db()
+        self.assertEqual((update.status, update.ai_response), ('pending', '# New basics'))
+        self.assertEqual(self.stream_calls[0]['max_tokens'], 3000)
+        self.lesson.refresh_from_db()
+        self.assertIsNotNone(self.lesson.last_ai_update)
+
+    def test_partial_output_is_kept_when_the_stream_fails(self):
+        deltas = stream_update(self.service(['# Half'], error=TimeoutError('read timeout')), 'lesson', self.lesson)
+
+        with self.assertRaises(TimeoutError):
+            list(deltas)
+
+        update = ContentUpdate.objects.get()
+        self.assertEqual((update.status, update.ai_response), ('failed', '# Half'))
+        self.lesson.refresh_from_db()
+        self.assertIsNone(self.lesson.last_ai_update)
+
+    def test_admin_preview_streams_the_generation(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        url = reverse('admin:hello_contentupdate_generate', args=['lesson', self.lesson.id])
+
+        with mock.patch('hello.admin.ClaudeService', return_value=self.service(['# Fresh', ' lesson'])):
+            response = self.client.post(url, SERVER_NAME='localhost')
+            self.assertTrue(response.streaming)
+            body = b''.join(response.streaming_content).decode()
+
+        self.assertEqual(body, '# Fresh lesson')
+        self.assertEqual(ContentUpdate.objects.get().status, 'pending')
+        self.assertEqual(self.client.post(url.replace('lesson', 'provider'), SERVER_NAME='localhost').status_code, 404)
+
+    def test_admin_preview_needs_a_post_with_a_csrf_token(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(admin)
+        url = reverse('admin:hello_contentupdate_generate', args=['lesson', self.lesson.id])
+
+        with mock.patch('hello.admin.ClaudeService', return_value=self.service(['# Fresh'])):
+            self.assertEqual(client.get(url, SERVER_NAME='localhost').status_code, 405)
+            self.assertEqual(client.post(url, SERVER_NAME='localhost').status_code, 403)
+
+        self.assertFalse(ContentUpdate.objects.exists())
+        update = ContentUpdate.objects.create(content_type='lesson', content_id=self.lesson.id, ai_response='Old')
+        change_page = client.get(reverse('admin:hello_contentupdate_change', args=[update.pk]), SERVER_NAME='localhost')
+        self.assertContains(change_page, f'formaction="{url}" formmethod="post"')
+
+    def test_abandoned_generations_are_marked_failed(self):
+        abandoned = ContentUpdate.objects.create(content_type='lesson', content_id=self.lesson.id, status='generating')
+        running = ContentUpdate.objects.create(content_type='lesson', content_id=self.lesson.id, status='generating')
+        ContentUpdate.objects.filter(pk=abandoned.pk).update(created_at=timezone.now() - timedelta(hours=2))
+
+        self.assertEqual(fail_abandoned_updates(), 1)
+
+        abandoned.refresh_from_db()
+        running.refresh_from_db()
+        self.assertEqual((abandoned.status, running.status), ('failed', 'generating'))
+
+
+def api_error(error_class, status_code, headers=None):
+    response = SimpleNamespace(status_code=status_code, headers=headers or {}, request=None)
+    return error_class(f'HTTP {status_code}', response=response, body=None)
+
+
+class FakeMessages:
+    """messages.create/stream that raise the queued errors before succeeding"""
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def create(self, **params):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return SimpleNamespace(content=[SimpleNamespace(text='updated')], stop_reason='end_turn')
+
+    def stream(self, **params):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return FakeStream(['updated'])
+
+
+class FakeAsyncAnthropic:
+    """Stands in for AsyncAnthropic: each client it opens only works on the event loop that opened it
+    
+    Requests raise the queued errors before succeeding; the clients opened and
+    the most requests in flight at once are recorded.
+    """
+
+    def __init__(self, errors=(), delay=0.01):
+        self.errors = list(errors)
+        self.delay = delay
+        self.clients = []
+        self.calls = 0
+        self.in_flight = self.max_in_flight = 0
+
+    def __call__(self, **options):
+        client = SimpleNamespace(loop=asyncio.get_running_loop(), closed=False)
+
+        async def create(**params):
+            if client.closed or asyncio.get_running_loop() is not client.loop:
+                raise RuntimeError('Event loop is closed')
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            try:
+                await asyncio.sleep(self.delay)
+                if self.errors:
+                    raise self.errors.pop(0)
+            finally:
+                self.in_flight -= 1
+            return SimpleNamespace(content=[SimpleNamespace(text='updated')], stop_reason='end_turn')
+
+        async def close():
+            client.closed = True
+
+        client.messages = SimpleNamespace(create=create)
+        client.close = close
+        self.clients.append(client)
+        return client
+
+
+@override_settings(ANTHROPIC_API_KEY='test-key', CLAUDE_MAX_RETRIES=3)
+class ResilientClientTests(TestCase):
+    databases = {'default', 'updates'}
+
+    def service(self, errors=(), threshold=5):
+        service = ClaudeService()
+        self.messages = FakeMessages(errors)
+        service.client = SimpleNamespace(messages=self.messages)
+        service.breaker = CircuitBreaker(threshold=threshold, cooldown=60)
+        return service
+
+    def setUp(self):
+        patcher = mock.patch('hello.services.claude_service.time.sleep')
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_transient_errors_are_retried_honouring_retry_after(self):
+        service = self.service([
+            api_error(anthropic.RateLimitError, 429, {'retry-after': '7'}),
+            anthropic.APIConnectionError(request=None),
+        ])
+
+        result = service.update_existing_content('lesson', 'Body', 'Refresh')
+
+        self.assertTrue(result.ok)
+        self.assertEqual(result.text, 'updated')
+        self.assertEqual(self.messages.calls, 3)
+        first_delay, second_delay = [call.args[0] for call in self.sleep.call_args_list]
+        self.assertGreaterEqual(first_delay, 7)
+        self.assertLessEqual(second_delay, ClaudeService.BACKOFF_BASE * 2)
+
+    def test_malformed_retry_after_falls_back_to_backoff(self):
+        service = self.service([api_error(anthropic.RateLimitError, 429, {'retry-after': 'soon'})])
+
+        result = service.update_existing_content('lesson', 'Body', 'Refresh')
+
+        self.assertTrue(result.ok)
+        self.assertEqual(self.messages.calls, 2)
+        self.assertLessEqual(self.sleep.call_args.args[0], ClaudeService.BACKOFF_BASE)
+
+    def test_client_errors_fail_without_retrying(self):
+        service = self.service([api_error(anthropic.BadRequestError, 400)])
+
+        result = service.update_existing_content('lesson', 'Body', 'Refresh')
+
+        self.assertFalse(result.ok)
+        self.assertFalse(result.retryable)
+        self.assertEqual(self.messages.calls, 1)
+
+    def test_circuit_breaker_stops_calls_to_an_overloaded_api(self):
+        service = self.service([api_error(anthropic.InternalServerError, 529)] * 10, threshold=2)
+
+        first = service.update_existing_content('lesson', 'Body', 'Refresh')
+        second = service.update_existing_content('lesson', 'Body', 'Refresh')
+
+        self.assertEqual(self.messages.calls, 2)
+        self.assertTrue(first.retryable)
+        self.assertIsInstance(second.error, CircuitOpenError)
+        self.assertTrue(second.retryable)
+
+    def test_streams_are_retried_until_the_first_delta(self):
+        service = self.service([api_error(anthropic.RateLimitError, 429)])
+
+        self.assertEqual(list(service.stream_update_existing_content('lesson', 'Body', 'Refresh')), ['updated'])
+        self.assertEqual(self.messages.calls, 2)
+
+    @override_settings(CLAUDE_MAX_RETRIES=0)
+    def test_command_requeues_transient_failures(self):
+        course = Course.objects.create(title='Intro', slug='intro', description='About', short_description='Intro')
+        Lesson.objects.create(course=course, title='Basics', slug='basics', content='# Basics')
+        service = self.service([api_error(anthropic.RateLimitError, 429), api_error(anthropic.BadRequestError, 400)])
+
+        out = StringIO()
+        with mock.patch('hello.management.commands.update_content.ClaudeService', return_value=service):
+            call_command('update_content', '--all', stdout=out)
+
+        self.assertIn('Requeueing 1 items', out.getvalue())
+        self.assertIn('1 updates generated, 1 failed', out.getvalue())
+        self.assertEqual(ContentUpdate.objects.filter(status='pending').count(), 1)
+
+
+@override_settings(ANTHROPIC_API_KEY='test-key', CLAUDE_MAX_RETRIES=0)
+class ConcurrentUpdateTests(TransactionTestCase):
+    """update_content --concurrency, whose async ORM calls run outside the test's transaction"""
+    databases = {'default', 'updates'}
+
+    def service(self):
+        service = ClaudeService()
+        service.breaker = CircuitBreaker(threshold=5, cooldown=60)
+        return service
+
+    def test_concurrent_requeue_opens_a_client_per_pass(self):
+        course = Course.objects.create(title='Intro', slug='intro', description='About', short_description='Intro')
+        Lesson.objects.create(course=course, title='Basics', slug='basics', content='# Basics')
+        api = FakeAsyncAnthropic([api_error(anthropic.RateLimitError, 429)])
+
+        out = StringIO()
+        with mock.patch('hello.services.claude_service.AsyncAnthropic', api), \
+                mock.patch('hello.management.commands.update_content.ClaudeService', return_value=self.service()):
+            call_command('update_content', '--all', '--concurrency', '2', '--rpm', '0', stdout=out)
+
+        self.assertIn('Requeueing 1 items', out.getvalue())
+        self.assertIn('2 updates generated, 0 failed', out.getvalue())
+        self.assertEqual(len(api.clients), 2)
+        self.assertTrue(all(client.closed for client in api.clients))
+
+    def test_concurrency_bounds_requests_in_flight(self):
+        for n in range(5):
+            Course.objects.create(title=f'Course {n}', slug=f'course-{n}', description='About', short_description='Intro')
+        api = FakeAsyncAnthropic()
+
+        out = StringIO()
+        with mock.patch('hello.services.claude_service.AsyncAnthropic', api), \
+                mock.patch('hello.management.commands.update_content.ClaudeService', return_value=self.service()):
+            call_command('update_content', '--all', '--concurrency', '3', '--rpm', '0', stdout=out)
+
+        self.assertIn('Updating 5 items with concurrency 3', out.getvalue())
+        self.assertIn('5 updates generated, 0 failed', out.getvalue())
+        self.assertEqual(api.max_in_flight, 3)
+        self.assertEqual(ContentUpdate.objects.filter(status='pending').count(), 5)
+        self.assertFalse(Course.objects.filter(last_ai_update__isnull=True).exists())
+
+    def test_rate_limiter_spaces_request_starts(self):
+        limiter = RateLimiter(1200)
+        starts = []
+
+        async def start():
+            await limiter.wait()
+            starts.append(time.monotonic())
+
+        async def run():
+            await asyncio.gather(*(start() for _ in range(4)))
+
+        asyncio.run(run())
+
+        self.assertEqual(limiter.interval, 0.05)
+        gaps = [later - earlier for earlier, later in zip(starts, starts[1:])]
+        self.assertTrue(all(gap >= 0.045 for gap in gaps), gaps)
+        self.assertEqual(RateLimiter(0).interval, 0)
+
+    def test_concurrency_bounds_each_section_request(self):
+        course = Course.objects.create(title='Intro', slug='intro', description='About', short_description='Intro')
+        Lesson.objects.create(course=course, title='Basics', slug='basics', content=LONG_LESSON)
+        api = FakeAsyncAnthropic()
+
+        out = StringIO()
+        with mock.patch('hello.services.claude_service.AsyncAnthropic', api), \
+                mock.patch('hello.management.commands.update_content.ClaudeService', return_value=self.service()):
+            call_command('update_content', '--all', '--concurrency', '2', '--rpm', '0', stdout=out)
+
+        self.assertIn('2 updates generated, 0 failed', out.getvalue())
+        # The course plus the lesson's three sections, never more than two at once
+        self.assertEqual(api.calls, 4)
+        self.assertEqual(api.max_in_flight, 2)
+
+
+LONG_LESSON = """# Basics
+
+Intro to MCP.
+
+## Setup
+
+```bash
+# install the SDK
+pip install mcp
+```
+
+## Servers
+
+Write a server.
+
+### Tools
+
+Expose a tool.
+"""
+
+
+@override_settings(ANTHROPIC_API_KEY='test-key')
+class SectionedUpdateTests(TestCase):
+    databases = {'default', 'updates'}
+
+    def setUp(self):
+        self.course = Course.objects.create(title='Intro', slug='intro', description='About', short_description='Intro')
+        self.lesson = Lesson.objects.create(course=self.course, title='Basics', slug='basics', content=LONG_LESSON)
+
+    def service(self, replies):
+        """A service whose create() returns each (text, stop_reason) reply in turn"""
+        service = ClaudeService()
+        self.requests = []
+        replies = list(replies)
+
+        def create(**params):
+            self.requests.append(params)
+            text, stop_reason = replies.pop(0)
+            return SimpleNamespace(content=[SimpleNamespace(text=text)], stop_reason=stop_reason)
+
+        service.client = SimpleNamespace(messages=SimpleNamespace(create=create))
+        return service
+
+    def test_split_sections_ignores_headings_in_code(self):
+        sections = split_sections(LONG_LESSON)
+
+        self.assertEqual([section.heading for section in sections], ['Basics', 'Setup', 'Servers'])
+        self.assertIn('# install the SDK', sections[1].text)
+        self.assertIn('### Tools', sections[2].text)
+        self.assertEqual(join_sections(section.text for section in sections), LONG_LESSON.strip())
+
+    def test_truncated_responses_are_continued(self):
+        service = self.service([('Part one ', 'max_tokens'), (' and two', 'end_turn')])
+
+        result = service.update_existing_content('lesson', 'Body', 'Refresh')
+
+        self.assertEqual(result.text, 'Part one and two')
+        self.assertEqual(self.requests[1]['messages'][-1], {'role': 'assistant', 'content': 'Part one'})
+
+    def test_responses_truncated_past_the_limit_fail(self):
+        service = self.service([('more', 'max_tokens')] * (ClaudeService.MAX_CONTINUATIONS + 1))
+
+        result = service.update_existing_content('lesson', 'Body', 'Refresh')
+
+        self.assertFalse(result.ok)
+        self.assertEqual(len(self.requests), ClaudeService.MAX_CONTINUATIONS + 1)
+
+    def test_only_sections_changed_since_the_last_applied_update_are_sent(self):
+        ContentUpdate.objects.create(
+            content_type='lesson', content_id=self.lesson.id, prompt_used='Refresh',
+            ai_response=LONG_LESSON.replace('Write a server.', 'Write an older server.'),
+            status='approved', applied_at=timezone.now(),
+        )
+        service = self.service([('## Servers\n\nWrite a modern server.', 'end_turn')])
+
+        out = StringIO()
+        with mock.patch('hello.management.commands.update_content.ClaudeService', return_value=service):
+            call_command('update_content', '--type', 'lesson', '--id', str(self.lesson.id), stdout=out)
+
+        self.assertEqual(len(self.requests), 1)
+        self.assertIn('Write a server.', self.requests[0]['messages'][0]['content'])
+        self.assertIn('1 of 3 sections refreshed', out.getvalue())
+        update = ContentUpdate.objects.get(status='pending')
+        self.assertIn('Write a modern server.', update.ai_response)
+        self.assertIn('pip install mcp', update.ai_response)
+        self.assertNotIn('### Tools', update.ai_response)
+
+    def test_unchanged_lessons_are_skipped_unless_full(self):
+        ContentUpdate.objects.create(
+            content_type='lesson', content_id=self.lesson.id, prompt_used='Refresh',
+            ai_response=LONG_LESSON, status='approved', applied_at=timezone.now(),
+        )
+        Lesson.objects.filter(pk=self.lesson.pk).update(is_published=True, last_ai_update=None)
+        Course.objects.filter(pk=self.course.pk).update(last_ai_update=timezone.now())
+        service = self.service([(f'## Section {n}', 'end_turn') for n in range(3)])
+
+        out = StringIO()
+        with mock.patch('hello.management.commands.update_content.ClaudeService', return_value=service):
+            call_command('update_content', '--all', stdout=out)
+            self.assertEqual(self.requests, [])
+            call_command('update_content', '--all', '--full', stdout=out)
+
+        self.assertIn('Skipping 1 items with unchanged content', out.getvalue())
+        self.assertEqual(len(self.requests), 3)
+        self.assertEqual(ContentUpdate.objects.get(status='pending').ai_response, '## Section 0\n\n## Section 1\n\n## Section 2')
+
+
+@override_settings(ANTHROPIC_API_KEY='test-key')
+class PromptCachingTests(TestCase):
+    databases = {'default', 'updates'}
+
+    def test_shared_instructions_are_a_cached_system_prefix(self):
+        service = ClaudeService()
+        requests = [
+            service.build_course_params('MCP 101', 'Basics'),
+            service.build_lesson_params('Tools', 'MCP 101', ['Intro']),
+            service.build_lab_params('Weather server'),
+            service.build_update_params('lesson', 'Body', 'Refresh'),
+        ]
+
+        for params in requests:
+            self.assertEqual(params['system'], [
+                {'type': 'text', 'text': SYSTEM_PROMPT, 'cache_control': {'type': 'ephemeral'}}
+            ])
+            self.assertNotIn('Current best practices', params['messages'][0]['content'])
+
+    def test_command_reports_cache_usage(self):
+        course = Course.objects.create(title='Intro', slug='intro', description='About', short_description='Intro')
+        service = ClaudeService()
+        usage = SimpleNamespace(
+            input_tokens=50, output_tokens=200, cache_creation_input_tokens=0, cache_read_input_tokens=1150
+        )
+        message = SimpleNamespace(stop_reason='end_turn', usage=usage)
+        stream = FakeStream(['Title: Intro\nDescription: New'])
+        stream.get_final_message = lambda: message
+        service.client = SimpleNamespace(messages=SimpleNamespace(stream=lambda **params: stream))
+
+        out = StringIO()
+        with mock.patch('hello.management.commands.update_content.ClaudeService', return_value=service):
+            call_command('update_content', '--type', 'course', '--id', str(course.id), stdout=out)
+
+        self.assertIn('Tokens over 1 requests: 1200 input (1150 read from cache, 0 written to cache, 96% cached), 200 output', out.getvalue())
+
+
+class StaticBuildTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_icons_are_collected_from_templates_and_learning_paths(self):
+        metadata = {
+            'server': {'unicode': 'f233', 'free': ['solid']},
+            'list-check': {'unicode': 'f0ae', 'free': ['solid'], 'aliases': {'names': ['tasks']}},
+            'github': {'unicode': 'f09b', 'free': ['brands']},
+        }
+
+        LearningPath.objects.create(name='Path', slug='path', description='A path', icon='fas fa-rocket')
+
+        icons = used_icons()
+        codepoints, unknown = icon_codepoints({'server', 'tasks', 'github'}, metadata)
+
+        self.assertIn('server', icons)
+        self.assertIn('rocket', icons)
+        self.assertNotIn('solid', icons)
+        self.assertEqual(codepoints, {'server': 0xf233, 'tasks': 0xf0ae})
+        self.assertEqual(unknown, ['github'])
+        self.assertIn('.fa-server:before{content:"\\f233"}', icon_css(codepoints))
+
+    def test_collected_assets_are_fingerprinted_and_compressed(self):
+        with TemporaryDirectory() as source, TemporaryDirectory() as root:
+            build = Path(source) / 'build'
+            build.mkdir()
+            for name in ('site.css', 'icons.css'):
+                (build / name).write_text('body { color: black; }\n' * 50)
+            (build / 'fa-icons.woff2').write_bytes(b'wOF2')
+            (Path(source) / 'css').mkdir()
+            (Path(source) / 'css' / 'highlight.css').write_text(highlight_css())
+
+            storages = {
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'hello.storage.PrecompressedManifestStaticFilesStorage'},
+            }
+            with override_settings(
+                STATIC_ROOT=root, STATICFILES_DIRS=[source], STORAGES=storages, STATIC_BUILD=True
+            ):
+                call_command('collectstatic', '--noinput', verbosity=0)
+                manifest = json.loads((Path(root) / 'staticfiles.json').read_text())['paths']
+                response = self.client.get(reverse('home'))
+
+            hashed_css = manifest['build/site.css']
+            self.assertNotEqual(hashed_css, 'build/site.css')
+            self.assertTrue((Path(root) / (hashed_css + '.gz')).exists())
+            self.assertFalse((Path(root) / (manifest['build/fa-icons.woff2'] + '.gz')).exists())
+            self.assertContains(response, f'/static/{hashed_css}')
+            self.assertNotContains(response, 'cdn.tailwindcss.com')
+
+
+class RenderedMarkdownTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.course = Course.objects.create(title='Intro', slug='intro', description='About', short_description='Intro')
+
+    def test_html_is_rendered_on_save(self):
+        lesson = Lesson.objects.create(course=self.course, title='Basics', slug='basics', content='# Basics')
+        self.assertEqual(lesson.content_html, '<h1>Basics</h1>')
+        self.assertEqual(lesson.rendered_key, lesson.get_render_key())
+
+        lesson.content = '# Transports'
+        lesson.save(update_fields=['content'])
+
+        lesson.refresh_from_db()
+        self.assertEqual(lesson.content_html, '<h1>Transports</h1>')
+        self.assertFalse(lesson.needs_render())
+
+    def test_unchanged_source_is_not_rendered_again(self):
+        lab = Lab.objects.create(
+            title='Weather', slug='weather', description='Build it', instructions='1. Run', starter_code='x = 1\n',
+        )
+
+        with mock.patch('hello.rendering.render_markdown') as render, \
+                mock.patch('hello.rendering.highlight_code') as highlight:
+            lab.title = 'Forecast'
+            lab.save()
+
+        render.assert_not_called()
+        highlight.assert_not_called()
+        self.assertFalse(lab.render_markdown_fields())
+        self.assertTrue(lab.render_markdown_fields(force=True))
+
+    def test_render_content_backfills_stale_rows(self):
+        lesson = Lesson.objects.create(course=self.course, title='Basics', slug='basics', content='# Basics')
+        Lesson.objects.create(course=self.course, title='Current', slug='current', content='# Current')
+        Lab.objects.create(title='Weather', slug='weather', description='Build *it*', instructions='1. Run')
+        Lesson.objects.filter(pk=lesson.pk).update(rendered_key='', content_html='')
+        Lab.objects.update(rendered_key='', description_html='')
+
+        out = StringIO()
+        call_command('render_content', stdout=out)
+
+        self.assertIn('lessons: 1 re-rendered', out.getvalue())
+        self.assertIn('labs: 1 re-rendered', out.getvalue())
+        lesson.refresh_from_db()
+        self.assertEqual(lesson.content_html, '<h1>Basics</h1>')
+        self.assertEqual(Lab.objects.get().description_html, '<p>Build <em>it</em></p>')
+
+        out = StringIO()
+        call_command('render_content', stdout=out)
+        self.assertIn('lessons: 0 re-rendered', out.getvalue())
+        call_command('render_content', '--force', stdout=out)
+        self.assertIn('lessons: 2 re-rendered', out.getvalue())
+
+
+class HighlightingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_fenced_code_is_highlighted_with_detected_language(self):
+        html = render_markdown('```\nimport os\nprint(os.getcwd())\n```\n\n```json\n{"a": 1}\n```')
+
+        self.assertIn('<div class="highlight">', html)
+        self.assertIn('<span class="kn">import</span>', html)
+        self.assertIn('<span class="nt">&quot;a&quot;</span>', html)
+
+    def test_lab_page_shows_highlighted_starter_code_without_prism(self):
+        Lab.objects.create(
+            title='Weather', slug='weather', description='Build it', instructions='```python\nx = 1\n```',
+            starter_code='def forecast(city):\n    pass\n',
+        )
+
+        response = self.client.get(reverse('lab_detail', kwargs={'slug': 'weather'}))
+
+        self.assertContains(response, '<span class="k">def</span>', html=False)
+        self.assertContains(response, 'css/highlight.css')
+        self.assertNotContains(response, 'prism')
+
+    def test_stylesheet_matches_renderer(self):
+        path = Path(__file__).resolve().parent.parent / 'static' / 'css' / 'highlight.css'
+        self.assertEqual(path.read_text(), highlight_css())
+
+
+# The public pages routed to hello.async_views, for AsyncViewTests
+urlpatterns = public_urlpatterns(async_views)
+
+
+@override_settings(PAGE_CACHE_SECONDS=0)
+class AsyncViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        provider = MCPProvider.objects.create(name='Anthropic', description='Claude')
+        cls.course = Course.objects.create(
+            title='Intro', slug='intro', description='About MCP', short_description='Intro',
+            difficulty_level='beginner',
+        )
+        Lesson.objects.create(course=cls.course, title='Basics', slug='basics', content='# Basics\n\nBody')
+        Lesson.objects.create(course=cls.course, title='Tools', slug='tools', content='Tools')
+        Lab.objects.create(course=cls.course, title='First Lab', slug='first-lab', description='Build', instructions='Steps')
+        path = LearningPath.objects.create(name='Path', slug='path', description='A path', provider=provider, is_featured=True)
+        cls.course.learning_paths.add(path)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_async_views_render_the_same_pages(self):
+        urls = [
+            reverse('home'),
+            reverse('course_list'),
+            reverse('course_list') + '?difficulty=beginner',
+            reverse('course_detail', kwargs={'slug': 'intro'}),
+            reverse('lesson_detail', kwargs={'course_slug': 'intro', 'lesson_slug': 'basics'}),
+            reverse('lab_list'),
+            reverse('lab_detail', kwargs={'slug': 'first-lab'}),
+            reverse('learning_path_list'),
+            reverse('learning_path_detail', kwargs={'slug': 'path'}),
+            reverse('search') + '?q=basics',
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                sync_response = self.client.get(url)
+                with override_settings(ROOT_URLCONF='hello.tests'):
+                    async_response = self.client.get(url)
+                self.assertEqual(async_response.status_code, 200)
+                self.assertEqual(async_response.content, sync_response.content)
+
+    @override_settings(ROOT_URLCONF='hello.tests')
+    def test_missing_objects_are_404(self):
+        self.assertEqual(self.client.get(reverse('course_detail', kwargs={'slug': 'missing'})).status_code, 404)
+        self.assertEqual(self.client.get(reverse('lab_list'), {'after': 'not-a-cursor'}).status_code, 404)
+
+    @override_settings(ROOT_URLCONF='hello.tests')
+    def test_stale_html_is_rendered_and_stored(self):
+        Lesson.objects.filter(slug='basics').update(rendered_key='', content_html='')
+        url = reverse('lesson_detail', kwargs={'course_slug': 'intro', 'lesson_slug': 'basics'})
+
+        self.assertContains(self.client.get(url), '<h1>Basics</h1>', html=True)
+        self.assertFalse(Lesson.objects.get(slug='basics').needs_render())
+
+    @override_settings(ROOT_URLCONF='hello.tests', PAGE_CACHE_SECONDS=600)
+    def test_cached_and_conditional_responses(self):
+        url = reverse('course_detail', kwargs={'slug': 'intro'})
+        etag = self.client.get(url)['ETag']
+
+        with self.assertNumQueries(0):
+            self.assertContains(self.client.get(url), 'Basics')
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+@override_settings(ROOT_URLCONF='hello.tests', PAGE_CACHE_SECONDS=0)
+class AsgiApplicationTests(TransactionTestCase):
+    """demo_site.asgi end to end; each ASGI request gets its own database thread, outside a test transaction"""
+
+    def setUp(self):
+        course = Course.objects.create(title='Intro', slug='intro', description='About MCP', short_description='Intro')
+        Lesson.objects.create(course=course, title='Basics', slug='basics', content='# Basics')
+
+    def test_asgi_application_serves_the_async_views(self):
+        async def get(path):
+            communicator = ApplicationCommunicator(asgi_application, {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'',
+                'headers': [(b'host', b'localhost')], 'client': ('127.0.0.1', 50000), 'server': ('localhost', 80),
+            })
+            await communicator.send_input({'type': 'http.request', 'body': b''})
+            start = await communicator.receive_output(5)
+            body = b''
+            while True:
+                message = await communicator.receive_output(5)
+                body += message.get('body', b'')
+                if not message.get('more_body'):
+                    return start['status'], body
+
+        status, body = async_to_sync(get)(reverse('course_detail', kwargs={'slug': 'intro'}))
+        self.assertEqual(status, 200)
+        self.assertIn(b'Basics', body)
+        self.assertEqual(async_to_sync(get)('/courses/missing/')[0], 404)
+
+
+class SqliteProfileTests(TransactionTestCase):
+    def write_without_committing(self, path, pragmas):
+        """Open a write transaction large enough to spill out of a small page cache"""
+        writer = connect(path, pragmas)
+        writer.execute('CREATE TABLE notes (body TEXT)')
+        writer.execute('INSERT INTO notes VALUES (?)', ('committed',))
+        writer.execute('PRAGMA cache_size=10')
+        writer.execute('BEGIN IMMEDIATE')
+        writer.executemany('INSERT INTO notes VALUES (?)', [('x' * 4096,)] * 200)
+        return writer
+
+    def test_readers_are_not_blocked_by_an_open_write_transaction(self):
+        with TemporaryDirectory() as tmp:
+            writer = self.write_without_committing(Path(tmp) / 'default.sqlite3', {})
+            reader = sqlite3.connect(Path(tmp) / 'default.sqlite3', timeout=0)
+            with self.assertRaisesMessage(sqlite3.OperationalError, 'database is locked'):
+                reader.execute('SELECT count(*) FROM notes').fetchone()
+            reader.close()
+            writer.close()
+
+            writer = self.write_without_committing(Path(tmp) / 'tuned.sqlite3', settings.SQLITE_PRAGMAS)
+            reader = connect(Path(tmp) / 'tuned.sqlite3', {**settings.SQLITE_PRAGMAS, 'busy_timeout': 0})
+            # The reader sees the last committed state while the writer carries on
+            self.assertEqual(reader.execute('SELECT count(*) FROM notes').fetchone(), (1,))
+            writer.execute('COMMIT')
+            self.assertEqual(reader.execute('SELECT count(*) FROM notes').fetchone(), (201,))
+            reader.close()
+            writer.close()
+
+    def test_stress_command_reports_both_profiles(self):
+        # A TransactionTestCase, so the command can back up the test database without waiting on an open transaction
+        Lesson.objects.create(course=Course.objects.create(title='C', slug='c'), title='L', slug='l', content='Text')
+        out = StringIO()
+        call_command('stress_sqlite', duration=0.2, readers=2, rows_per_transaction=10, row_size=100, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual([line.split()[0] for line in lines], ['default', 'tuned'])
+        self.assertIn(' 0 read errors', lines[1])
+
+
+class UpdateLogDatabaseTests(TestCase):
+    databases = {'default', 'updates'}
+
+    def test_update_log_is_routed_to_its_own_database(self):
+        catalog = connections['default'].introspection.table_names()
+        log = connections['updates'].introspection.table_names()
+        self.assertIn('hello_lesson', catalog)
+        self.assertNotIn('hello_contentupdate', catalog)
+        self.assertEqual({'hello_contentupdate', 'hello_contentbatch'}, {name for name in log if name.startswith('hello_')})
+
+        update = ContentUpdate.objects.create(content_type='lesson', content_id=1, prompt_used='p', ai_response='r')
+        self.assertEqual(update._state.db, 'updates')
+        self.assertEqual(ContentBatch.objects.create(batch_id='msgbatch_1')._state.db, 'updates')
+
+    def test_existing_log_is_moved_out_of_the_catalog_database(self):
+        # A catalog database from before the router still has the table
+        with connections['updates'].cursor() as cursor:
+            cursor.execute("SELECT sql FROM sqlite_master WHERE name = 'hello_contentupdate'")
+            (create_table,) = cursor.fetchone()
+        with connections['default'].cursor() as cursor:
+            cursor.execute(create_table)
+        created = timezone.now() - timedelta(days=30)
+        for n in range(3):
+            update = ContentUpdate.objects.using('default').create(
+                content_type='lesson', content_id=n, prompt_used='p', ai_response=f'r{n}'
+            )
+            ContentUpdate.objects.using('default').filter(pk=update.pk).update(created_at=created)
+
+        out = StringIO()
+        call_command('move_update_log', batch_size=2, stdout=out)
+        call_command('move_update_log', stdout=out)
+
+        self.assertIn('ContentUpdate: 3 rows copied', out.getvalue())
+        self.assertIn('ContentUpdate: 0 rows copied', out.getvalue())
+        moved = ContentUpdate.objects.order_by('pk')
+        self.assertEqual([update.ai_response for update in moved], ['r0', 'r1', 'r2'])
+        self.assertEqual({update.created_at for update in moved}, {created})
+
+    def test_log_from_before_later_migrations_is_moved(self):
+        # The catalog's table as 0001 created it: the router kept 0004 and 0007 off it
+        with connections['default'].cursor() as cursor:
+            cursor.execute(
+                'CREATE TABLE "hello_contentupdate" ("id" integer NOT NULL PRIMARY KEY AUTOINCREMENT, '
+                '"content_type" varchar(20) NOT NULL, "content_id" integer NOT NULL, "prompt_used" text NOT NULL, '
+                '"ai_response" text NOT NULL, "status" varchar(20) NOT NULL, "created_at" datetime NOT NULL, '
+                '"applied_at" datetime NULL)'
+            )
+            cursor.execute(
+                "INSERT INTO hello_contentupdate (content_type, content_id, prompt_used, ai_response, status, created_at) "
+                "VALUES ('lab', 7, 'p', 'old response', 'approved', '2025-01-01 00:00:00')"
+            )
+
+        out = StringIO()
+        call_command('move_update_log', stdout=out)
+
+        self.assertIn('ContentBatch: no table in the catalog database', out.getvalue())
+        update = ContentUpdate.objects.get()
+        self.assertEqual((update.content_id, update.ai_response, update.fingerprint), (7, 'old response', ''))
+        self.assertEqual(update.created_at.year, 2025)
+
+
+@override_settings(LIST_PAGE_SIZE=2)
+class StaticExportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        tmp = TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.output = Path(tmp.name)
+        provider = MCPProvider.objects.create(name='Anthropic', description='Provider')
+        self.course = Course.objects.create(title='Intro', slug='intro', description='About', short_description='Intro')
+        for n in range(2):
+            Course.objects.create(title=f'More {n}', slug=f'more-{n}', description='About', short_description='More')
+        self.lessons = [
+            Lesson.objects.create(course=self.course, title=f'Lesson {n}', slug=f'lesson-{n}', content='# Text', order=n)
+            for n in range(4)
+        ]
+        Lesson.objects.create(course=self.course, title='Draft', slug='draft', content='# Draft', is_published=False)
+        Lab.objects.create(course=self.course, title='Lab', slug='lab', description='Build', instructions='1. Run')
+        path = LearningPath.objects.create(name='Path', slug='path', description='A path', provider=provider)
+        path.courses.add(self.course)
+
+    def export(self, **options):
+        out = StringIO()
+        call_command('export_static', output=str(self.output), workers=1, stdout=out, **options)
+        return out.getvalue()
+
+    def test_published_pages_are_written_with_compressed_copies(self):
+        self.assertIn('14 pages rendered, 0 unchanged, 0 removed, 0 failed', self.export())
+
+        for url in ['/', '/courses/intro/', '/courses/intro/lessons/lesson-1/', '/labs/lab/', '/paths/', '/paths/path/']:
+            html = (self.output / url.strip('/') / 'index.html').read_bytes()
+            self.assertEqual(html, self.client.get(url).content, url)
+            self.assertEqual(gzip.decompress((self.output / url.strip('/') / 'index.html.gz').read_bytes()), html)
+        self.assertFalse((self.output / 'courses/intro/lessons/draft').exists())
+
+        # The second page of the course listing, at the cursor the first page links to
+        first_page = (self.output / 'courses' / 'index.html').read_text(encoding='utf-8')
+        cursor = re.search(r'\?after=([\w-]+)', first_page).group(1)
+        html = (self.output / 'courses' / f'after-{cursor}.html').read_bytes()
+        self.assertEqual(html, self.client.get(f'/courses/?after={cursor}').content)
+
+    def test_rerun_renders_only_changed_pages(self):
+        self.export()
+        self.assertIn('0 pages rendered, 14 unchanged', self.export())
+
+        self.lessons[1].title = 'Renamed'
+        self.lessons[1].save()
+        # The lesson, its neighbours' previous/next links and the course outline
+        self.assertIn('4 pages rendered, 10 unchanged, 0 removed', self.export())
+        self.assertContains(self.client.get('/courses/intro/lessons/lesson-2/'), 'Renamed')
+        self.assertIn(b'Renamed', (self.output / 'courses/intro/lessons/lesson-2/index.html').read_bytes())
+
+        self.lessons[3].is_published = False
+        self.lessons[3].save()
+        self.assertIn('1 removed', self.export())
+        self.assertFalse((self.output / 'courses/intro/lessons/lesson-3/index.html').exists())
+        self.assertFalse((self.output / 'courses/intro/lessons/lesson-3/index.html.gz').exists())
+
+        self.assertIn('13 pages rendered, 0 unchanged', self.export(force=True))
+
+    def test_path_membership_changes_rerender_the_home_page(self):
+        LearningPath.objects.filter(slug='path').update(is_featured=True)
+        self.export()
+        self.assertIn('href="/paths/path/"', (self.output / 'index.html').read_text(encoding='utf-8'))
+
+        # Only the membership changes; no row's updated_at does
+        LearningPath.objects.get(slug='path').courses.remove(self.course)
+        self.assertIn('2 pages rendered, 12 unchanged', self.export())
+        self.assertNotIn('href="/paths/path/"', (self.output / 'index.html').read_text(encoding='utf-8'))
+
+    def test_export_does_not_fill_the_page_cache(self):
+        with mock.patch('hello.caching.cache.set') as cache_set:
+            self.export()
+        self.assertFalse([c for c in cache_set.call_args_list if c.args[0].startswith('page:')])
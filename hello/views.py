@@ -1,13 +1,27 @@
 ﻿from django.shortcuts import render, get_object_or_404
 from django.http import HttpResponse
+from django.db.models import Exists, OuterRef
+from . import search as search_index
+from .caching import public_page
 from .models import Course, Lesson, Lab, LearningPath, MCPProvider
-import markdown
+from .outline import get_course_outline
+from .pagination import keyset_page
 
 
+# Fields shown on course and lab cards (plus `order` for the page cursor);
+# the large text columns are left unloaded
+COURSE_CARD_FIELDS = ['title', 'slug', 'short_description', 'image', 'difficulty_level', 'estimated_time', 'order']
+LAB_CARD_FIELDS = [
+    'title', 'slug', 'description', 'difficulty', 'estimated_time', 'order', 'course__title', 'course__slug',
+]
+
+
+@public_page('courses', 'paths', 'providers')
 def home(request):
     """Homepage with featured learning paths and courses"""
-    featured_paths = LearningPath.objects.filter(is_featured=True, courses__is_published=True).distinct()
-    featured_courses = Course.objects.filter(is_published=True)[:6]
+    has_published_course = Exists(Course.objects.filter(learning_paths=OuterRef('pk'), is_published=True))
+    featured_paths = LearningPath.objects.filter(has_published_course, is_featured=True).select_related('provider')
+    featured_courses = Course.objects.filter(is_published=True).only(*COURSE_CARD_FIELDS)[:6]
     providers = MCPProvider.objects.filter(is_active=True)
     
     context = {
@@ -18,51 +32,55 @@ def home(request):
     return render(request, 'hello/home.html', context)
 
 
+@public_page('courses')
 def course_list(request):
     """List all courses"""
-    courses = Course.objects.filter(is_published=True)
+    courses = Course.objects.filter(is_published=True).only(*COURSE_CARD_FIELDS)
     difficulty = request.GET.get('difficulty')
     if difficulty:
         courses = courses.filter(difficulty_level=difficulty)
+    page = keyset_page(request, courses)
     
     context = {
-        'courses': courses,
+        'courses': page,
+        'page': page,
         'difficulty_filter': difficulty,
     }
     return render(request, 'hello/course_list.html', context)
 
 
+@public_page('course:{slug}')
 def course_detail(request, slug):
     """Course detail page"""
     course = get_object_or_404(Course, slug=slug, is_published=True)
-    lessons = course.lessons.filter(is_published=True)
-    labs = course.labs.filter(is_published=True)
+    outline = get_course_outline(course)
     
     context = {
         'course': course,
-        'lessons': lessons,
-        'labs': labs,
+        'lessons': outline.lessons,
+        'labs': outline.labs,
     }
     return render(request, 'hello/course_detail.html', context)
 
 
+@public_page('course:{course_slug}')
 def lesson_detail(request, course_slug, lesson_slug):
     """Lesson detail page"""
-    course = get_object_or_404(Course, slug=course_slug, is_published=True)
-    lesson = get_object_or_404(Lesson, course=course, slug=lesson_slug, is_published=True)
+    lesson = get_object_or_404(
+        Lesson.objects.select_related('course').defer('course__description'),
+        course__slug=course_slug,
+        course__is_published=True,
+        slug=lesson_slug,
+        is_published=True,
+    )
+    course = lesson.course
     
-    # Convert markdown to HTML
-    lesson.content_html = markdown.markdown(lesson.content)
+    # Rendered HTML is stored on save; only rows written before a renderer
+    # change (and not yet rebuilt by `render_content`) are rendered here
+    lesson.ensure_rendered()
     
-    # Get next and previous lessons
-    lessons = list(course.lessons.filter(is_published=True).order_by('order'))
-    try:
-        lesson_index = lessons.index(lesson)
-        next_lesson = lessons[lesson_index + 1] if lesson_index + 1 < len(lessons) else None
-        prev_lesson = lessons[lesson_index - 1] if lesson_index > 0 else None
-    except ValueError:
-        next_lesson = None
-        prev_lesson = None
+    # Get next and previous lessons from the cached course outline
+    prev_lesson, next_lesson = get_course_outline(course).neighbours(lesson.slug)
     
     context = {
         'course': course,
@@ -73,27 +91,30 @@ def lesson_detail(request, course_slug, lesson_slug):
     return render(request, 'hello/lesson_detail.html', context)
 
 
+@public_page('labs', 'courses')
 def lab_list(request):
     """List all labs"""
-    labs = Lab.objects.filter(is_published=True)
+    labs = Lab.objects.filter(is_published=True).select_related('course').only(*LAB_CARD_FIELDS)
     difficulty = request.GET.get('difficulty')
     if difficulty:
         labs = labs.filter(difficulty=difficulty)
+    page = keyset_page(request, labs)
     
     context = {
-        'labs': labs,
+        'labs': page,
+        'page': page,
         'difficulty_filter': difficulty,
     }
     return render(request, 'hello/lab_list.html', context)
 
 
+@public_page('lab:{slug}')
 def lab_detail(request, slug):
     """Lab detail page"""
-    lab = get_object_or_404(Lab, slug=slug, is_published=True)
+    lab = get_object_or_404(Lab.objects.defer('solution_code'), slug=slug, is_published=True)
     
-    # Convert markdown to HTML
-    lab.instructions_html = markdown.markdown(lab.instructions)
-    lab.description_html = markdown.markdown(lab.description)
+    # Rendered HTML is stored on save, see lesson_detail
+    lab.ensure_rendered()
     
     context = {
         'lab': lab,
@@ -101,22 +122,36 @@ def lab_detail(request, slug):
     return render(request, 'hello/lab_detail.html', context)
 
 
+@public_page('paths', 'providers')
 def learning_path_list(request):
     """List all learning paths"""
-    paths = LearningPath.objects.all()
+    paths = LearningPath.objects.select_related('provider')
     context = {
         'paths': paths,
     }
     return render(request, 'hello/learning_path_list.html', context)
 
 
+@public_page('path:{slug}', 'courses', 'providers')
 def learning_path_detail(request, slug):
     """Learning path detail page"""
-    path = get_object_or_404(LearningPath, slug=slug)
-    courses = path.courses.filter(is_published=True)
+    path = get_object_or_404(LearningPath.objects.select_related('provider'), slug=slug)
+    courses = path.courses.filter(is_published=True).only(*COURSE_CARD_FIELDS)
     
     context = {
         'path': path,
         'courses': courses,
     }
     return render(request, 'hello/learning_path_detail.html', context)
+
+
+def search(request):
+    """Full-text search across courses, lessons and labs"""
+    query = request.GET.get('q', '').strip()
+    results = search_index.search(query) if query else []
+    
+    context = {
+        'query': query,
+        'results': results,
+    }
+    return render(request, 'hello/search.html', context)
@@ -0,0 +1,8 @@
+/** Only classes that appear in the templates end up in static/build/site.css */
+module.exports = {
+  content: ['./templates/**/*.html'],
+  theme: {
+    extend: {},
+  },
+  plugins: [],
+};